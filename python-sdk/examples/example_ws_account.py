@@ -50,7 +50,7 @@ async def example_ws_account(max_messages: int = None):
                 message = await client.listen()
                 if message is None:
                     print(
-                        f"[{now()}] No message received. (Ping sent.) "
+                        f"[{now()}] No message received. "
                         f"Last message was {int(time.time() - last_msg_time)}s ago."
                     )
                     continue
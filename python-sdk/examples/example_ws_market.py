@@ -2,6 +2,8 @@ import asyncio
 
 from hibachi_xyz import (
     HibachiWSMarketClient,
+    MarkPriceEvent,
+    TradesEvent,
     WebSocketSubscription,
     WebSocketSubscriptionTopic,
     print_data,
@@ -21,12 +23,13 @@ async def example_ws_market(max_messages: int = None):
         ),
     ]
 
-    # Async handlers for message topics
-    async def handle_mark_price(msg):
-        print("[Mark Price]", msg)
+    # Async handlers for message topics, they receive typed events
+    async def handle_mark_price(event: MarkPriceEvent):
+        print("[Mark Price]", event.symbol, event.markPrice)
 
-    async def handle_trades(msg):
-        print("[Trades]", msg)
+    async def handle_trades(event: TradesEvent):
+        for trade in event.trades:
+            print("[Trades]", event.symbol, trade.price, trade.quantity)
 
     client.on("mark_price", handle_mark_price)
     client.on("trades", handle_trades)
@@ -42,11 +45,13 @@ async def example_ws_market(max_messages: int = None):
             while True:
                 await asyncio.sleep(1)
         else:
-            # Passive listening with message count limit
-            while len(received) < max_messages:
-                msg = await client.websocket.recv()
-                print("[Raw]", msg)
-                received.append(msg)
+            # Stream events with message count limit, the handlers above still run
+            async with client.merged_stream(subscriptions) as stream:
+                async for event in stream:
+                    print("[Stream]", event)
+                    received.append(event)
+                    if len(received) >= max_messages:
+                        break
             return received
 
     except KeyboardInterrupt:
@@ -4,11 +4,68 @@ import toml
 
 
 from hibachi_xyz.api import *
+from hibachi_xyz.api_async import AsyncHibachiApiClient
 from hibachi_xyz.types import *
 from hibachi_xyz.helpers import *
-from hibachi_xyz.api_ws_market import HibachiWSMarketClient
+from hibachi_xyz.codec import JsonCodec, OrjsonCodec, get_json_codec, set_json_codec
+from hibachi_xyz.signing import EcdsaSigner, HmacSigner, ProcessPoolSigner, Signer
+from hibachi_xyz.api_ws_market import HibachiWSMarketClient, MarketStream
 from hibachi_xyz.api_ws_trade import HibachiWSTradeClient
 from hibachi_xyz.api_ws_account import HibachiWSAccountClient
+from hibachi_xyz.bars import (
+    Bar,
+    BarAggregator,
+    BarBuilder,
+    BarReconciliation,
+    NotionalBarBuilder,
+    TimeBarBuilder,
+    VolumeBarBuilder,
+)
+from hibachi_xyz.encoding import OrderPayloadEncoder
+from hibachi_xyz.dispatch import BoundedQueue, OverflowPolicy, QueueStats
+from hibachi_xyz.events import (
+    AccountReconnectedEvent,
+    AskBidPriceEvent,
+    DisconnectedEvent,
+    FundingRateEstimationEvent,
+    KlinesEvent,
+    KlineTick,
+    MarkPriceEvent,
+    OrderBookEvent,
+    ReconnectedEvent,
+    SpotPriceEvent,
+    TradesEvent,
+    TradeTick,
+    parse_market_event,
+)
+from hibachi_xyz.feed import (
+    FeedPublisher,
+    FeedReader,
+    FeedRecord,
+    FeedTopic,
+    SharedRingBuffer,
+)
+from hibachi_xyz.history import HistoryLoader, KlineHistory, TradeHistory
+from hibachi_xyz.kline_cache import KlineCache
+from hibachi_xyz.metadata import ContractMetadata
+from hibachi_xyz.ratelimit import EndpointClass, RateLimiter, TokenBucket
+from hibachi_xyz.replica import AccountReplica
+from hibachi_xyz.tracker import OrderTracker
+from hibachi_xyz.validation import (
+    ContractRules,
+    OrderValidationError,
+    OrderValidator,
+    OrderViolation,
+)
+from hibachi_xyz.sharding import (
+    LeastLoadedSharding,
+    ShardedMarketClient,
+    ShardingPolicy,
+    SymbolHashSharding,
+)
+from hibachi_xyz.numeric import NUMERIC_FIELDS, parse_decimals
+from hibachi_xyz.pnl import PnlEngine, RiskSnapshot
+from hibachi_xyz.orderbook import BookSide, LocalOrderBook, OrderBookEngine
 
 
 def get_version() -> str:
@@ -26,6 +83,7 @@ def get_version() -> str:
 __version__: str = get_version()
 __all__ = [
     "HibachiApiClient",
+    "AsyncHibachiApiClient",
     "HibachiApiError",
     "Interval",
     "Nonce",
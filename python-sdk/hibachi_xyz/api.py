@@ -1,19 +1,22 @@
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import asdict
 from enum import Enum
-from hashlib import sha256
-import hmac
-import json
 from math import floor
 from time import time, time_ns
 from typing import Any, Dict, Optional, TypeAlias, List, Tuple, Union
 
 from eth_keys import keys
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from hibachi_xyz.types import (
     BatchOrder,
     BatchResponse,
     BatchResponseOrder,
+    CancelAllResponse,
+    CancelResult,
     ExchangeInfo,
     FeeConfig,
     FutureContract,
@@ -69,7 +72,15 @@ from hibachi_xyz.types import (
     CancelOrder,
 )
 
+from hibachi_xyz.codec import json_dumps_bytes, json_loads
+from hibachi_xyz.encoding import Number, OrderPayloadEncoder
 from hibachi_xyz.helpers import create_with, default_api_url, default_data_api_url
+from hibachi_xyz.metadata import ContractMetadata
+from hibachi_xyz.numeric import as_number, decimal_json_loads, format_number
+from hibachi_xyz.ratelimit import EndpointClass, RateLimiter, classify_endpoint
+from hibachi_xyz.signing import EcdsaSigner, HmacSigner, Signer
+from hibachi_xyz.tracker import OrderTracker
+from hibachi_xyz.validation import OrderValidator
 
 
 def price_to_bytes(price: float, contract: FutureContract) -> bytes:
@@ -80,6 +91,25 @@ def price_to_bytes(price: float, contract: FutureContract) -> bytes:
     ).to_bytes(8, "big")
 
 
+def _create_session(
+    pool_size: int, max_retries: Union[int, Retry], keep_alive: bool
+) -> requests.Session:
+    """Create a session with its own connection pool.
+
+    Connections are kept alive between calls so only the first request to a host
+    pays for the TCP and TLS handshake.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=1, pool_maxsize=pool_size, max_retries=max_retries
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
+
+
 def _get_http_error(response: requests.Response) -> Optional[HibachiApiError]:
     """Check if the response is an error and return an exception if it is
     The builtin response.raise_for_status() does not show the server's response
@@ -90,6 +120,186 @@ def _get_http_error(response: requests.Response) -> Optional[HibachiApiError]:
     return None
 
 
+def _parse_exchange_info(exchange_info: Dict[str, Any]) -> ExchangeInfo:
+    return ExchangeInfo(
+        feeConfig=FeeConfig(**exchange_info["feeConfig"]),
+        futureContracts=[
+            create_with(FutureContract, contract)
+            for contract in exchange_info["futureContracts"]
+        ],
+        instantWithdrawalLimit=WithdrawalLimit(
+            **exchange_info["instantWithdrawalLimit"]
+        ),
+        maintenanceWindow=[
+            create_with(MaintenanceWindow, window)
+            for window in exchange_info["maintenanceWindow"]
+        ],
+        status=exchange_info["status"],
+    )
+
+
+def _parse_inventory(market_inventory: Dict[str, Any]) -> InventoryResponse:
+    return InventoryResponse(
+        crossChainAssets=[
+            create_with(CrossChainAsset, cca)
+            for cca in market_inventory["crossChainAssets"]
+        ],
+        feeConfig=FeeConfig(**market_inventory["feeConfig"]),
+        markets=[
+            Market(
+                contract=create_with(FutureContract, m["contract"]),
+                info=create_with(MarketInfo, m["info"]),
+            )
+            for m in market_inventory["markets"]
+        ],
+        tradingTiers=[
+            create_with(TradingTier, tt) for tt in market_inventory["tradingTiers"]
+        ],
+    )
+
+
+def _parse_prices(response: Dict[str, Any]) -> PriceResponse:
+    response["fundingRateEstimation"] = FundingRateEstimation(
+        **response["fundingRateEstimation"]
+    )
+    return create_with(PriceResponse, response)
+
+
+def _parse_trades(response: Dict[str, Any]) -> TradesResponse:
+    return TradesResponse(
+        trades=[
+            Trade(
+                price=t["price"],
+                quantity=t["quantity"],
+                takerSide=TakerSide(t["takerSide"]),
+                timestamp=t["timestamp"],
+            )
+            for t in response["trades"]
+        ]
+    )
+
+
+def _klines_path(
+    symbol: str,
+    interval: Interval,
+    from_ms: Optional[int] = None,
+    to_ms: Optional[int] = None,
+) -> str:
+    path = f"/market/data/klines?symbol={symbol}&interval={interval.value}"
+    if from_ms is not None:
+        path += f"&fromMs={from_ms}"
+    if to_ms is not None:
+        path += f"&toMs={to_ms}"
+    return path
+
+
+def _parse_klines(response: Dict[str, Any]) -> KlinesResponse:
+    return KlinesResponse(
+        klines=[create_with(Kline, kline) for kline in response["klines"]]
+    )
+
+
+def _parse_orderbook(response: Dict[str, Any]) -> OrderBook:
+    return OrderBook(
+        ask=[
+            OrderBookLevel(price=level["price"], quantity=level["quantity"])
+            for level in response["ask"]["levels"]
+        ],
+        bid=[
+            OrderBookLevel(price=level["price"], quantity=level["quantity"])
+            for level in response["bid"]["levels"]
+        ],
+    )
+
+
+def _parse_capital_history(response: Dict[str, Any]) -> CapitalHistory:
+    return CapitalHistory(
+        transactions=[create_with(Transaction, tx) for tx in response["transactions"]]
+    )
+
+
+def _parse_account_info(response: Dict[str, Any]) -> AccountInfo:
+    return AccountInfo(
+        assets=[create_with(Asset, asset) for asset in response["assets"]],
+        balance=response["balance"],
+        maximalWithdraw=response["maximalWithdraw"],
+        numFreeTransfersRemaining=response["numFreeTransfersRemaining"],
+        positions=[
+            create_with(Position, position) for position in response["positions"]
+        ],
+        totalOrderNotional=response["totalOrderNotional"],
+        totalPositionNotional=response["totalPositionNotional"],
+        totalUnrealizedFundingPnl=response["totalUnrealizedFundingPnl"],
+        totalUnrealizedPnl=response["totalUnrealizedPnl"],
+        totalUnrealizedTradingPnl=response["totalUnrealizedTradingPnl"],
+        tradeMakerFeeRate=response["tradeMakerFeeRate"],
+        tradeTakerFeeRate=response["tradeTakerFeeRate"],
+    )
+
+
+def _parse_account_trades(response: Dict[str, Any]) -> AccountTradesResponse:
+    return AccountTradesResponse(
+        trades=[create_with(AccountTrade, trade) for trade in response["trades"]]
+    )
+
+
+def _parse_settlements(response: Dict[str, Any]) -> SettlementsResponse:
+    return SettlementsResponse(
+        settlements=[
+            create_with(Settlement, settlement)
+            for settlement in response["settlements"]
+        ]
+    )
+
+
+def _parse_pending_orders(response: List[Dict[str, Any]]) -> PendingOrdersResponse:
+    return PendingOrdersResponse(
+        orders=[create_with(Order, order_data) for order_data in response]
+    )
+
+
+def _parse_order(response: Dict[str, Any]) -> Order:
+    return create_with(Order, response)
+
+
+def _chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, HibachiApiError):
+        return f"{error.status_code}: {error.message}"
+    return str(error)
+
+
+def _cancel_results(
+    order_ids: List[int], response: Dict[str, Any]
+) -> List[CancelResult]:
+    """
+    per order results of a batch of cancels, orders reported with an error or
+    missing from the response failed
+    """
+    results = []
+    entries = response.get("orders") or []
+    for i, order_id in enumerate(order_ids):
+        if i >= len(entries):
+            results.append(CancelResult(order_id, False, "no result in response"))
+            continue
+        entry = entries[i]
+        error = entry.get("error") or entry.get("errorCode")
+        results.append(
+            CancelResult(order_id, error is None, None if error is None else str(error))
+        )
+    return results
+
+
+def _parse_batch_response(result: Dict[str, Any]) -> BatchResponse:
+    result["orders"] = [
+        create_with(BatchResponseOrder, order) for order in result["orders"]
+    ]
+    return create_with(BatchResponse, result)
+
+
 class HibachiApiClient:
     """
     Example usage:
@@ -118,6 +328,23 @@ class HibachiApiClient:
         account_id: The account ID
         api_key: The API key
         private_key: The private key for the account
+        pool_size: Maximum number of pooled connections kept per host
+        keep_alive: Reuse connections between requests, disable to close after every call
+        timeout: Per-request timeout in seconds, either a single value or a (connect, read) tuple. None waits forever
+        max_retries: Number of retries or a `urllib3.util.retry.Retry` policy applied by the connection pools
+        signer: Signs request payloads instead of the signer derived from `private_key`
+        metadata_ttl: Seconds after which cached exchange metadata is refreshed, None keeps it until the next `get_exchange_info`
+        metadata_snapshot: JSON file exchange metadata is saved to, and loaded from at warm-up
+        metadata_snapshot_max_age: Seconds after which a snapshot is too old to be loaded at warm-up
+        warm_up: Load exchange metadata in the constructor instead of on the first order
+        rate_limiter: Paces requests per endpoint class, see `RateLimiter`. None sends immediately
+        order_tracker: Keeps the open orders locally so `update_order` needs no `get_order_details`, see `OrderTracker`
+        validate_orders: Check tick size, step size, minimum size and notional before signing, see `OrderValidator`
+        decimal_numbers: Parse prices, quantities and amounts of responses to `Decimal` instead of `str`, see `NUMERIC_FIELDS`
+        connection_pools: Create the connection pools, disable for a client that only builds and signs requests
+
+    The client owns one connection pool for `api_url` and one for `data_api_url`.
+    Call `close()` (or use the client as a context manager) to release them.
 
     """
 
@@ -126,10 +353,17 @@ class HibachiApiClient:
     account_id: Optional[int] = None
     api_key: Optional[str] = None
 
-    _private_key: Optional[keys.PrivateKey] = None  # ECDSA for wallet account
-    _private_key_hmac: Optional[str] = None  # HMAC for web account
+    _signer: Optional[Signer] = None  # ECDSA for wallet account, HMAC for web account
 
     future_contracts: Optional[Dict[str, FutureContract]] = None
+    metadata: ContractMetadata
+
+    timeout: Optional[Union[float, Tuple[float, float]]] = None
+
+    # number of cancels per batch request of `cancel_orders`
+    cancel_batch_size = 50
+    # use `DELETE /trade/orders` in `cancel_all_orders` instead of batches of cancels
+    native_cancel_all = False
 
     def __init__(
         self,
@@ -138,9 +372,41 @@ class HibachiApiClient:
         account_id: Optional[int] = None,
         api_key: Optional[str] = None,
         private_key: Optional[str] = None,
+        pool_size: int = 10,
+        keep_alive: bool = True,
+        timeout: Optional[Union[float, Tuple[float, float]]] = None,
+        max_retries: Union[int, Retry] = 0,
+        signer: Optional[Signer] = None,
+        metadata_ttl: Optional[float] = None,
+        metadata_snapshot: Optional[str] = None,
+        metadata_snapshot_max_age: float = 3600,
+        warm_up: bool = False,
+        rate_limiter: Optional[RateLimiter] = None,
+        order_tracker: Optional[OrderTracker] = None,
+        validate_orders: bool = False,
+        decimal_numbers: bool = False,
+        connection_pools: bool = True,
     ):
         self.api_url = api_url
         self.data_api_url = data_api_url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self._api_session: Optional[requests.Session] = None
+        self._data_api_session: Optional[requests.Session] = None
+        if connection_pools:
+            self._api_session = _create_session(pool_size, max_retries, keep_alive)
+            self._data_api_session = _create_session(pool_size, max_retries, keep_alive)
+        self._order_encoders: Dict[str, OrderPayloadEncoder] = {}
+        self.metadata = ContractMetadata(
+            metadata_ttl, metadata_snapshot, metadata_snapshot_max_age
+        )
+        self.order_validator = (
+            OrderValidator(self.metadata) if validate_orders else None
+        )
+        self.decimal_numbers = decimal_numbers
+        self._json_loads = decimal_json_loads if decimal_numbers else json_loads
+        self.rate_limiter = rate_limiter
+        self.order_tracker = order_tracker
         self.account_id = (
             int(account_id)
             if isinstance(account_id, str) and account_id.isdigit()
@@ -149,6 +415,32 @@ class HibachiApiClient:
         self.api_key = api_key
         if private_key is not None:
             self.set_private_key(private_key)
+        if signer is not None:
+            self.set_signer(signer)
+        if warm_up:
+            self.warm_up()
+
+    def warm_up(self):
+        """
+        Load exchange metadata ahead of the first order, from the snapshot when
+        there is a fresh one and from the API otherwise
+        """
+        if self.metadata.load():
+            self._metadata_updated()
+        if self.metadata.is_stale():
+            self.get_exchange_info()
+
+    def close(self):
+        """Close the pooled connections to the API and data API"""
+        for session in (self._api_session, self._data_api_session):
+            if session is not None:
+                session.close()
+
+    def __enter__(self) -> "HibachiApiClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def set_account_id(self, account_id: int):
         self.account_id = account_id
@@ -158,12 +450,14 @@ class HibachiApiClient:
 
     def set_private_key(self, private_key: str):
         if private_key.startswith("0x"):
-            private_key = private_key[2:]
-            private_key_bytes = bytes.fromhex(private_key)
-            self._private_key = keys.PrivateKey(private_key_bytes)
+            private_key_bytes = bytes.fromhex(private_key[2:])
+            self._signer = EcdsaSigner(keys.PrivateKey(private_key_bytes))
+        else:
+            self._signer = HmacSigner(private_key)
 
-        if private_key.startswith("0x") == False:
-            self._private_key_hmac = private_key
+    def set_signer(self, signer: Signer):
+        """Sign requests with a custom signer, e.g. a `ProcessPoolSigner`"""
+        self._signer = signer
 
     """ Market API endpoints, can be called without having an account """
 
@@ -194,43 +488,11 @@ class HibachiApiClient:
         ```
 
         """
-        exchange_info = self.__send_simple_request("/market/exchange-info")
-
-        self.future_contracts = {}
-        for contract in exchange_info["futureContracts"]:
-            self.future_contracts[contract["symbol"]] = create_with(
-                FutureContract, contract
-            )
-
-        fee_config = FeeConfig(**exchange_info["feeConfig"])
-
-        # Parse future contracts
-        future_contracts = [
-            create_with(FutureContract, contract)
-            for contract in exchange_info["futureContracts"]
-        ]
-
-        # Parse withdrawal limit
-        withdrawal_limit = WithdrawalLimit(**exchange_info["instantWithdrawalLimit"])
-
-        # Parse maintenance windows
-        maintenance_windows = [
-            create_with(MaintenanceWindow, window)
-            for window in exchange_info["maintenanceWindow"]
-        ]
-
-        # Create exchange info object
-        return ExchangeInfo(
-            feeConfig=fee_config,
-            futureContracts=future_contracts,
-            instantWithdrawalLimit=withdrawal_limit,
-            maintenanceWindow=maintenance_windows,
-            status=exchange_info["status"],
+        exchange_info = _parse_exchange_info(
+            self.__send_simple_request("/market/exchange-info")
         )
-
-        # exchange_info_types = create_with(ExchangeInfo, exchange_info)
-
-        # return exchange_info_types
+        self._set_future_contracts(exchange_info.futureContracts)
+        return exchange_info
 
     def get_inventory(self) -> InventoryResponse:
         """
@@ -294,40 +556,14 @@ class HibachiApiClient:
         }
         ```
         """
-        market_inventory = self.__send_simple_request("/market/inventory")
-
-        self.future_contracts = {}
-        for market in market_inventory["markets"]:
-            contract = FutureContract(**market["contract"])
-            self.future_contracts[contract.symbol] = contract
-
-        markets = [
-            Market(
-                contract=FutureContract(**m["contract"]), info=MarketInfo(**m["info"])
-            )
-            for m in market_inventory["markets"]
-        ]
-
-        output = InventoryResponse(
-            crossChainAssets=[
-                create_with(CrossChainAsset, cca)
-                for cca in market_inventory["crossChainAssets"]
-            ],
-            feeConfig=FeeConfig(**market_inventory["feeConfig"]),
-            markets=markets,
-            tradingTiers=[
-                create_with(TradingTier, tt) for tt in market_inventory["tradingTiers"]
-            ],
-        )
-
-        return output
+        inventory = _parse_inventory(self.__send_simple_request("/market/inventory"))
+        self._set_future_contracts([market.contract for market in inventory.markets])
+        return inventory
 
     def get_prices(self, symbol: str) -> PriceResponse:
-        response = self.__send_simple_request(f"/market/data/prices?symbol={symbol}")
-        response["fundingRateEstimation"] = FundingRateEstimation(
-            **response["fundingRateEstimation"]
+        return _parse_prices(
+            self.__send_simple_request(f"/market/data/prices?symbol={symbol}")
         )
-        return create_with(PriceResponse, response)
 
     def get_stats(self, symbol: str) -> StatsResponse:
         return StatsResponse(
@@ -335,27 +571,34 @@ class HibachiApiClient:
         )
 
     def get_trades(self, symbol: str) -> TradesResponse:
-        response = self.__send_simple_request(f"/market/data/trades?symbol={symbol}")
-        return TradesResponse(
-            trades=[
-                Trade(
-                    price=t["price"],
-                    quantity=t["quantity"],
-                    takerSide=TakerSide(t["takerSide"]),
-                    timestamp=t["timestamp"],
-                )
-                for t in response["trades"]
-            ]
-        )
+        return _parse_trades(self._get_trades_data(symbol))
 
-    def get_klines(self, symbol: str, interval: Interval) -> KlinesResponse:
-        response = self.__send_simple_request(
-            f"/market/data/klines?symbol={symbol}&interval={interval.value}"
-        )
-        return KlinesResponse(
-            klines=[create_with(Kline, kline) for kline in response["klines"]]
+    def get_klines(
+        self,
+        symbol: str,
+        interval: Interval,
+        from_ms: Optional[int] = None,
+        to_ms: Optional[int] = None,
+    ) -> KlinesResponse:
+        """Get one page of klines, optionally limited to a time range in milliseconds.
+        Use `HistoryLoader` to fetch longer ranges.
+        """
+        return _parse_klines(self._get_klines_data(symbol, interval, from_ms, to_ms))
+
+    def _get_klines_data(
+        self,
+        symbol: str,
+        interval: Interval,
+        from_ms: Optional[int] = None,
+        to_ms: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        return self.__send_simple_request(
+            _klines_path(symbol, interval, from_ms, to_ms)
         )
 
+    def _get_trades_data(self, symbol: str) -> Dict[str, Any]:
+        return self.__send_simple_request(f"/market/data/trades?symbol={symbol}")
+
     def get_open_interest(self, symbol: str) -> OpenInterestResponse:
         """Get open interest for a symbol
 
@@ -402,35 +645,8 @@ class HibachiApiClient:
 
         -----------------------------------------------------------------------
         """
-        depth = int(depth)
-        if depth < 1 or depth > 100:
-            raise ValueError(
-                "Depth must be a positive integer between 1 and 100, inclusive"
-            )
-
-        self.__check_symbol(symbol)
-
-        contract = self.future_contracts.get(symbol)
-        granularities = contract.orderbookGranularities
-        if str(granularity) not in granularities:
-            raise ValueError(
-                f"Granularity for symbol {symbol} must be one of {granularities}"
-            )
-
-        response = self.__send_simple_request(
-            f"/market/data/orderbook?symbol={symbol}&depth={depth}&granularity={granularity}"
-        )
-
-        ask_levels = [
-            OrderBookLevel(price=level["price"], quantity=level["quantity"])
-            for level in response["ask"]["levels"]
-        ]
-        bid_levels = [
-            OrderBookLevel(price=level["price"], quantity=level["quantity"])
-            for level in response["bid"]["levels"]
-        ]
-
-        return OrderBook(ask=ask_levels, bid=bid_levels)
+        path = self._orderbook_path(symbol, depth, granularity)
+        return _parse_orderbook(self.__send_simple_request(path))
 
     ### ===================================================== Account API =====================================================
 
@@ -494,14 +710,10 @@ class HibachiApiClient:
         -----------------------------------------------------------------------
         """
         self.__check_auth_data()
-        response = self.__send_authorized_request(
-            "GET", f"/capital/history?accountId={self.account_id}"
-        )
-
-        return CapitalHistory(
-            transactions=[
-                create_with(Transaction, tx) for tx in response["transactions"]
-            ]
+        return _parse_capital_history(
+            self.__send_authorized_request(
+                "GET", f"/capital/history?accountId={self.account_id}"
+            )
         )
 
     def withdraw(
@@ -538,7 +750,7 @@ class HibachiApiClient:
             network=network,
             quantity=quantity,
             maxFees=max_fees,
-            signature=self.__sign_withdraw_payload(
+            signature=self._sign_withdraw_payload(
                 coin, withdraw_address, quantity, max_fees
             ),
         )
@@ -569,7 +781,7 @@ class HibachiApiClient:
             dstPublicKey=dstPublicKey.replace("0x", ""),
             fees=max_fees,
             quantity=quantity,
-            signature=self.__sign_transfer_payload(
+            signature=self._sign_transfer_payload(
                 nonce, coin, quantity, dstPublicKey, max_fees
             ),
         )
@@ -602,7 +814,7 @@ class HibachiApiClient:
         )
         return create_with(DepositInfo, response)
 
-    def __sign_withdraw_payload(
+    def _sign_withdraw_payload(
         self, coin: str, withdraw_address: str, quantity: str, max_fees: str
     ) -> str:
         """Sign a withdrawal request payload.
@@ -616,19 +828,7 @@ class HibachiApiClient:
         Returns:
             str: The signature for the withdrawal request
         """
-        # Get asset ID from exchange info
-        if self.future_contracts is None:
-            self.get_exchange_info()
-
-        # Find asset ID for the coin
-        asset_id = None
-        for contract in self.future_contracts.values():
-            if contract.settlementSymbol == coin:
-                asset_id = contract.id
-                break
-
-        if asset_id is None:
-            raise ValueError(f"Unknown coin: {coin}")
+        asset_id = self._asset_id(coin)
 
         # Create payload bytes
         asset_id_bytes = asset_id.to_bytes(4, "big")
@@ -646,7 +846,7 @@ class HibachiApiClient:
         # Sign payload
         return self.__sign_payload(payload)
 
-    def __sign_transfer_payload(
+    def _sign_transfer_payload(
         self,
         nonce: int,
         coin: str,
@@ -654,19 +854,7 @@ class HibachiApiClient:
         dst_account_public_key: str,
         max_fees_percent: str,
     ) -> str:
-        # Get asset ID from exchange info
-        if self.future_contracts is None:
-            self.get_exchange_info()
-
-        # Find asset ID for the coin
-        asset_id = None
-        for contract in self.future_contracts.values():
-            if contract.settlementSymbol == coin:
-                asset_id = contract.id
-                break
-
-        if asset_id is None:
-            raise ValueError(f"Unknown coin: {coin}")
+        asset_id = self._asset_id(coin)
 
         # Create payload bytes
         nonce_bytes = nonce.to_bytes(8, "big")
@@ -737,28 +925,10 @@ class HibachiApiClient:
         -----------------------------------------------------------------------
         """
         self.__check_auth_data()
-        response = self.__send_authorized_request(
-            "GET", f"/trade/account/info?accountId={self.account_id}"
-        )
-
-        assets = [create_with(Asset, asset) for asset in response["assets"]]
-        positions = [
-            create_with(Position, position) for position in response["positions"]
-        ]
-
-        return AccountInfo(
-            assets=assets,
-            balance=response["balance"],
-            maximalWithdraw=response["maximalWithdraw"],
-            numFreeTransfersRemaining=response["numFreeTransfersRemaining"],
-            positions=positions,
-            totalOrderNotional=response["totalOrderNotional"],
-            totalPositionNotional=response["totalPositionNotional"],
-            totalUnrealizedFundingPnl=response["totalUnrealizedFundingPnl"],
-            totalUnrealizedPnl=response["totalUnrealizedPnl"],
-            totalUnrealizedTradingPnl=response["totalUnrealizedTradingPnl"],
-            tradeMakerFeeRate=response["tradeMakerFeeRate"],
-            tradeTakerFeeRate=response["tradeTakerFeeRate"],
+        return _parse_account_info(
+            self.__send_authorized_request(
+                "GET", f"/trade/account/info?accountId={self.account_id}"
+            )
         )
 
     def get_account_trades(self) -> AccountTradesResponse:
@@ -796,11 +966,11 @@ class HibachiApiClient:
         -----------------------------------------------------------------------
         """
         self.__check_auth_data()
-        response = self.__send_authorized_request(
-            "GET", f"/trade/account/trades?accountId={self.account_id}"
+        return _parse_account_trades(
+            self.__send_authorized_request(
+                "GET", f"/trade/account/trades?accountId={self.account_id}"
+            )
         )
-        trades = [create_with(AccountTrade, trade) for trade in response["trades"]]
-        return AccountTradesResponse(trades=trades)
 
     def get_settlements_history(self) -> SettlementsResponse:
         """
@@ -829,14 +999,11 @@ class HibachiApiClient:
         -----------------------------------------------------------------------
         """
         self.__check_auth_data()
-        response = self.__send_authorized_request(
-            "GET", f"/trade/account/settlements_history?accountId={self.account_id}"
+        return _parse_settlements(
+            self.__send_authorized_request(
+                "GET", f"/trade/account/settlements_history?accountId={self.account_id}"
+            )
         )
-        settlements = [
-            create_with(Settlement, settlement)
-            for settlement in response["settlements"]
-        ]
-        return SettlementsResponse(settlements=settlements)
 
     def get_pending_orders(self) -> PendingOrdersResponse:
         """
@@ -874,11 +1041,14 @@ class HibachiApiClient:
         -----------------------------------------------------------------------
         """
         self.__check_auth_data()
-        response = self.__send_authorized_request(
-            "GET", f"/trade/orders?accountId={self.account_id}"
+        pending_orders = _parse_pending_orders(
+            self.__send_authorized_request(
+                "GET", f"/trade/orders?accountId={self.account_id}"
+            )
         )
-        orders = [create_with(Order, order_data) for order_data in response]
-        return PendingOrdersResponse(orders=orders)
+        if self.order_tracker is not None:
+            self.order_tracker.load(pending_orders.orders)
+        return pending_orders
 
     def get_order_details(
         self, order_id: Optional[int] = None, nonce: Optional[int] = None
@@ -919,26 +1089,20 @@ class HibachiApiClient:
         ```
         -----------------------------------------------------------------------
         """
-        self.__check_order_selector(order_id, nonce)
+        self._check_order_selector(order_id, nonce)
         self.__check_auth_data()
 
         order_selector = (
             f"orderId={order_id}" if order_id is not None else f"nonce={nonce}"
         )
-        response = self.__send_authorized_request(
-            "GET", f"/trade/order?accountId={self.account_id}&{order_selector}"
+        order = _parse_order(
+            self.__send_authorized_request(
+                "GET", f"/trade/order?accountId={self.account_id}&{order_selector}"
+            )
         )
-
-        response["numOrdersTotal"] = response.get("numOrdersTotal")
-        response["numOrdersRemaining"] = response.get("numOrdersRemaining")
-        response["totalQuantity"] = response.get("totalQuantity")
-        response["quantityMode"] = response.get("quantityMode")
-        response["price"] = response.get("price")
-        response["triggerPrice"] = response.get("triggerPrice")
-        response["finishTime"] = response.get("finishTime")
-        response["orderFlags"] = response.get("orderFlags")
-
-        return create_with(Order, response)
+        if self.order_tracker is not None:
+            self.order_tracker.upsert(order, nonce)
+        return order
 
     # Order API endpoints require the private key to be set
 
@@ -1013,6 +1177,9 @@ class HibachiApiClient:
             "POST", f"/trade/order", json=request_data
         )
         order_id = int(response["orderId"])
+        self._track_placed(
+            nonce, order_id, symbol, side, quantity, None, trigger_price, order_flags
+        )
         return (nonce, order_id)
 
     def place_limit_order(
@@ -1079,6 +1246,9 @@ class HibachiApiClient:
             "POST", f"/trade/order", json=request_data
         )
         order_id = int(response["orderId"])
+        self._track_placed(
+            nonce, order_id, symbol, side, quantity, price, trigger_price, order_flags
+        )
         return (nonce, order_id)
 
     def _place_parent_with_tpsl(
@@ -1093,6 +1263,51 @@ class HibachiApiClient:
         order_flags: Optional[OrderFlags] = None,
         tpsl: Optional[TPSLConfig] = None,
     ) -> tuple[Nonce, OrderId]:
+        request_data = self._tpsl_request_data(
+            symbol=symbol,
+            quantity=quantity,
+            price=price,
+            side=side,
+            max_fees_percent=max_fees_percent,
+            trigger_price=trigger_price,
+            creation_deadline=creation_deadline,
+            order_flags=order_flags,
+            tpsl=tpsl,
+        )
+
+        result = _parse_batch_response(
+            self.__send_authorized_request("POST", f"/trade/orders", json=request_data)
+        )
+        if len(result.orders) < 1:
+            raise RuntimeError(
+                f"Received empty response to batch order request {request_data=}"
+            )
+        parent_order: BatchResponseOrder = result.orders[0]
+        self._track_placed(
+            parent_order.nonce,
+            parent_order.orderId,
+            symbol,
+            side,
+            quantity,
+            price,
+            trigger_price,
+            order_flags,
+        )
+        return (parent_order.nonce, parent_order.orderId)
+
+    def _tpsl_request_data(
+        self,
+        symbol: str,
+        quantity: float,
+        price: Optional[float],
+        side: Side,
+        max_fees_percent: float,
+        trigger_price: Optional[float],
+        creation_deadline: Optional[int],
+        order_flags: Optional[OrderFlags],
+        tpsl: TPSLConfig,
+    ) -> Dict[str, Any]:
+        """used to build the batch request placing a parent order with its tp/sl children"""
         parent_order_request = CreateOrder(
             symbol=symbol,
             quantity=quantity,
@@ -1114,23 +1329,9 @@ class HibachiApiClient:
             max_fees_percent=max_fees_percent,
         )
 
-        orders = [parent_order_request] + tpsl_order_requests
-        orders_data = [
-            self.__batch_order_request_data(nonce + i, order)
-            for (i, order) in enumerate(orders)
-        ]
-        request_data = {"accountId": int(self.account_id), "orders": orders_data}
-
-        result = self.__send_authorized_request(
-            "POST", f"/trade/orders", json=request_data
+        return self._batch_orders_request_data(
+            [parent_order_request] + tpsl_order_requests, nonce
         )
-        orders = [create_with(BatchResponseOrder, order) for order in result["orders"]]
-        if len(orders) < 1:
-            raise RuntimeError(
-                f"Received empty response to batch order request {request_data=}"
-            )
-        parent_order: BatchResponseOrder = orders[0]
-        return (parent_order.nonce, parent_order.orderId)
 
     def update_order(
         self,
@@ -1155,8 +1356,9 @@ class HibachiApiClient:
         ```
         """
         self.__check_auth_data()
-        order = self.get_order_details(order_id=order_id)
-        symbol = order.symbol
+        order = self._tracked_order(order_id)
+        if order is None:
+            order = self.get_order_details(order_id=order_id)
 
         request_data_two = self._update_order_generate_sig(
             order,
@@ -1168,9 +1370,44 @@ class HibachiApiClient:
             creation_deadline=creation_deadline,
         )
 
-        return self.__send_authorized_request(
+        response = self.__send_authorized_request(
             "PUT", f"/trade/order", json=request_data_two
         )
+        if self.order_tracker is not None:
+            self.order_tracker.modified(order_id, quantity, price, trigger_price)
+        return response
+
+    def _tracked_order(self, order_id: int) -> Optional[Order]:
+        if self.order_tracker is None:
+            return None
+        return self.order_tracker.get(order_id)
+
+    def _track_placed(
+        self,
+        nonce: Nonce,
+        order_id: OrderId,
+        symbol: str,
+        side: Side,
+        quantity: float,
+        price: Optional[float],
+        trigger_price: Optional[float],
+        order_flags: Optional[OrderFlags],
+    ):
+        if self.order_tracker is None:
+            return
+        contract = self.metadata.by_symbol.get(symbol)
+        self.order_tracker.placed(
+            nonce,
+            order_id,
+            symbol,
+            side,
+            quantity,
+            price,
+            trigger_price,
+            order_flags,
+            account_id=self.account_id,
+            contract_id=None if contract is None else contract.id,
+        )
 
     def _update_order_generate_sig(
         self,
@@ -1191,16 +1428,16 @@ class HibachiApiClient:
             raise ValueError("Can not update price for a market order")
 
         if order.orderType == "LIMIT" and price is None:
-            price = float(order.price)
+            price = as_number(order.price)
 
         if order.triggerPrice is None and trigger_price is not None:
             raise ValueError("Can not update trigger price for a non trigger order")
 
         if order.triggerPrice is not None and trigger_price is None:
-            trigger_price = float(order.triggerPrice)
+            trigger_price = as_number(order.triggerPrice)
 
         if quantity is None:
-            quantity = float(order.totalQuantity)
+            quantity = as_number(order.totalQuantity)
 
         side = Side(order.side)
 
@@ -1237,43 +1474,108 @@ class HibachiApiClient:
         client.cancel_order(nonce=1234567)
         ```
         """
-        self.__check_order_selector(order_id, nonce)
+        self._check_order_selector(order_id, nonce)
         self.__check_auth_data()
 
         request_data = self._cancel_order_request_data(order_id, nonce, True)
         request_data["accountId"] = int(self.account_id)
-        return self.__send_authorized_request(
+        response = self.__send_authorized_request(
             "DELETE", f"/trade/order", json=request_data
         )
+        if self.order_tracker is not None:
+            self.order_tracker.removed(order_id, nonce)
+        return response
 
-    def cancel_all_orders(self, contractId: Optional[int] = None) -> Dict[str, Any]:
+    def cancel_all_orders(
+        self, contractId: Optional[int] = None, batch_size: Optional[int] = None
+    ) -> CancelAllResponse:
         """
-        Cancel all orders
+        Cancel all orders, or all orders of a contract
 
-        Endpoint: `DELETE /trade/orders`
+        Endpoint: `POST /trade/orders` with batches of cancels, `DELETE /trade/orders`
+        with `native_cancel_all`
 
         ```python
-        client.cancel_all_orders()
+        response = client.cancel_all_orders()
+        for result in response.failed:
+            print(f"{result.orderId} not cancelled: {result.error}")
         ```
 
         Note: currently there is a bug in the API where cancelling all orders is not working.
-        This is a workaround to cancel all orders.
+        As a workaround the pending orders are cancelled with `cancel_orders`, in signed
+        batches of `batch_size` that are sent concurrently. Set `native_cancel_all` once
+        the endpoint works; it does not report the cancelled orders, so `results` is
+        then empty.
         """
-        workaround = True
-
-        if workaround:
+        self.__check_auth_data()
+        if not self.native_cancel_all:
             orders = self.get_pending_orders().orders
-            for order in orders:
-                self.cancel_order(order_id=int(order.orderId))
-            return
+            return self.cancel_orders(
+                [
+                    int(order.orderId)
+                    for order in orders
+                    if contractId is None or order.contractId == contractId
+                ],
+                batch_size,
+            )
+
+        nonce = time_ns() // 1_000
+        request_data = self._cancel_order_request_data(None, nonce, False)
+        request_data["accountId"] = int(self.account_id)
+        if contractId is not None:
+            request_data["contractId"] = contractId
+        self.__send_authorized_request("DELETE", f"/trade/orders", json=request_data)
+        if self.order_tracker is not None:
+            self.order_tracker.clear(contractId)
+        return CancelAllResponse(results=[])
+
+    def cancel_orders(
+        self, order_ids: List[int], batch_size: Optional[int] = None
+    ) -> CancelAllResponse:
+        """
+        Cancel orders by id with `POST /trade/orders` batches of at most `batch_size`
+        cancels (`cancel_batch_size` by default), sent concurrently.
+        A batch that fails is reported as failed for each of its orders.
+        """
+        self.__check_auth_data()
+        chunks = _chunks(order_ids, batch_size or self.cancel_batch_size)
+        if not chunks:
+            return CancelAllResponse(results=[])
+
+        nonce = time_ns() // 1_000
+        if len(chunks) == 1:
+            results = [self._cancel_chunk(chunks[0], nonce)]
         else:
-            self.__check_auth_data()
-            nonce = time_ns() // 1_000
-            request_data = self._cancel_order_request_data(None, nonce, False)
-            request_data["accountId"] = int(self.account_id)
-            return self.__send_authorized_request(
-                "DELETE", f"/trade/orders", json=request_data
+            workers = min(len(chunks), self.pool_size)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                # the orders of all chunks are signed with distinct nonces
+                offsets = itertools.accumulate([0] + [len(c) for c in chunks[:-1]])
+                results = list(
+                    pool.map(
+                        self._cancel_chunk,
+                        chunks,
+                        [nonce + offset for offset in offsets],
+                    )
+                )
+        response = CancelAllResponse(results=[r for chunk in results for r in chunk])
+        if self.order_tracker is not None:
+            for result in response.results:
+                if result.cancelled:
+                    self.order_tracker.removed(result.orderId)
+        return response
+
+    def _cancel_chunk(self, order_ids: List[int], nonce: int) -> List[CancelResult]:
+        request_data = self._batch_orders_request_data(
+            [CancelOrder(order_id=order_id) for order_id in order_ids], nonce
+        )
+        try:
+            response = self.__send_authorized_request(
+                "POST", f"/trade/orders", json=request_data
             )
+        except (HibachiApiError, requests.RequestException) as e:
+            message = _error_message(e)
+            return [CancelResult(order_id, False, message) for order_id in order_ids]
+        return _cancel_results(order_ids, response)
 
     def batch_orders(
         self, orders: list[CreateOrder | UpdateOrder | CancelOrder]
@@ -1323,28 +1625,51 @@ class HibachiApiClient:
         """
         self.__check_auth_data()
 
-        nonce = time_ns() // 1_000
-        orders_data = [
-            self.__batch_order_request_data(nonce + i, order)
-            for (i, order) in enumerate(orders)
-        ]
-        request_data = {"accountId": int(self.account_id), "orders": orders_data}
-
-        result = self.__send_authorized_request(
-            "POST", f"/trade/orders", json=request_data
+        request_data = self._batch_orders_request_data(orders)
+        result = _parse_batch_response(
+            self.__send_authorized_request("POST", f"/trade/orders", json=request_data)
         )
-        orders = [create_with(BatchResponseOrder, order) for order in result["orders"]]
-        result["orders"] = orders
-        return create_with(BatchResponse, result)
+        if self.order_tracker is not None:
+            self.order_tracker.apply_batch(
+                orders, result, self.account_id, self.metadata.by_symbol
+            )
+        return result
 
     """ Private helpers """
 
+    def _request(
+        self,
+        session: Optional[requests.Session],
+        endpoint_class: EndpointClass,
+        method: str,
+        url: str,
+        **kwargs: Any,
+    ) -> requests.Response:
+        if session is None:
+            raise RuntimeError("Client was created without connection pools")
+        limiter = self.rate_limiter
+        if limiter is None:
+            return session.request(method, url, timeout=self.timeout, **kwargs)
+
+        for _ in range(limiter.max_retries + 1):
+            limiter.acquire(endpoint_class)
+            response = session.request(method, url, timeout=self.timeout, **kwargs)
+            limiter.feedback(endpoint_class, response.status_code, response.headers)
+            if response.status_code != 429:
+                break
+        return response
+
     def __send_simple_request(self, path: str) -> Any:
-        response = requests.get(f"{self.data_api_url}{path}")
+        response = self._request(
+            self._data_api_session,
+            EndpointClass.MARKET_DATA,
+            "GET",
+            f"{self.data_api_url}{path}",
+        )
         error = _get_http_error(response)
         if error is not None:
             raise error
-        return response.json()
+        return self._json_loads(response.content)
 
     def __check_auth_data(self):
         if self.account_id is None:
@@ -1362,84 +1687,113 @@ class HibachiApiClient:
             "Accept": "application/json",
         }
 
-        response = requests.request(
-            method, f"{self.api_url}{path}", headers=headers, json=json
+        response = self._request(
+            self._api_session,
+            classify_endpoint(method, path),
+            method,
+            f"{self.api_url}{path}",
+            headers=headers,
+            data=None if json is None else json_dumps_bytes(json),
         )
         error = _get_http_error(response)
         if error is not None:
             raise error
 
-        return response.json()
+        return self._json_loads(response.content)
+
+    def _set_future_contracts(self, contracts: List[FutureContract]):
+        self.metadata.update(contracts)
+        if self.metadata.snapshot_path is not None:
+            try:
+                self.metadata.save()
+            except OSError as e:
+                # the fetched metadata is in use, only the next cold start misses it
+                print(f"[HibachiApiClient] Could not save the metadata snapshot: {e}")
+        self._metadata_updated()
+
+    def _metadata_updated(self):
+        by_symbol = self.metadata.by_symbol
+        self.future_contracts = by_symbol
+        # encoders of unchanged contracts are kept, the others are rebuilt on demand
+        self._order_encoders = {
+            symbol: encoder
+            for symbol, encoder in self._order_encoders.items()
+            if encoder.contract is by_symbol.get(symbol)
+        }
 
-    def __check_symbol(self, symbol: str):
-        if self.future_contracts is None:
+    def _ensure_metadata(self):
+        if self.metadata.is_stale():
             self.get_exchange_info()
 
+    def _asset_id(self, coin: str) -> int:
+        """Asset ID of a settlement coin"""
+        self._ensure_metadata()
+        contract = self.metadata.by_settlement_symbol.get(coin)
+        if contract is None:
+            raise ValueError(f"Unknown coin: {coin}")
+        return contract.id
+
+    def _order_encoder(self, contract: FutureContract) -> OrderPayloadEncoder:
+        encoder = self._order_encoders.get(contract.symbol)
+        if encoder is None or encoder.contract is not contract:
+            encoder = OrderPayloadEncoder(contract)
+            self._order_encoders[contract.symbol] = encoder
+        return encoder
+
+    def __check_symbol(self, symbol: str):
+        self._ensure_metadata()
+
         if self.future_contracts.get(symbol) is None:
             raise ValueError(f"Unknown symbol: {symbol}")
 
-    def __check_order_selector(self, order_id: Optional[int], nonce: Optional[int]):
+    def _orderbook_path(self, symbol: str, depth: int, granularity: float) -> str:
+        """Validate the orderbook query and return the request path"""
+        depth = int(depth)
+        if depth < 1 or depth > 100:
+            raise ValueError(
+                "Depth must be a positive integer between 1 and 100, inclusive"
+            )
+
+        self.__check_symbol(symbol)
+
+        contract = self.future_contracts.get(symbol)
+        granularities = contract.orderbookGranularities
+        if str(granularity) not in granularities:
+            raise ValueError(
+                f"Granularity for symbol {symbol} must be one of {granularities}"
+            )
+
+        return f"/market/data/orderbook?symbol={symbol}&depth={depth}&granularity={granularity}"
+
+    def _check_order_selector(self, order_id: Optional[int], nonce: Optional[int]):
         if order_id is None and nonce is None:
             raise ValueError("Either order_id or nonce must be provided")
         # if order_id is not None and nonce is not None:
         #     raise ValueError("Only one of order_id or nonce must be provided")
 
     def __sign_payload(self, payload: bytes) -> str:
-        if self._private_key:
-            # Hash the payload
-            message_hash = sha256(payload).digest()
-
-            # Sign the hash
-            signed_message = self._private_key.sign_msg_hash(message_hash)
-
-            # Extract signature components
-            r = signed_message.r.to_bytes(32, "big")
-            s = signed_message.s.to_bytes(32, "big")
-            v = signed_message.v.to_bytes(1, "big")
+        if self._signer is None:
+            raise RuntimeError("Private key is not set")
+        return self._signer.sign(payload)
 
-            # Combine to form the signature
-            signature_hex = r.hex() + s.hex() + v.hex()
-
-            return signature_hex
-
-        if self._private_key_hmac:
-            return hmac.new(
-                self._private_key_hmac.encode(), payload, sha256
-            ).hexdigest()
-
-        raise RuntimeError("Private key is not set")
+    def __sign_many(self, payloads: List[bytes]) -> List[str]:
+        if self._signer is None:
+            raise RuntimeError("Private key is not set")
+        return self._signer.sign_many(payloads)
 
     def __create_or_update_order_payload(
         self,
         contract: FutureContract,
         nonce: int,
-        quantity: float,
+        quantity: Number,
         side: Side,
-        max_fees_percent: float,
-        price: Optional[float],
+        max_fees_percent: Number,
+        price: Optional[Number],
     ) -> bytes:
-        contract_id = contract.id
-
-        nonce_bytes = nonce.to_bytes(8, "big")
-        contract_id_bytes = contract_id.to_bytes(4, "big")
-        quantity_bytes = int(quantity * pow(10, contract.underlyingDecimals)).to_bytes(
-            8, "big"
-        )
-        price_bytes = b"" if price is None else price_to_bytes(price, contract)
-        side_bytes = (0 if side.value == "ASK" else 1).to_bytes(4, "big")
-        max_fees_percent_bytes = int(max_fees_percent * pow(10, 8)).to_bytes(8, "big")
-
-        payload = (
-            nonce_bytes
-            + contract_id_bytes
-            + quantity_bytes
-            + side_bytes
-            + price_bytes
-            + max_fees_percent_bytes
+        return self._order_encoder(contract).encode(
+            nonce, quantity, side, max_fees_percent, price
         )
 
-        return payload
-
     def _create_order_request_data(
         self,
         nonce: int,
@@ -1455,13 +1809,48 @@ class HibachiApiClient:
         order_flags: Optional[OrderFlags] = None,
         trigger_direction: Optional[TriggerDirection] = None,
     ) -> Dict[str, Any]:
+        if self.order_validator is not None:
+            self.__check_symbol(symbol)
+            self.order_validator.check_order(symbol, quantity, price, trigger_price)
+        payload, request = self.__create_order_request(
+            nonce,
+            symbol,
+            quantity,
+            side,
+            max_fees_percent,
+            trigger_price,
+            price,
+            creation_deadline,
+            twap_config=twap_config,
+            parent_order=parent_order,
+            order_flags=order_flags,
+            trigger_direction=trigger_direction,
+        )
+        request["signature"] = self.__sign_payload(payload)
+        return request
+
+    def __create_order_request(
+        self,
+        nonce: int,
+        symbol: str,
+        quantity: float,
+        side: Side,
+        max_fees_percent: float,
+        trigger_price: Optional[float],
+        price: Optional[float],
+        creation_deadline: Optional[int],
+        twap_config: Optional[TWAPConfig] = None,
+        parent_order: Optional[OrderIdVariant] = None,
+        order_flags: Optional[OrderFlags] = None,
+        trigger_direction: Optional[TriggerDirection] = None,
+    ) -> Tuple[bytes, Dict[str, Any]]:
+        """returns the payload to sign and the unsigned request"""
         self.__check_auth_data()
         self.__check_symbol(symbol)
         contract = self.future_contracts.get(symbol)
         payload = self.__create_or_update_order_payload(
             contract, nonce, quantity, side, max_fees_percent, price
         )
-        signature = self.__sign_payload(payload)
 
         if side == Side.BUY:
             side = Side.BID
@@ -1471,17 +1860,16 @@ class HibachiApiClient:
         request = {
             "nonce": nonce,
             "symbol": symbol,
-            "quantity": str(quantity),
+            "quantity": format_number(quantity),
             "orderType": "MARKET",
             "side": side.value,
-            "maxFeesPercent": str(max_fees_percent),
-            "signature": signature,
+            "maxFeesPercent": format_number(max_fees_percent),
         }
         if price is not None:
             request["orderType"] = "LIMIT"
-            request["price"] = str(price)
+            request["price"] = format_number(price)
         if trigger_price is not None:
-            request["triggerPrice"] = str(trigger_price)
+            request["triggerPrice"] = format_number(trigger_price)
             if trigger_direction is not None:
                 request["triggerDirection"] = trigger_direction.value
         if twap_config is not None:
@@ -1494,7 +1882,7 @@ class HibachiApiClient:
         if order_flags is not None:
             request["orderFlags"] = order_flags.value
 
-        return request
+        return payload, request
 
     def __update_order_request_data(
         self,
@@ -1509,32 +1897,61 @@ class HibachiApiClient:
         creation_deadline: Optional[int],
         order_flags: Optional[OrderFlags] = None,
     ) -> Dict[str, Any]:
+        if self.order_validator is not None:
+            self.order_validator.check_order(symbol, quantity, price, trigger_price)
+        payload, request = self.__update_order_request(
+            order_id,
+            nonce,
+            symbol,
+            quantity,
+            side,
+            max_fees_percent,
+            price,
+            trigger_price,
+            creation_deadline,
+            order_flags=order_flags,
+        )
+        request["signature"] = self.__sign_payload(payload)
+        return request
+
+    def __update_order_request(
+        self,
+        order_id: int,
+        nonce: int,
+        symbol: str,
+        quantity: float,
+        side: Side,
+        max_fees_percent: float,
+        price: Optional[float],
+        trigger_price: Optional[float],
+        creation_deadline: Optional[int],
+        order_flags: Optional[OrderFlags] = None,
+    ) -> Tuple[bytes, Dict[str, Any]]:
+        """returns the payload to sign and the unsigned request"""
         contract = self.future_contracts.get(symbol)
         payload = self.__create_or_update_order_payload(
             contract, nonce, quantity, side, max_fees_percent, price
         )
-        signature = self.__sign_payload(payload)
         request = {
             "nonce": nonce,
-            "updatedQuantity": str(quantity),
-            "quantity": str(quantity),
-            "maxFeesPercent": str(max_fees_percent),
-            "signature": signature,
+            "updatedQuantity": format_number(quantity),
+            "quantity": format_number(quantity),
+            "maxFeesPercent": format_number(max_fees_percent),
         }
         if price is not None:
-            request["updatedPrice"] = str(price)
-            request["price"] = str(price)
+            request["updatedPrice"] = format_number(price)
+            request["price"] = format_number(price)
         if order_id is not None:
             request["orderId"] = str(order_id)
         if trigger_price is not None:
-            request["updatedTriggerPrice"] = str(trigger_price)
-            request["trigger_price"] = str(trigger_price)
+            request["updatedTriggerPrice"] = format_number(trigger_price)
+            request["trigger_price"] = format_number(trigger_price)
         if creation_deadline is not None:
             deadline = floor(time()) + creation_deadline
             request["creationDeadline"] = deadline
         if order_flags is not None:
             request["orderFlags"] = order_flags.value
-        return request
+        return payload, request
 
     def __cancel_order_payload(
         self, order_id: Optional[int], nonce: Optional[int]
@@ -1546,22 +1963,55 @@ class HibachiApiClient:
     def _cancel_order_request_data(
         self, order_id: Optional[int], nonce: Optional[int], nonce_as_str: bool
     ) -> Dict[str, Any]:
+        payload, request = self.__cancel_order_request(order_id, nonce, nonce_as_str)
+        request["signature"] = self.__sign_payload(payload)
+        return request
+
+    def __cancel_order_request(
+        self, order_id: Optional[int], nonce: Optional[int], nonce_as_str: bool
+    ) -> Tuple[bytes, Dict[str, Any]]:
+        """returns the payload to sign and the unsigned request"""
         payload = self.__cancel_order_payload(order_id, nonce)
-        signature = self.__sign_payload(payload)
-        request = {"signature": signature}
+        request = {}
         if order_id is not None:
             request["orderId"] = str(order_id)
         elif nonce_as_str:
             request["nonce"] = str(nonce)
         else:
             request["nonce"] = nonce
-        return request
+        return payload, request
 
-    def __batch_order_request_data(
-        self, nonce: int, o: CreateOrder | UpdateOrder | CancelOrder
+    def _batch_orders_request_data(
+        self,
+        orders: List[CreateOrder | UpdateOrder | CancelOrder],
+        nonce: Optional[Nonce] = None,
     ) -> Dict[str, Any]:
+        """used to build the body of `POST /trade/orders`, order i is signed with nonce + i
+
+        All payloads are handed to the signer at once so batch capable signers
+        can sign them in parallel.
+        """
+        nonce = time_ns() // 1_000 if nonce is None else nonce
+        if self.order_validator is not None:
+            # all legs are checked before any is signed
+            self._ensure_metadata()
+            self.order_validator.check(orders)
+        order_requests = [
+            self.__batch_order_request(nonce + i, order)
+            for (i, order) in enumerate(orders)
+        ]
+        signatures = self.__sign_many([payload for (payload, _) in order_requests])
+        orders_data = []
+        for (_, request), signature in zip(order_requests, signatures):
+            request["signature"] = signature
+            orders_data.append(request)
+        return {"accountId": int(self.account_id), "orders": orders_data}
+
+    def __batch_order_request(
+        self, nonce: int, o: CreateOrder | UpdateOrder | CancelOrder
+    ) -> Tuple[bytes, Dict[str, Any]]:
         if type(o) is CreateOrder:
-            payload = self._create_order_request_data(
+            payload, request = self.__create_order_request(
                 nonce,
                 o.symbol,
                 o.quantity,
@@ -1576,7 +2026,7 @@ class HibachiApiClient:
                 trigger_direction=o.trigger_direction,
             )
         elif type(o) is UpdateOrder:
-            payload = self.__update_order_request_data(
+            payload, request = self.__update_order_request(
                 o.order_id,
                 nonce,
                 o.symbol,
@@ -1589,6 +2039,6 @@ class HibachiApiClient:
                 order_flags=o.order_flags,
             )
         else:
-            payload = self._cancel_order_request_data(o.order_id, o.nonce, True)
-        payload["action"] = o.action
-        return payload
+            payload, request = self.__cancel_order_request(o.order_id, o.nonce, True)
+        request["action"] = o.action
+        return payload, request
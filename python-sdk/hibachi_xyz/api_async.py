@@ -0,0 +1,823 @@
+import asyncio
+import itertools
+from dataclasses import asdict
+from time import time_ns
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp is an optional dependency
+    aiohttp = None
+
+from hibachi_xyz.api import (
+    HibachiApiClient,
+    _parse_account_info,
+    _parse_account_trades,
+    _parse_batch_response,
+    _parse_capital_history,
+    _parse_exchange_info,
+    _parse_inventory,
+    _cancel_results,
+    _chunks,
+    _error_message,
+    _klines_path,
+    _parse_klines,
+    _parse_order,
+    _parse_orderbook,
+    _parse_pending_orders,
+    _parse_prices,
+    _parse_settlements,
+    _parse_trades,
+)
+from hibachi_xyz.codec import json_dumps_bytes, json_loads
+from hibachi_xyz.helpers import create_with, default_api_url, default_data_api_url
+from hibachi_xyz.metadata import ContractMetadata
+from hibachi_xyz.ratelimit import EndpointClass, RateLimiter, classify_endpoint
+from hibachi_xyz.signing import Signer
+from hibachi_xyz.tracker import OrderTracker
+from hibachi_xyz.types import (
+    AccountInfo,
+    AccountTradesResponse,
+    BatchResponse,
+    BatchResponseOrder,
+    CancelAllResponse,
+    CancelOrder,
+    CancelResult,
+    CapitalBalance,
+    CapitalHistory,
+    CreateOrder,
+    DepositInfo,
+    ExchangeInfo,
+    FutureContract,
+    HibachiApiError,
+    Interval,
+    InventoryResponse,
+    KlinesResponse,
+    Nonce,
+    OpenInterestResponse,
+    Order,
+    OrderBook,
+    OrderFlags,
+    OrderId,
+    PendingOrdersResponse,
+    PriceResponse,
+    SettlementsResponse,
+    Side,
+    StatsResponse,
+    TPSLConfig,
+    TradesResponse,
+    TransferRequest,
+    TransferResponse,
+    TWAPConfig,
+    UpdateOrder,
+    WithdrawRequest,
+    WithdrawResponse,
+)
+
+
+class AsyncHibachiApiClient:
+    """
+    Asyncio version of `HibachiApiClient` with the same method surface.
+
+    All requests go through a single `aiohttp.ClientSession` whose connection
+    pool is shared by the API and the data API, so independent calls can run
+    concurrently without blocking the event loop.
+
+    ```python
+    import asyncio
+    from hibachi_xyz import AsyncHibachiApiClient
+
+    async def main():
+        async with AsyncHibachiApiClient(
+            api_key = os.environ.get('HIBACHI_API_KEY', "your-api-key"),
+            account_id = os.environ.get('HIBACHI_ACCOUNT_ID', "your-account-id"),
+            private_key = os.environ.get('HIBACHI_PRIVATE_KEY', "your-private"),
+        ) as hibachi:
+            prices = await asyncio.gather(
+                *(hibachi.get_prices(symbol) for symbol in ["BTC/USDT-P", "ETH/USDT-P"])
+            )
+            account_info = await hibachi.get_account_info()
+
+    asyncio.run(main())
+    ```
+
+    Requires the `aiohttp` package: `pip install hibachi_xyz[async]`
+
+    Args:
+        api_url: The base URL of the API
+        data_api_url: The base URL of the data API
+        account_id: The account ID
+        api_key: The API key
+        private_key: The private key for the account
+        pool_size: Maximum number of pooled connections, shared by both hosts
+        keep_alive: Reuse connections between requests, disable to close after every call
+        timeout: Total per-request timeout in seconds. None waits forever
+        signer: Signs request payloads instead of the signer derived from `private_key`
+        metadata_ttl: Seconds after which cached exchange metadata is refreshed, None keeps it until the next `get_exchange_info`
+        metadata_snapshot: JSON file exchange metadata is saved to, and loaded from by `warm_up()`
+        metadata_snapshot_max_age: Seconds after which a snapshot is too old to be loaded by `warm_up()`
+        rate_limiter: Paces requests per endpoint class, see `RateLimiter`. None sends immediately
+        order_tracker: Keeps the open orders locally so `update_order` needs no `get_order_details`, see `OrderTracker`
+        validate_orders: Check tick size, step size, minimum size and notional before signing, see `OrderValidator`
+        decimal_numbers: Parse prices, quantities and amounts of responses to `Decimal` instead of `str`, see `NUMERIC_FIELDS`
+
+    """
+
+    # number of cancels per batch request of `cancel_orders`
+    cancel_batch_size = 50
+    # use `DELETE /trade/orders` in `cancel_all_orders` instead of batches of cancels
+    native_cancel_all = False
+
+    def __init__(
+        self,
+        api_url: str = default_api_url,
+        data_api_url: str = default_data_api_url,
+        account_id: Optional[int] = None,
+        api_key: Optional[str] = None,
+        private_key: Optional[str] = None,
+        pool_size: int = 100,
+        keep_alive: bool = True,
+        timeout: Optional[float] = None,
+        signer: Optional[Signer] = None,
+        metadata_ttl: Optional[float] = None,
+        metadata_snapshot: Optional[str] = None,
+        metadata_snapshot_max_age: float = 3600,
+        rate_limiter: Optional[RateLimiter] = None,
+        order_tracker: Optional[OrderTracker] = None,
+        validate_orders: bool = False,
+        decimal_numbers: bool = False,
+    ):
+        if aiohttp is None:
+            raise ImportError(
+                "AsyncHibachiApiClient requires aiohttp, install it with `pip install hibachi_xyz[async]`"
+            )
+
+        # used to validate, build and sign requests, it never performs any I/O here
+        # and so has no connection pools of its own
+        self.api = HibachiApiClient(
+            api_url=api_url,
+            data_api_url=data_api_url,
+            account_id=account_id,
+            api_key=api_key,
+            private_key=private_key,
+            signer=signer,
+            metadata_ttl=metadata_ttl,
+            metadata_snapshot=metadata_snapshot,
+            metadata_snapshot_max_age=metadata_snapshot_max_age,
+            order_tracker=order_tracker,
+            validate_orders=validate_orders,
+            decimal_numbers=decimal_numbers,
+            connection_pools=False,
+        )
+        self.api_url = api_url
+        self.data_api_url = data_api_url
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._contracts_lock = asyncio.Lock()
+        self.rate_limiter = rate_limiter
+
+    @property
+    def account_id(self) -> Optional[int]:
+        return self.api.account_id
+
+    @property
+    def order_tracker(self) -> Optional[OrderTracker]:
+        return self.api.order_tracker
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return self.api.api_key
+
+    @property
+    def future_contracts(self) -> Optional[Dict[str, FutureContract]]:
+        return self.api.future_contracts
+
+    @property
+    def metadata(self) -> ContractMetadata:
+        return self.api.metadata
+
+    def set_account_id(self, account_id: int):
+        self.api.set_account_id(account_id)
+
+    def set_api_key(self, api_key: str):
+        self.api.set_api_key(api_key)
+
+    def set_private_key(self, private_key: str):
+        self.api.set_private_key(private_key)
+
+    def set_signer(self, signer: Signer):
+        self.api.set_signer(signer)
+
+    async def warm_up(self):
+        """Async version of `HibachiApiClient.warm_up`"""
+        if self.api.metadata.load():
+            self.api._metadata_updated()
+        await self._ensure_future_contracts()
+
+    async def close(self):
+        """Close the shared connection pool"""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self.api.close()
+
+    async def __aenter__(self) -> "AsyncHibachiApiClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    """ Market API endpoints, can be called without having an account """
+
+    async def get_exchange_info(self) -> ExchangeInfo:
+        """Async version of `HibachiApiClient.get_exchange_info`"""
+        exchange_info = _parse_exchange_info(
+            await self._send_simple_request("/market/exchange-info")
+        )
+        self.api._set_future_contracts(exchange_info.futureContracts)
+        return exchange_info
+
+    async def get_inventory(self) -> InventoryResponse:
+        """Async version of `HibachiApiClient.get_inventory`"""
+        inventory = _parse_inventory(
+            await self._send_simple_request("/market/inventory")
+        )
+        self.api._set_future_contracts(
+            [market.contract for market in inventory.markets]
+        )
+        return inventory
+
+    async def get_prices(self, symbol: str) -> PriceResponse:
+        """Async version of `HibachiApiClient.get_prices`"""
+        return _parse_prices(
+            await self._send_simple_request(f"/market/data/prices?symbol={symbol}")
+        )
+
+    async def get_stats(self, symbol: str) -> StatsResponse:
+        """Async version of `HibachiApiClient.get_stats`"""
+        return StatsResponse(
+            **await self._send_simple_request(f"/market/data/stats?symbol={symbol}")
+        )
+
+    async def get_trades(self, symbol: str) -> TradesResponse:
+        """Async version of `HibachiApiClient.get_trades`"""
+        return _parse_trades(
+            await self._send_simple_request(f"/market/data/trades?symbol={symbol}")
+        )
+
+    async def get_klines(
+        self,
+        symbol: str,
+        interval: Interval,
+        from_ms: Optional[int] = None,
+        to_ms: Optional[int] = None,
+    ) -> KlinesResponse:
+        """Async version of `HibachiApiClient.get_klines`"""
+        return _parse_klines(
+            await self._send_simple_request(
+                _klines_path(symbol, interval, from_ms, to_ms)
+            )
+        )
+
+    async def get_open_interest(self, symbol: str) -> OpenInterestResponse:
+        """Async version of `HibachiApiClient.get_open_interest`"""
+        response = await self._send_simple_request(
+            f"/market/data/open-interest?symbol={symbol}"
+        )
+        return create_with(OpenInterestResponse, response)
+
+    async def get_orderbook(
+        self, symbol: str, depth: int, granularity: float
+    ) -> OrderBook:
+        """Async version of `HibachiApiClient.get_orderbook`"""
+        await self._ensure_future_contracts()
+        path = self.api._orderbook_path(symbol, depth, granularity)
+        return _parse_orderbook(await self._send_simple_request(path))
+
+    ### ===================================================== Account API =====================================================
+
+    async def get_capital_balance(self) -> CapitalBalance:
+        """Async version of `HibachiApiClient.get_capital_balance`"""
+        self._check_auth_data()
+        response = await self._send_authorized_request(
+            "GET", f"/capital/balance?accountId={self.account_id}"
+        )
+        return create_with(CapitalBalance, response)
+
+    async def get_capital_history(self) -> CapitalHistory:
+        """Async version of `HibachiApiClient.get_capital_history`"""
+        self._check_auth_data()
+        return _parse_capital_history(
+            await self._send_authorized_request(
+                "GET", f"/capital/history?accountId={self.account_id}"
+            )
+        )
+
+    async def withdraw(
+        self,
+        coin: str,
+        withdraw_address: str,
+        quantity: str,
+        max_fees: str,
+        network: str = "arbitrum",
+    ) -> WithdrawResponse:
+        """Async version of `HibachiApiClient.withdraw`"""
+        self._check_auth_data()
+        await self._ensure_future_contracts()
+
+        request = WithdrawRequest(
+            accountId=self.account_id,
+            coin=coin,
+            withdrawAddress=withdraw_address,
+            network=network,
+            quantity=quantity,
+            maxFees=max_fees,
+            signature=self.api._sign_withdraw_payload(
+                coin, withdraw_address, quantity, max_fees
+            ),
+        )
+
+        response = await self._send_authorized_request(
+            "POST", "/capital/withdraw", json=asdict(request)
+        )
+        return create_with(WithdrawResponse, response)
+
+    async def transfer(
+        self, coin: str, quantity: str, dstPublicKey: str, max_fees: str
+    ) -> TransferResponse:
+        """Async version of `HibachiApiClient.transfer`"""
+        await self._ensure_future_contracts()
+
+        nonce = time_ns() // 1_000
+        request = TransferRequest(
+            accountId=self.account_id,
+            coin=coin,
+            nonce=nonce,
+            dstPublicKey=dstPublicKey.replace("0x", ""),
+            fees=max_fees,
+            quantity=quantity,
+            signature=self.api._sign_transfer_payload(
+                nonce, coin, quantity, dstPublicKey, max_fees
+            ),
+        )
+
+        response = await self._send_authorized_request(
+            "POST", "/capital/transfer", json=asdict(request)
+        )
+        return create_with(TransferResponse, response)
+
+    async def get_deposit_info(self, public_key: str) -> DepositInfo:
+        """Async version of `HibachiApiClient.get_deposit_info`"""
+        response = await self._send_authorized_request(
+            "GET",
+            f"/capital/deposit-info?accountId={self.account_id}&publicKey={public_key}",
+        )
+        return create_with(DepositInfo, response)
+
+    ############################################################################
+    ## Trade API endpoints, account_id and api_key must be set
+
+    async def get_account_info(self) -> AccountInfo:
+        """Async version of `HibachiApiClient.get_account_info`"""
+        self._check_auth_data()
+        return _parse_account_info(
+            await self._send_authorized_request(
+                "GET", f"/trade/account/info?accountId={self.account_id}"
+            )
+        )
+
+    async def get_account_trades(self) -> AccountTradesResponse:
+        """Async version of `HibachiApiClient.get_account_trades`"""
+        self._check_auth_data()
+        return _parse_account_trades(
+            await self._send_authorized_request(
+                "GET", f"/trade/account/trades?accountId={self.account_id}"
+            )
+        )
+
+    async def get_settlements_history(self) -> SettlementsResponse:
+        """Async version of `HibachiApiClient.get_settlements_history`"""
+        self._check_auth_data()
+        return _parse_settlements(
+            await self._send_authorized_request(
+                "GET", f"/trade/account/settlements_history?accountId={self.account_id}"
+            )
+        )
+
+    async def get_pending_orders(self) -> PendingOrdersResponse:
+        """Async version of `HibachiApiClient.get_pending_orders`"""
+        self._check_auth_data()
+        pending_orders = _parse_pending_orders(
+            await self._send_authorized_request(
+                "GET", f"/trade/orders?accountId={self.account_id}"
+            )
+        )
+        if self.order_tracker is not None:
+            self.order_tracker.load(pending_orders.orders)
+        return pending_orders
+
+    async def get_order_details(
+        self, order_id: Optional[int] = None, nonce: Optional[int] = None
+    ) -> Order:
+        """Async version of `HibachiApiClient.get_order_details`"""
+        self.api._check_order_selector(order_id, nonce)
+        self._check_auth_data()
+
+        order_selector = (
+            f"orderId={order_id}" if order_id is not None else f"nonce={nonce}"
+        )
+        order = _parse_order(
+            await self._send_authorized_request(
+                "GET", f"/trade/order?accountId={self.account_id}&{order_selector}"
+            )
+        )
+        if self.order_tracker is not None:
+            self.order_tracker.upsert(order, nonce)
+        return order
+
+    async def place_market_order(
+        self,
+        symbol: str,
+        quantity: float,
+        side: Side,
+        max_fees_percent: float,
+        trigger_price: Optional[float] = None,
+        twap_config: Optional[TWAPConfig] = None,
+        creation_deadline: Optional[int] = None,
+        order_flags: Optional[OrderFlags] = None,
+        tpsl: Optional[TPSLConfig] = None,
+    ) -> tuple[Nonce, OrderId]:
+        """Async version of `HibachiApiClient.place_market_order`"""
+        self._check_auth_data()
+        await self._check_symbol(symbol)
+
+        if side == Side.BUY:
+            side = Side.BID
+        elif side == Side.SELL:
+            side = Side.ASK
+
+        if twap_config is not None and trigger_price is not None:
+            raise ValueError("Can not set trigger price for TWAP order")
+
+        if twap_config is not None and tpsl is not None:
+            raise ValueError("Can not set tpsl for TWAP order")
+
+        if tpsl is not None and len(tpsl.legs) > 0:
+            return await self._place_parent_with_tpsl(
+                symbol=symbol,
+                price=None,
+                quantity=quantity,
+                side=side,
+                max_fees_percent=max_fees_percent,
+                trigger_price=trigger_price,
+                creation_deadline=creation_deadline,
+                order_flags=order_flags,
+                tpsl=tpsl,
+            )
+
+        nonce = time_ns() // 1_000
+        request_data = self.api._create_order_request_data(
+            nonce,
+            symbol,
+            quantity,
+            side,
+            max_fees_percent,
+            trigger_price,
+            None,
+            creation_deadline,
+            twap_config=twap_config,
+            order_flags=order_flags,
+        )
+        request_data["accountId"] = self.account_id
+        response = await self._send_authorized_request(
+            "POST", f"/trade/order", json=request_data
+        )
+        order_id = int(response["orderId"])
+        self.api._track_placed(
+            nonce, order_id, symbol, side, quantity, None, trigger_price, order_flags
+        )
+        return (nonce, order_id)
+
+    async def place_limit_order(
+        self,
+        symbol: str,
+        quantity: float,
+        price: float,
+        side: Side,
+        max_fees_percent: float,
+        trigger_price: Optional[float] = None,
+        creation_deadline: Optional[int] = None,
+        order_flags: Optional[OrderFlags] = None,
+        tpsl: Optional[TPSLConfig] = None,
+    ) -> tuple[Nonce, OrderId]:
+        """Async version of `HibachiApiClient.place_limit_order`"""
+        self._check_auth_data()
+        await self._check_symbol(symbol)
+
+        if side == Side.BUY:
+            side = Side.BID
+        elif side == Side.SELL:
+            side = Side.ASK
+
+        if tpsl is not None and len(tpsl.legs) > 0:
+            return await self._place_parent_with_tpsl(
+                symbol=symbol,
+                price=price,
+                quantity=quantity,
+                side=side,
+                max_fees_percent=max_fees_percent,
+                trigger_price=trigger_price,
+                creation_deadline=creation_deadline,
+                order_flags=order_flags,
+                tpsl=tpsl,
+            )
+
+        nonce = time_ns() // 1_000
+        request_data = self.api._create_order_request_data(
+            nonce,
+            symbol,
+            quantity,
+            side,
+            max_fees_percent,
+            trigger_price,
+            price,
+            creation_deadline,
+            order_flags=order_flags,
+        )
+        request_data["accountId"] = self.account_id
+        response = await self._send_authorized_request(
+            "POST", f"/trade/order", json=request_data
+        )
+        order_id = int(response["orderId"])
+        self.api._track_placed(
+            nonce, order_id, symbol, side, quantity, price, trigger_price, order_flags
+        )
+        return (nonce, order_id)
+
+    async def _place_parent_with_tpsl(
+        self,
+        symbol: str,
+        quantity: float,
+        price: Optional[float],
+        side: Side,
+        max_fees_percent: float,
+        trigger_price: Optional[float] = None,
+        creation_deadline: Optional[int] = None,
+        order_flags: Optional[OrderFlags] = None,
+        tpsl: Optional[TPSLConfig] = None,
+    ) -> tuple[Nonce, OrderId]:
+        request_data = self.api._tpsl_request_data(
+            symbol=symbol,
+            quantity=quantity,
+            price=price,
+            side=side,
+            max_fees_percent=max_fees_percent,
+            trigger_price=trigger_price,
+            creation_deadline=creation_deadline,
+            order_flags=order_flags,
+            tpsl=tpsl,
+        )
+
+        result = _parse_batch_response(
+            await self._send_authorized_request(
+                "POST", f"/trade/orders", json=request_data
+            )
+        )
+        if len(result.orders) < 1:
+            raise RuntimeError(
+                f"Received empty response to batch order request {request_data=}"
+            )
+        parent_order: BatchResponseOrder = result.orders[0]
+        self.api._track_placed(
+            parent_order.nonce,
+            parent_order.orderId,
+            symbol,
+            side,
+            quantity,
+            price,
+            trigger_price,
+            order_flags,
+        )
+        return (parent_order.nonce, parent_order.orderId)
+
+    async def update_order(
+        self,
+        order_id: int,
+        max_fees_percent: float,
+        quantity: Optional[float] = None,
+        price: Optional[float] = None,
+        trigger_price: Optional[float] = None,
+        creation_deadline: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """Async version of `HibachiApiClient.update_order`"""
+        self._check_auth_data()
+        order = self.api._tracked_order(order_id)
+        if order is None:
+            order = await self.get_order_details(order_id=order_id)
+        await self._check_symbol(order.symbol)
+
+        request_data = self.api._update_order_generate_sig(
+            order,
+            price=price,
+            side=Side(order.side),
+            max_fees_percent=max_fees_percent,
+            trigger_price=trigger_price,
+            quantity=quantity,
+            creation_deadline=creation_deadline,
+        )
+
+        response = await self._send_authorized_request(
+            "PUT", f"/trade/order", json=request_data
+        )
+        if self.order_tracker is not None:
+            self.order_tracker.modified(order_id, quantity, price, trigger_price)
+        return response
+
+    async def cancel_order(
+        self, order_id: Optional[int] = None, nonce: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """Async version of `HibachiApiClient.cancel_order`"""
+        self.api._check_order_selector(order_id, nonce)
+        self._check_auth_data()
+
+        request_data = self.api._cancel_order_request_data(order_id, nonce, True)
+        request_data["accountId"] = int(self.account_id)
+        response = await self._send_authorized_request(
+            "DELETE", f"/trade/order", json=request_data
+        )
+        if self.order_tracker is not None:
+            self.order_tracker.removed(order_id, nonce)
+        return response
+
+    async def cancel_all_orders(
+        self, contractId: Optional[int] = None, batch_size: Optional[int] = None
+    ) -> CancelAllResponse:
+        """
+        Async version of `HibachiApiClient.cancel_all_orders`, with `native_cancel_all`
+        the cancelled orders are not reported and `results` is empty
+        """
+        self._check_auth_data()
+        if not self.native_cancel_all:
+            orders = (await self.get_pending_orders()).orders
+            return await self.cancel_orders(
+                [
+                    int(order.orderId)
+                    for order in orders
+                    if contractId is None or order.contractId == contractId
+                ],
+                batch_size,
+            )
+
+        nonce = time_ns() // 1_000
+        request_data = self.api._cancel_order_request_data(None, nonce, False)
+        request_data["accountId"] = int(self.account_id)
+        if contractId is not None:
+            request_data["contractId"] = contractId
+        await self._send_authorized_request(
+            "DELETE", f"/trade/orders", json=request_data
+        )
+        if self.order_tracker is not None:
+            self.order_tracker.clear(contractId)
+        return CancelAllResponse(results=[])
+
+    async def cancel_orders(
+        self, order_ids: List[int], batch_size: Optional[int] = None
+    ) -> CancelAllResponse:
+        """Async version of `HibachiApiClient.cancel_orders`"""
+        self._check_auth_data()
+        chunks = _chunks(order_ids, batch_size or self.cancel_batch_size)
+        nonce = time_ns() // 1_000
+        offsets = itertools.accumulate([0] + [len(chunk) for chunk in chunks[:-1]])
+        results = await asyncio.gather(
+            *(
+                self._cancel_chunk(chunk, nonce + offset)
+                for chunk, offset in zip(chunks, offsets)
+            )
+        )
+        response = CancelAllResponse(results=[r for chunk in results for r in chunk])
+        if self.order_tracker is not None:
+            for result in response.results:
+                if result.cancelled:
+                    self.order_tracker.removed(result.orderId)
+        return response
+
+    async def _cancel_chunk(
+        self, order_ids: List[int], nonce: int
+    ) -> List[CancelResult]:
+        request_data = await asyncio.to_thread(
+            self.api._batch_orders_request_data,
+            [CancelOrder(order_id=order_id) for order_id in order_ids],
+            nonce,
+        )
+        try:
+            response = await self._send_authorized_request(
+                "POST", f"/trade/orders", json=request_data
+            )
+        except (HibachiApiError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            message = _error_message(e)
+            return [CancelResult(order_id, False, message) for order_id in order_ids]
+        return _cancel_results(order_ids, response)
+
+    async def batch_orders(
+        self, orders: list[CreateOrder | UpdateOrder | CancelOrder]
+    ) -> BatchResponse:
+        """Async version of `HibachiApiClient.batch_orders`"""
+        self._check_auth_data()
+        for order in orders:
+            if type(order) is not CancelOrder:
+                await self._check_symbol(order.symbol)
+
+        # signing a large batch is CPU bound, keep it off the event loop
+        request_data = await asyncio.to_thread(
+            self.api._batch_orders_request_data, orders
+        )
+        result = _parse_batch_response(
+            await self._send_authorized_request(
+                "POST", f"/trade/orders", json=request_data
+            )
+        )
+        if self.order_tracker is not None:
+            self.order_tracker.apply_batch(
+                orders, result, self.account_id, self.api.metadata.by_symbol
+            )
+        return result
+
+    """ Private helpers """
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        # created lazily so the session is bound to the running event loop
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size, force_close=not self.keep_alive
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def _send_simple_request(self, path: str) -> Any:
+        return await self._request(
+            EndpointClass.MARKET_DATA, "GET", f"{self.data_api_url}{path}"
+        )
+
+    async def _send_authorized_request(
+        self, method: str, path: str, json: Optional[Any] = None
+    ) -> Any:
+        headers = {
+            "Authorization": self.api_key,
+            "Content-Type": "application/json",
+            "Accept": "application/json",
+        }
+
+        return await self._request(
+            classify_endpoint(method, path),
+            method,
+            f"{self.api_url}{path}",
+            headers=headers,
+            data=None if json is None else json_dumps_bytes(json),
+        )
+
+    async def _request(
+        self, endpoint_class: EndpointClass, method: str, url: str, **kwargs: Any
+    ) -> Any:
+        limiter = self.rate_limiter
+        attempts = 1 if limiter is None else limiter.max_retries + 1
+        for attempt in range(attempts):
+            if limiter is not None:
+                await limiter.acquire_async(endpoint_class)
+            async with self._get_session().request(method, url, **kwargs) as response:
+                if limiter is not None:
+                    limiter.feedback(endpoint_class, response.status, response.headers)
+                    if response.status == 429 and attempt + 1 < attempts:
+                        continue
+                return await _read_response(response, self.api._json_loads)
+
+    def _check_auth_data(self):
+        if self.account_id is None:
+            raise RuntimeError("Account ID is not set")
+
+        if self.api_key is None:
+            raise RuntimeError("API key is not set")
+
+    async def _ensure_future_contracts(self):
+        # concurrent first orders share a single exchange info request
+        async with self._contracts_lock:
+            if self.api.metadata.is_stale():
+                await self.get_exchange_info()
+
+    async def _check_symbol(self, symbol: str):
+        await self._ensure_future_contracts()
+        if self.api.future_contracts.get(symbol) is None:
+            raise ValueError(f"Unknown symbol: {symbol}")
+
+
+async def _read_response(
+    response: "aiohttp.ClientResponse", loads: Callable[[bytes], Any] = json_loads
+) -> Any:
+    """Check if the response is an error and return the decoded body otherwise"""
+    if response.status > 299:
+        raise HibachiApiError(response.status, await response.text())
+    return loads(await response.read())
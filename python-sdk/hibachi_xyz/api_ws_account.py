@@ -1,16 +1,63 @@
 import asyncio
-import json
+import contextlib
 import time
-from typing import Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 import websockets
+from hibachi_xyz.codec import json_dumps, json_loads
+from hibachi_xyz.dispatch import CLOSED, BoundedQueue, OverflowPolicy, QueueStats
+from hibachi_xyz.events import AccountReconnectedEvent, DisconnectedEvent
 from hibachi_xyz.helpers import connect_with_retry, default_api_url, print_data
 from hibachi_xyz.types import AccountSnapshot, AccountStreamStartResult, Position
 
 
 class HibachiWSAccountClient:
+    """
+    Account websocket client, streaming balance, position and order updates.
+
+    A reader task started by `connect` receives every message. Replies to
+    requests such as `stream.start` and `stream.ping` are matched by their
+    id, all other messages are passed to the handlers registered with `on`
+    and queued for `listen`, so no update is consumed by a request. Handlers
+    run on a dispatcher task, so they can await requests such as `ping`.
+
+    Once the stream is started a keepalive task renews the `listenKey`
+    every `keepalive_interval` seconds. A ping that is not answered in time
+    closes the connection. When the connection drops the client emits a
+    `DisconnectedEvent` under the `disconnected` topic, reconnects with
+    jittered exponential backoff, restarts the stream and emits an
+    `AccountReconnectedEvent` under the `reconnected` topic. Its snapshot
+    covers the updates missed while disconnected.
+
+    ```python
+    client = HibachiWSAccountClient(api_key, account_id)
+    client.on("position_update", handle_position)
+    client.on("reconnected", handle_reconnected)
+    await client.connect()
+    await client.stream_start()
+    ```
+
+    Args:
+        api_key: The API key
+        account_id: The account ID
+        api_endpoint: The base URL of the API, with the wss scheme
+        auto_reconnect: Reconnect and restart the stream when the connection drops
+        reconnect_jitter: Fraction by which reconnect delays are randomized
+        keepalive_interval: Seconds between two renewals of the listenKey
+        request_timeout: Seconds to wait for the reply to a request, None waits forever
+        queue_size: Number of updates kept for `listen`, the oldest are dropped beyond it
+    """
+
     def __init__(
-        self, api_key: str, account_id: str, api_endpoint: str = default_api_url
+        self,
+        api_key: str,
+        account_id: str,
+        api_endpoint: str = default_api_url,
+        auto_reconnect: bool = True,
+        reconnect_jitter: float = 0.5,
+        keepalive_interval: float = 15,
+        request_timeout: Optional[float] = 10,
+        queue_size: int = 1000,
     ):
         self.api_endpoint = api_endpoint.replace("https://", "wss://")
         self.websocket = None
@@ -18,7 +65,20 @@ class HibachiWSAccountClient:
         self.api_key = api_key
         self.account_id = int(account_id)
         self.listenKey: Optional[str] = None
+        self.auto_reconnect = auto_reconnect
+        self.reconnect_jitter = reconnect_jitter
+        self.keepalive_interval = keepalive_interval
+        self.request_timeout = request_timeout
         self._event_handlers: Dict[str, List[Callable[[dict], None]]] = {}
+        # pending requests by message id, resolved by the receive loop
+        self._response_handlers: Dict[int, asyncio.Future] = {}
+        self._updates = BoundedQueue(queue_size, OverflowPolicy.DROP_OLDEST)
+        # (topic, event) pairs for the handlers, kept off the receive loop
+        self._events = BoundedQueue(queue_size)
+        self._receive_task: Optional[asyncio.Task] = None
+        self._dispatch_task: Optional[asyncio.Task] = None
+        self._keepalive_task: Optional[asyncio.Task] = None
+        self._restart_task: Optional[asyncio.Task] = None
 
     def on(self, topic: str, handler: Callable[[dict], None]):
         if topic not in self._event_handlers:
@@ -26,9 +86,23 @@ class HibachiWSAccountClient:
         self._event_handlers[topic].append(handler)
 
     async def connect(self):
-        self.websocket = await connect_with_retry(
+        if self._updates.closed:
+            self._updates = BoundedQueue(
+                self._updates.maxsize, OverflowPolicy.DROP_OLDEST
+            )
+        if self._events.closed:
+            self._events = BoundedQueue(self._events.maxsize)
+        self.websocket = await self._connect()
+        if self._dispatch_task is None or self._dispatch_task.done():
+            self._dispatch_task = asyncio.create_task(self._dispatch(self._events))
+        self._receive_task = asyncio.create_task(self._receive_loop())
+        return self
+
+    async def _connect(self):
+        return await connect_with_retry(
             web_url=self.api_endpoint + f"/ws/account?accountId={self.account_id}",
             headers=[("Authorization", self.api_key)],
+            jitter=self.reconnect_jitter,
         )
 
     def _next_message_id(self) -> int:
@@ -46,9 +120,7 @@ class HibachiWSAccountClient:
             "timestamp": self._timestamp(),
         }
 
-        await self.websocket.send(json.dumps(message))
-        response = await self.websocket.recv()
-        response_data = json.loads(response)
+        response_data = await self._send_request(message)
 
         result = AccountStreamStartResult(**response_data["result"])
         result.accountSnapshot = AccountSnapshot(
@@ -58,9 +130,12 @@ class HibachiWSAccountClient:
             Position(**pos) for pos in result.accountSnapshot.positions
         ]
         self.listenKey = result.listenKey
+        if self._keepalive_task is None or self._keepalive_task.done():
+            self._keepalive_task = asyncio.create_task(self._keepalive_loop())
         return result
 
-    async def ping(self):
+    async def ping(self) -> bool:
+        """Renew the listenKey, the keepalive task does this on schedule"""
         if not self.listenKey:
             raise ValueError("Cannot send ping: listenKey not initialized.")
 
@@ -71,31 +146,181 @@ class HibachiWSAccountClient:
             "timestamp": self._timestamp(),
         }
 
-        await self.websocket.send(json.dumps(message))
-        response = await self.websocket.recv()
-        parsed = json.loads(response)
-        if parsed.get("status") == 200:
-            print("pong!")
+        parsed = await self._send_request(message)
+        return parsed.get("status") == 200
 
-    async def listen(self) -> Optional[dict]:
+    async def listen(self, timeout: Optional[float] = 15) -> Optional[dict]:
+        """
+        Next update of the stream, or None when nothing arrived within
+        `timeout` seconds. The listenKey is renewed in the background.
+        """
+        if self._updates.closed and len(self._updates) == 0:
+            raise ConnectionError("Account client is disconnected")
         try:
-            response = await asyncio.wait_for(self.websocket.recv(), timeout=15)
-            message = json.loads(response)
-
-            topic = message.get("topic")
-            if topic in self._event_handlers:
-                for handler in self._event_handlers[topic]:
-                    await handler(message)
-
-            return message
+            message = await asyncio.wait_for(self._updates.get(), timeout=timeout)
         except asyncio.TimeoutError:
-            await self.ping()
             return None
-        except websockets.exceptions.ConnectionClosed as e:
-            print(f"[listen] WebSocket closed: code={e.code}, reason={e.reason}")
-            raise
+        return None if message is CLOSED else message
+
+    def queue_stats(self) -> QueueStats:
+        """Depth and dropped count of the `listen` queue"""
+        return self._updates.stats()
+
+    async def _send_request(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a request and wait for the response carrying the same id"""
+        if self.websocket is None:
+            raise ConnectionError("Account client is not connected")
+        message_id = message["id"]
+        future = asyncio.get_running_loop().create_future()
+        self._response_handlers[message_id] = future
+        try:
+            await self.websocket.send(json_dumps(message))
+            return await asyncio.wait_for(future, timeout=self.request_timeout)
+        finally:
+            self._response_handlers.pop(message_id, None)
+
+    async def _emit(self, topic: str, event: Any):
+        if self._event_handlers.get(topic):
+            await self._events.put((topic, event))
+
+    async def _dispatch(self, queue: BoundedQueue):
+        while True:
+            item = await queue.get()
+            if item is CLOSED:
+                return
+            topic, event = item
+            for handler in self._event_handlers.get(topic, []):
+                try:
+                    await handler(event)
+                except Exception as e:
+                    print(f"[AccountClient] {topic} handler error: {e}")
+
+    async def _receive_loop(self):
+        while True:
+            try:
+                while True:
+                    raw = await self.websocket.recv(decode=False)
+                    try:
+                        message = json_loads(raw)
+                        if not isinstance(message, dict):
+                            raise ValueError(f"expected an object, got {message!r}")
+                        future = self._response_handlers.pop(message.get("id"), None)
+                    except (ValueError, TypeError) as e:
+                        # a bad frame says nothing about the connection
+                        print(f"[AccountClient] Skipped a malformed message: {e}")
+                        continue
+
+                    if future is not None:
+                        if not future.done():
+                            future.set_result(message)
+                        continue
+
+                    await self._updates.put(message)
+                    await self._emit(message.get("topic"), message)
+            except asyncio.CancelledError:
+                return
+            except websockets.ConnectionClosed as e:
+                print(
+                    f"[AccountClient] WebSocket closed: code={e.code}, reason={e.reason}"
+                )
+                reason = f"code={e.code}, reason={e.reason}"
+            except OSError as e:
+                print(f"[AccountClient] WebSocket error: {e}")
+                reason = str(e)
+
+            self._fail_pending(ConnectionError(f"WebSocket closed: {reason}"))
+            if not self.auto_reconnect:
+                await self._close_websocket()
+                self._updates.close()
+                # the handlers still receive what is queued
+                self._events.close()
+                return
+            await self._reconnect(reason)
+
+    async def _close_websocket(self):
+        websocket = self.websocket
+        if websocket is not None:
+            with contextlib.suppress(Exception):
+                await websocket.close()
+
+    def _fail_pending(self, error: Exception):
+        # nothing will answer the pending requests anymore
+        for future in self._response_handlers.values():
+            if not future.done():
+                future.set_exception(error)
+        self._response_handlers.clear()
+
+    async def _reconnect(self, reason: str):
+        disconnected_at = time.time()
+        await self._emit("disconnected", DisconnectedEvent(reason, disconnected_at))
+        await self._close_websocket()
+
+        while True:
+            try:
+                self.websocket = await self._connect()
+                break
+            except Exception as e:
+                print(f"[AccountClient] Reconnect failed: {e}")
+
+        print("[AccountClient] Reconnected.")
+        if self.listenKey is not None:
+            # the reply is read by the receive loop, restart from a separate task
+            self._restart_task = asyncio.create_task(
+                self._restart_stream(disconnected_at)
+            )
+
+    async def _restart_stream(self, disconnected_at: float):
+        try:
+            result = await self.stream_start()
+        except (ConnectionError, asyncio.TimeoutError, KeyError) as e:
+            # the receive loop reconnects again if the connection is gone
+            print(f"[AccountClient] Could not restart the stream: {e}")
+            return
+        await self._emit(
+            "reconnected",
+            AccountReconnectedEvent(disconnected_at, time.time(), result),
+        )
+
+    async def _keepalive_loop(self):
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            websocket = self.websocket
+            if websocket is None:
+                return
+            try:
+                if not await self.ping():
+                    print("[AccountClient] listenKey renewal was rejected")
+            except asyncio.TimeoutError:
+                # the connection is half open, closing it makes the receive loop reconnect
+                print("[AccountClient] Ping timed out, closing the connection")
+                with contextlib.suppress(Exception):
+                    await websocket.close()
+            except (ConnectionError, websockets.ConnectionClosed):
+                # the receive loop is reconnecting
+                pass
 
     async def disconnect(self):
+        tasks = (
+            self._keepalive_task,
+            self._restart_task,
+            self._receive_task,
+            self._dispatch_task,
+        )
+        for task in tasks:
+            # a handler calling disconnect runs on the dispatcher, which drains and ends
+            if (
+                task is not None
+                and not task.done()
+                and task is not asyncio.current_task()
+            ):
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+        self._keepalive_task = self._restart_task = self._receive_task = None
+        self._dispatch_task = None
+        self._fail_pending(ConnectionError("Account client disconnected"))
+        self._updates.close()
+        self._events.close()
         if self.websocket:
             await self.websocket.close()
             self.websocket = None
@@ -1,70 +1,418 @@
 import asyncio
 import contextlib
-import json
+import time
 from dataclasses import asdict
-from typing import Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 import websockets
 
+from .codec import json_dumps, json_loads
+from .dispatch import CLOSED, BoundedQueue, OverflowPolicy, QueueStats
+from .events import DisconnectedEvent, ReconnectedEvent, parse_market_event
 from .helpers import connect_with_retry, default_data_api_url
-from .types import WebSocketSubscription
+from .types import WebSocketSubscription, WebSocketSubscriptionTopic
+
+
+class MarketStream:
+    """
+    Async iterator over the events of one or more market subscriptions, created
+    by `stream` and `merged_stream` of `HibachiWSMarketClient` or
+    `ShardedMarketClient`.
+
+    The receive loop feeds the stream's `BoundedQueue` directly. Subscriptions
+    that are not active yet are sent when iteration starts, and unsubscribed
+    again when the stream is closed.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        subscriptions: List[WebSocketSubscription],
+        queue: BoundedQueue,
+    ):
+        self.client = client
+        self.subscriptions = subscriptions
+        self.queue = queue
+        self._started = False
+
+    def __aiter__(self) -> "MarketStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if not self._started:
+            self._started = True
+            await self._start()
+        while True:
+            msg = await self.queue.get()
+            if msg is CLOSED:
+                raise StopAsyncIteration
+            if self.client.raw:
+                return msg
+            event = self.client._parse_event(msg)
+            if event is not None:
+                return event
+
+    async def __aenter__(self) -> "MarketStream":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def stats(self) -> QueueStats:
+        return self.queue.stats()
+
+    async def _start(self):
+        await self.client._attach_stream(self)
+
+    async def aclose(self):
+        if self.queue.closed:
+            return
+        self.queue.close()
+        await self.client._detach_stream(self)
 
 
 class HibachiWSMarketClient:
-    def __init__(self, api_endpoint: str = default_data_api_url):
+    """
+    Market data websocket client.
+
+    Handlers receive typed events from `hibachi_xyz.events` (`MarkPriceEvent`,
+    `TradesEvent`, `OrderBookEvent`, ...) with numeric fields parsed once.
+    With `raw=True` handlers receive the decoded message dicts instead and no
+    event objects are built.
+
+    The client remembers its active subscriptions. When the connection drops it
+    emits a `DisconnectedEvent` under the `disconnected` topic, reconnects with
+    jittered exponential backoff, resubscribes and emits a `ReconnectedEvent`
+    under the `reconnected` topic, so local state can be resynced.
+
+    Every topic and symbol gets its own `BoundedQueue` and worker task, so a
+    slow handler only holds back its own stream. A full queue applies its
+    `OverflowPolicy`: `BLOCK` by default, which never loses messages but holds
+    back the reader. `queue_stats()` reports queue depths and drops.
+
+    ```python
+    client = HibachiWSMarketClient(
+        overflow_policies={
+            "mark_price": OverflowPolicy.CONFLATE,
+            "trades": OverflowPolicy.DROP_OLDEST,
+        }
+    )
+    client.on("reconnected", handle_reconnected)
+    ```
+
+    Data can also be consumed as async iterators, with the same queues and
+    overflow policies:
+
+    ```python
+    async with client.stream("BTC/USDT-P", WebSocketSubscriptionTopic.TRADES) as trades:
+        async for event in trades:
+            ...
+    ```
+
+    Only conflate or drop topics whose handlers tolerate missing messages.
+    `OrderBookEngine` recovers from dropped orderbook deltas when messages
+    carry sequence numbers.
+
+    Args:
+        api_endpoint: The base URL of the data API
+        raw: Hand the decoded message dicts to handlers instead of typed events
+        auto_reconnect: Reconnect and resubscribe when the connection drops,
+            otherwise the streams end
+        reconnect_jitter: Fraction by which reconnect delays are randomized
+        queue_size: Capacity of each topic and symbol queue
+        overflow_policy: Policy of full queues
+        overflow_policies: Policy overrides by topic
+    """
+
+    def __init__(
+        self,
+        api_endpoint: str = default_data_api_url,
+        raw: bool = False,
+        auto_reconnect: bool = True,
+        reconnect_jitter: float = 0.5,
+        queue_size: int = 1000,
+        overflow_policy: OverflowPolicy = OverflowPolicy.BLOCK,
+        overflow_policies: Optional[Dict[str, OverflowPolicy]] = None,
+    ):
         self.api_endpoint = api_endpoint.replace("https://", "wss://") + "/ws/market"
+        self.raw = raw
+        self.auto_reconnect = auto_reconnect
+        self.reconnect_jitter = reconnect_jitter
         self.websocket: Optional[websockets.WebSocketClientProtocol] = None
         self._event_handlers: Dict[str, List[Callable[[dict], None]]] = {}
+        self._subscriptions: Dict[Tuple[str, str], WebSocketSubscription] = {}
         self._receive_task: Optional[asyncio.Task] = None
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.overflow_policies = overflow_policies or {}
+        self._queues: Dict[Tuple[str, Optional[str]], BoundedQueue] = {}
+        self._workers: Dict[Tuple[str, Optional[str]], asyncio.Task] = {}
+        self._streams: Dict[Tuple[str, Optional[str]], List[MarketStream]] = {}
+        self._stream_subscriptions: Set[Tuple[str, str]] = set()
+
+    @property
+    def subscriptions(self) -> List[WebSocketSubscription]:
+        """Subscriptions restored after a reconnect"""
+        return list(self._subscriptions.values())
 
     async def connect(self):
-        self.websocket = await connect_with_retry(self.api_endpoint)
+        self.websocket = await connect_with_retry(
+            self.api_endpoint, jitter=self.reconnect_jitter
+        )
         self._receive_task = asyncio.create_task(self._receive_loop())
         return self
 
     async def subscribe(self, subscriptions: List[WebSocketSubscription]):
-        message = {
-            "method": "subscribe",
-            "parameters": {
-                "subscriptions": [
-                    {**asdict(sub), "topic": sub.topic.value} for sub in subscriptions
-                ]
-            },
-        }
-        await self.websocket.send(json.dumps(message))
+        for sub in subscriptions:
+            self._subscriptions[(sub.symbol, sub.topic.value)] = sub
+        await self._send_subscriptions("subscribe", subscriptions)
 
     async def unsubscribe(self, subscriptions: List[WebSocketSubscription]):
+        for sub in subscriptions:
+            self._subscriptions.pop((sub.symbol, sub.topic.value), None)
+        await self._send_subscriptions("unsubscribe", subscriptions)
+
+    async def _send_subscriptions(
+        self, method: str, subscriptions: List[WebSocketSubscription]
+    ):
         message = {
-            "method": "unsubscribe",
+            "method": method,
             "parameters": {
                 "subscriptions": [
                     {**asdict(sub), "topic": sub.topic.value} for sub in subscriptions
                 ]
             },
         }
-        await self.websocket.send(json.dumps(message))
+        await self.websocket.send(json_dumps(message))
 
-    def on(self, topic: str, handler: Callable[[dict], None]):
+    def on(self, topic: str, handler: Callable[[Any], None]):
         """Register a callback for raw topic name (e.g., 'mark_price')."""
         if topic not in self._event_handlers:
             self._event_handlers[topic] = []
         self._event_handlers[topic].append(handler)
 
+    async def _emit(self, topic: str, event: Any):
+        for handler in self._event_handlers.get(topic, []):
+            try:
+                await handler(event)
+            except Exception as e:
+                print(f"[MarketClient] {topic} handler error: {e}")
+
     async def _receive_loop(self):
+        while True:
+            try:
+                while True:
+                    raw = await self.websocket.recv(decode=False)
+                    try:
+                        msg = json_loads(raw)
+                        if not isinstance(msg, dict):
+                            raise ValueError(f"expected an object, got {msg!r}")
+                        topic = msg.get("topic")
+                        symbol = msg.get("symbol")
+                        handled = topic in self._event_handlers
+                        streams = self._streams.get((topic, symbol))
+                    except (ValueError, TypeError) as e:
+                        # a bad frame says nothing about the connection
+                        print(f"[MarketClient] Skipped a malformed message: {e}")
+                        continue
+                    if handled:
+                        await self._queue(topic, symbol).put(msg)
+                    if streams:
+                        for stream in streams:
+                            await stream.queue.put(msg)
+            except asyncio.CancelledError:
+                return
+            except websockets.ConnectionClosed as e:
+                print("[MarketClient] WebSocket closed.")
+                reason = f"code={e.code}, reason={e.reason}"
+            except OSError as e:
+                print(f"[MarketClient] WebSocket error: {e}")
+                reason = str(e)
+
+            if not self.auto_reconnect:
+                await self._close_websocket()
+                # no more messages will come, ends the `async for` over the streams
+                self._close_streams()
+                return
+            await self._reconnect(reason)
+
+    async def _close_websocket(self):
+        websocket = self.websocket
+        if websocket is not None:
+            with contextlib.suppress(Exception):
+                await websocket.close()
+
+    def _close_streams(self):
+        for streams in list(self._streams.values()):
+            for stream in streams:
+                stream.queue.close()
+
+    def _queue(self, topic: str, symbol: Optional[str]) -> BoundedQueue:
+        key = (topic, symbol)
+        queue = self._queues.get(key)
+        if queue is None:
+            policy = self.overflow_policies.get(topic, self.overflow_policy)
+            queue = self._queues[key] = BoundedQueue(self.queue_size, policy)
+            self._workers[key] = asyncio.create_task(self._dispatch(topic, queue))
+        return queue
+
+    async def _dispatch(self, topic: str, queue: BoundedQueue):
+        # messages are parsed here so conflated and dropped ones are never parsed
+        while True:
+            msg = await queue.get()
+            event = msg if self.raw else self._parse_event(msg)
+            if event is None:
+                continue
+            for handler in self._event_handlers.get(topic, []):
+                try:
+                    await handler(event)
+                except Exception as e:
+                    print(f"[MarketClient] {topic} handler error: {e}")
+
+    def stream(
+        self,
+        symbol: str,
+        topic: WebSocketSubscriptionTopic,
+        maxsize: Optional[int] = None,
+        policy: Optional[OverflowPolicy] = None,
+    ) -> MarketStream:
+        """
+        Stream the events of one subscription
+
+        ```python
+        async for event in client.stream("BTC/USDT-P", WebSocketSubscriptionTopic.MARK_PRICE):
+            print(event.markPrice)
+        ```
+
+        Args:
+            symbol: The symbol to stream
+            topic: The topic to stream
+            maxsize: Capacity of the stream's queue, defaults to the client's `queue_size`
+            policy: Overflow policy of the stream's queue, defaults to the topic's policy
+        """
+        return self.merged_stream(
+            [WebSocketSubscription(symbol, topic)], maxsize=maxsize, policy=policy
+        )
+
+    def merged_stream(
+        self,
+        subscriptions: List[WebSocketSubscription],
+        maxsize: Optional[int] = None,
+        policy: Optional[OverflowPolicy] = None,
+    ) -> MarketStream:
+        """
+        Stream the events of several subscriptions through a single queue, in
+        the order they are received
+
+        ```python
+        subscriptions = [
+            WebSocketSubscription(symbol, WebSocketSubscriptionTopic.TRADES)
+            for symbol in ["BTC/USDT-P", "ETH/USDT-P"]
+        ]
+        async with client.merged_stream(subscriptions) as trades:
+            async for event in trades:
+                print(event.symbol, event.trades)
+        ```
+        """
+        if policy is None:
+            topics = {sub.topic.value for sub in subscriptions}
+            policies = {
+                self.overflow_policies.get(topic, self.overflow_policy)
+                for topic in topics
+            }
+            policy = policies.pop() if len(policies) == 1 else self.overflow_policy
+        queue = BoundedQueue(maxsize or self.queue_size, policy)
+        return MarketStream(self, list(subscriptions), queue)
+
+    def add_stream(self, stream: MarketStream):
+        """Feed the stream with the messages of this connection, without subscribing"""
+        for sub in stream.subscriptions:
+            self._streams.setdefault((sub.topic.value, sub.symbol), []).append(stream)
+
+    def remove_stream(self, stream: MarketStream):
+        """Stop feeding the stream, without unsubscribing"""
+        for sub in stream.subscriptions:
+            streams = self._streams.get((sub.topic.value, sub.symbol), [])
+            if stream in streams:
+                streams.remove(stream)
+            if not streams:
+                self._streams.pop((sub.topic.value, sub.symbol), None)
+
+    def has_stream(self, subscription: WebSocketSubscription) -> bool:
+        """True when a stream is fed with the messages of the subscription"""
+        return (subscription.topic.value, subscription.symbol) in self._streams
+
+    def drop_subscriptions(self, subscriptions: List[WebSocketSubscription]):
+        """Forget subscriptions without unsubscribing, they are not restored after a reconnect"""
+        for sub in subscriptions:
+            self._subscriptions.pop((sub.symbol, sub.topic.value), None)
+
+    async def _attach_stream(self, stream: MarketStream):
+        self.add_stream(stream)
+        missing = [
+            sub
+            for sub in stream.subscriptions
+            if (sub.symbol, sub.topic.value) not in self._subscriptions
+        ]
+        if missing:
+            self._stream_subscriptions.update(
+                (sub.symbol, sub.topic.value) for sub in missing
+            )
+            await self.subscribe(missing)
+
+    async def _detach_stream(self, stream: MarketStream):
+        self.remove_stream(stream)
+
+        # only subscriptions made for streams end with the last stream using them
+        unused = [
+            sub
+            for sub in stream.subscriptions
+            if (sub.symbol, sub.topic.value) in self._stream_subscriptions
+            and not self.has_stream(sub)
+        ]
+        for sub in unused:
+            self._stream_subscriptions.discard((sub.symbol, sub.topic.value))
+        if unused and self.websocket is not None:
+            with contextlib.suppress(websockets.ConnectionClosed):
+                await self.unsubscribe(unused)
+
+    def queue_stats(self) -> Dict[Tuple[str, Optional[str]], QueueStats]:
+        """Depth, max depth, delivered and dropped counts by (topic, symbol)"""
+        return {key: queue.stats() for key, queue in self._queues.items()}
+
+    async def _reconnect(self, reason: str):
+        disconnected_at = time.time()
+        await self._emit("disconnected", DisconnectedEvent(reason, disconnected_at))
+        await self._close_websocket()
+
+        while True:
+            try:
+                self.websocket = await connect_with_retry(
+                    self.api_endpoint, jitter=self.reconnect_jitter
+                )
+                break
+            except Exception as e:
+                print(f"[MarketClient] Reconnect failed: {e}")
+
+        subscriptions = self.subscriptions
+        if subscriptions:
+            # if the new connection drops already, the receive loop reconnects again
+            with contextlib.suppress(websockets.ConnectionClosed):
+                await self._send_subscriptions("subscribe", subscriptions)
+        print("[MarketClient] Reconnected.")
+        await self._emit(
+            "reconnected",
+            ReconnectedEvent(disconnected_at, time.time(), subscriptions),
+        )
+
+    def _parse_event(self, msg: dict) -> Optional[Any]:
+        """The typed event of a message, None when it cannot be parsed"""
         try:
-            while True:
-                raw = await self.websocket.recv()
-                msg = json.loads(raw)
-                topic = msg.get("topic")
-                if topic and topic in self._event_handlers:
-                    for handler in self._event_handlers[topic]:
-                        await handler(msg)
-        except asyncio.CancelledError:
-            pass
-        except websockets.ConnectionClosed:
-            print("[MarketClient] WebSocket closed.")
-        except Exception as e:
-            print(f"[MarketClient] Receive loop error: {e}")
+            return parse_market_event(msg)
+        except (KeyError, TypeError, ValueError) as e:
+            # skipped, so handlers of a topic only ever receive its event type
+            print(f"[MarketClient] Skipped a {msg.get('topic')} message: {e}")
+            return None
 
     async def disconnect(self):
         if self._receive_task:
@@ -73,6 +421,14 @@ class HibachiWSMarketClient:
                 await self._receive_task
             except asyncio.CancelledError:
                 pass
+        self._close_streams()
+        self._streams.clear()
+        self._stream_subscriptions.clear()
+        for worker in self._workers.values():
+            worker.cancel()
+        await asyncio.gather(*self._workers.values(), return_exceptions=True)
+        self._workers.clear()
+        self._queues.clear()
         if self.websocket:
             await self.websocket.close()
             self.websocket = None
@@ -1,5 +1,4 @@
 import asyncio
-import json
 import os
 import random
 import time
@@ -9,12 +8,16 @@ from typing import Any, Callable, Dict, List, Optional
 import websockets
 from eth_keys import keys
 from hibachi_xyz.api import HibachiApiClient
+from hibachi_xyz.codec import json_dumps, json_loads
+from hibachi_xyz.dispatch import CLOSED, BoundedQueue
 from hibachi_xyz.helpers import (
     connect_with_retry,
     default_api_url,
     default_data_api_url,
     print_data,
 )
+from hibachi_xyz.numeric import as_number
+from hibachi_xyz.tracker import OrderTracker
 
 from .types import (
     AccountInfo,
@@ -96,6 +99,21 @@ class HibachiWSTradeClient:
     asyncio.run(main())
     ```
 
+    Responses are matched to requests by their message id, so several requests
+    can be in flight on the same connection:
+
+    ```python
+    results = await asyncio.gather(
+        client.place_order(params_a),
+        client.place_order(params_b),
+        client.cancel_order(order_id, nonce),
+    )
+    ```
+
+    Messages that do not answer a pending request are passed to the handlers
+    registered with `on`. Handlers run on their own task, so a slow handler does
+    not delay responses; a handler may itself await requests on the client.
+
     """
 
     def __init__(
@@ -106,17 +124,27 @@ class HibachiWSTradeClient:
         api_url: str = default_api_url,
         data_api_url: str = default_data_api_url,
         private_key: Optional[str] = None,
+        request_timeout: Optional[float] = None,
+        order_tracker: Optional[OrderTracker] = None,
     ):
         self.api_endpoint = api_url
         self.api_endpoint = (
             self.api_endpoint.replace("https://", "wss://") + "/ws/trade"
         )
         self.websocket = None
+        self.request_timeout = request_timeout
 
         # random id start
         self.message_id = random.randint(1, 1000000)
         self._event_handlers: Dict[str, List[Callable]] = {}
-        self._response_handlers: Dict[int, Callable] = {}
+        # pending requests by message id, resolved by the receive loop
+        self._response_handlers: Dict[int, asyncio.Future] = {}
+        self._receive_task: Optional[asyncio.Task] = None
+        # pushed messages go through a queue so slow handlers do not hold back responses
+        self._events: Optional[BoundedQueue] = None
+        self._dispatch_task: Optional[asyncio.Task] = None
+        # why the receive loop ended, requests fail with it instead of waiting
+        self._receive_error: Optional[Exception] = None
         self.api_key = api_key
         self.account_id = int(account_id) if isinstance(account_id, str) else account_id
         self.account_public_key = account_public_key
@@ -127,20 +155,108 @@ class HibachiWSTradeClient:
             account_id=account_id,
             api_key=api_key,
             private_key=private_key,
+            order_tracker=order_tracker,
         )
 
+    @property
+    def order_tracker(self) -> Optional[OrderTracker]:
+        return self.api.order_tracker
+
     async def connect(self):
         """Establish WebSocket connection with retry logic"""
         self.websocket = await connect_with_retry(
             web_url=self.api_endpoint + f"?accountId={self.account_id}",
             headers=[("Authorization", self.api_key)],
         )
+        self._receive_error = None
+        self._events = BoundedQueue()
+        self._dispatch_task = asyncio.create_task(self._dispatch(self._events))
+        self._receive_task = asyncio.create_task(self._receive_loop())
 
         return self
 
+    def on(self, topic: str, handler: Callable[[dict], None]):
+        """Register a callback for messages that are not a response to a request"""
+        if topic not in self._event_handlers:
+            self._event_handlers[topic] = []
+        self._event_handlers[topic].append(handler)
+
+    def _next_message_id(self) -> int:
+        self.message_id += 1
+        return self.message_id
+
+    async def _send_request(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Send a request and wait for the response carrying the same id"""
+        if self._receive_task is None or self._receive_task.done():
+            # nothing would read the response
+            error = self._receive_error
+            if error is None:
+                raise ConnectionError("Trade client is not connected")
+            raise ConnectionError(f"Trade client is not connected: {error}") from error
+        message_id = message["id"]
+        future = asyncio.get_running_loop().create_future()
+        self._response_handlers[message_id] = future
+        try:
+            await self.websocket.send(json_dumps(message))
+            return await asyncio.wait_for(future, timeout=self.request_timeout)
+        finally:
+            self._response_handlers.pop(message_id, None)
+
+    async def _receive_loop(self):
+        error: Exception = ConnectionError("WebSocket connection closed")
+        try:
+            while True:
+                raw = await self.websocket.recv(decode=False)
+                try:
+                    message = json_loads(raw)
+                    if not isinstance(message, dict):
+                        raise ValueError(f"expected an object, got {message!r}")
+                    future = self._response_handlers.pop(message.get("id"), None)
+                except (ValueError, TypeError) as e:
+                    print(f"[TradeClient] Skipped a malformed message: {e}")
+                    continue
+                if future is not None:
+                    if not future.done():
+                        future.set_result(message)
+                    continue
+                topic = message.get("topic") or message.get("method")
+                if self._event_handlers.get(topic):
+                    await self._events.put(message)
+        except asyncio.CancelledError:
+            pass
+        except websockets.ConnectionClosed as e:
+            print(f"[TradeClient] WebSocket closed: code={e.code}, reason={e.reason}")
+            error = ConnectionError(
+                f"WebSocket closed: code={e.code}, reason={e.reason}"
+            )
+        except Exception as e:
+            print(f"[TradeClient] Receive loop error: {e}")
+            error = e
+        finally:
+            self._receive_error = error
+            # nothing will answer the pending requests anymore
+            for future in self._response_handlers.values():
+                if not future.done():
+                    future.set_exception(error)
+            self._response_handlers.clear()
+            # the dispatcher delivers what is already queued, then stops
+            self._events.close()
+
+    async def _dispatch(self, queue: BoundedQueue):
+        while True:
+            message = await queue.get()
+            if message is CLOSED:
+                return
+            topic = message.get("topic") or message.get("method")
+            for handler in self._event_handlers.get(topic, []):
+                try:
+                    await handler(message)
+                except Exception as e:
+                    print(f"[TradeClient] {topic} handler error: {e}")
+
     async def place_order(self, params: OrderPlaceParams) -> tuple[Nonce, int]:
         """Place a new order"""
-        self.message_id += 1
+        message_id = self._next_message_id()
 
         nonce = time.time_ns() // 1_000
         side = params.side
@@ -164,26 +280,35 @@ class HibachiWSTradeClient:
         prepare_packet["accountId"] = self.account_id
 
         message = {
-            "id": self.message_id,
+            "id": message_id,
             "method": "order.place",
             "params": prepare_packet,
             "signature": prepare_packet.get("signature"),
         }
 
-        await self.websocket.send(json.dumps(message))
-        response = await self.websocket.recv()
-        response_data = json.loads(response)
+        response_data = await self._send_request(message)
 
         print("ws place_order -------------------------------------------")
         print_data(response_data)
 
         # response_data["result"] = OrderPlaceResponseResult(**response_data["result"])
         # nonce: Nonce = prepare_packet.get("nonce")
-        return (nonce, int(response_data.get("result").get("orderId")))
+        order_id = int(response_data.get("result").get("orderId"))
+        self.api._track_placed(
+            nonce,
+            order_id,
+            params.symbol,
+            side,
+            params.quantity,
+            None if params.price is None else float(params.price),
+            params.trigger_price,
+            None,
+        )
+        return (nonce, order_id)
 
     async def cancel_order(self, orderId: int, nonce: int) -> WebSocketResponse:
         """Cancel an existing order"""
-        self.message_id += 1
+        message_id = self._next_message_id()
 
         prepare_packet = self.api._cancel_order_request_data(orderId, nonce, False)
 
@@ -191,7 +316,7 @@ class HibachiWSTradeClient:
         print_data(prepare_packet)
 
         message = {
-            "id": self.message_id,
+            "id": message_id,
             "method": "order.cancel",
             "params": {
                 "orderId": str(orderId),
@@ -200,36 +325,48 @@ class HibachiWSTradeClient:
             },
             "signature": prepare_packet.get("signature"),
         }
-        await self.websocket.send(json.dumps(message))
-        response = await self.websocket.recv()
-        response_data = json.loads(response)
+        response_data = await self._send_request(message)
 
         print_data(response_data)
 
+        if self.order_tracker is not None and response_data.get("status") == 200:
+            self.order_tracker.removed(orderId)
+
         # return WebSocketResponse(**response_data)
         return response_data
 
     async def modify_order(
         self,
-        order: Order,
+        order: Order | int,
         quantity: float,
         price: str,
         side: websockets.Side,
         maxFeesPercent: float,
         nonce: Optional[Nonce] = None,
     ) -> WebSocketResponse:
-        """Modify an existing order"""
-        self.message_id += 1
+        """
+        Modify an existing order
+
+        `order` can also be an order id, the order is then taken from the
+        `order_tracker` and only read over REST when it is not tracked.
+        """
+        message_id = self._next_message_id()
+
+        if not isinstance(order, Order):
+            order_id = int(order)
+            order = self.api._tracked_order(order_id)
+            if order is None:
+                order = await asyncio.to_thread(
+                    self.api.get_order_details, order_id=order_id
+                )
 
         prepare_packet = self.api._update_order_generate_sig(
             order,
             side=side,
             max_fees_percent=maxFeesPercent,
             quantity=quantity,
-            price=float(price),
-            trigger_price=float(order.triggerPrice)
-            if isinstance(order.triggerPrice, str)
-            else order.triggerPrice,
+            price=as_number(price),
+            trigger_price=as_number(order.triggerPrice),
             nonce=nonce,
         )
 
@@ -237,36 +374,34 @@ class HibachiWSTradeClient:
         del prepare_packet["signature"]
 
         message = {
-            "id": self.message_id,
+            "id": message_id,
             "method": "order.modify",
             "params": prepare_packet,
             "signature": signature,
         }
 
-        await self.websocket.send(json.dumps(message))
-        response = await self.websocket.recv()
-        response_data = json.loads(response)
+        response_data = await self._send_request(message)
 
         if "error" in response_data and response_data["error"]:
             raise Exception(
                 f"Error modifying order: {response_data["error"]["message"]}"
             )
 
+        if self.order_tracker is not None:
+            self.order_tracker.modified(int(order.orderId), quantity, as_number(price))
+
         return response_data
         # return WebSocketResponse(**response_data)
 
     async def get_order_status(self, orderId: int) -> OrderStatusResponse:
         """Get status of a specific order"""
-        self.message_id += 1
         message = {
-            "id": self.message_id,
+            "id": self._next_message_id(),
             "method": "order.status",
             "params": {"orderId": str(orderId), "accountId": int(self.account_id)},
         }
 
-        await self.websocket.send(json.dumps(message))
-        response = await self.websocket.recv()
-        response_data = json.loads(response)
+        response_data = await self._send_request(message)
 
         print_data(response_data)
 
@@ -275,30 +410,28 @@ class HibachiWSTradeClient:
 
     async def get_orders_status(self) -> OrdersStatusResponse:
         """Get status of all orders"""
-        self.message_id += 1
-
         message = {
-            "id": self.message_id,
+            "id": self._next_message_id(),
             "method": "orders.status",
             "params": {"accountId": int(self.account_id)},
         }
 
-        await self.websocket.send(json.dumps(message))
-        response = await self.websocket.recv()
-        response_data = json.loads(response)
+        response_data = await self._send_request(message)
         response_data["result"] = [Order(**order) for order in response_data["result"]]
+        if self.order_tracker is not None:
+            self.order_tracker.load(response_data["result"])
         return OrdersStatusResponse(**response_data)
 
     async def cancel_all_orders(self) -> bool:
         """Cancel all orders"""
-        self.message_id += 1
+        message_id = self._next_message_id()
 
         nonce = time.time_ns() // 1_000
 
         signed_packet = self.api._cancel_order_request_data(None, nonce, False)
 
         message = {
-            "id": self.message_id,
+            "id": message_id,
             "method": "orders.cancel",
             "params": {
                 "accountId": self.account_id,
@@ -307,47 +440,56 @@ class HibachiWSTradeClient:
             },
             "signature": signed_packet.get("signature"),
         }
-        await self.websocket.send(json.dumps(message))
-        response = await self.websocket.recv()
-        response_data = json.loads(response)
+        response_data = await self._send_request(message)
 
         print_data(response_data)
 
-        if response_data.get("id") == self.message_id:
-            return response_data.get("status") == 200
+        if response_data.get("id") == message_id:
+            cancelled = response_data.get("status") == 200
+            if cancelled and self.order_tracker is not None:
+                self.order_tracker.clear()
+            return cancelled
         else:
             return False
 
     async def batch_orders(self, params: OrdersBatchParams) -> WebSocketResponse:
         """Execute multiple order operations in a single request"""
-        self.message_id += 1
         message = {
-            "id": self.message_id,
+            "id": self._next_message_id(),
             "method": "orders.batch",
             "params": asdict(params),
         }
-        await self.websocket.send(json.dumps(message))
-        response = await self.websocket.recv()
-        response_data = json.loads(response)
+        response_data = await self._send_request(message)
         return WebSocketResponse(**response_data)
 
     async def enable_cancel_on_disconnect(
         self, params: EnableCancelOnDisconnectParams
     ) -> WebSocketResponse:
         """Enable automatic order cancellation on WebSocket disconnect"""
-        self.message_id += 1
         message = {
-            "id": self.message_id,
+            "id": self._next_message_id(),
             "method": "orders.enableCancelOnDisconnect",
             "params": asdict(params),
         }
-        await self.websocket.send(json.dumps(message))
-        response = await self.websocket.recv()
-        response_data = json.loads(response)
+        response_data = await self._send_request(message)
         return WebSocketResponse(**response_data)
 
     async def disconnect(self):
         """Close the WebSocket connection"""
+        if self._receive_task:
+            self._receive_task.cancel()
+            try:
+                await self._receive_task
+            except asyncio.CancelledError:
+                pass
+            self._receive_task = None
+        if self._dispatch_task:
+            self._dispatch_task.cancel()
+            try:
+                await self._dispatch_task
+            except asyncio.CancelledError:
+                pass
+            self._dispatch_task = None
         if self.websocket:
             await self.websocket.close()
             self.websocket = None
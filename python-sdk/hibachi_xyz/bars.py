@@ -0,0 +1,420 @@
+import asyncio
+import math
+import re
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from hibachi_xyz.events import KlinesEvent, KlineTick, TradesEvent
+from hibachi_xyz.history import _SECONDS_LIMIT, INTERVAL_MS
+from hibachi_xyz.types import Interval, TakerSide
+
+
+@dataclass(slots=True)
+class Bar:
+    """
+    OHLCV bar built from trades. Times are in milliseconds: for time bars
+    `start`/`end` delimit the window, for volume and notional bars they are
+    the times of the first and last trade.
+    """
+
+    symbol: str
+    start: int
+    end: int
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float
+    notional: float
+    buyVolume: float
+    trades: int
+
+    @property
+    def vwap(self) -> float:
+        return self.notional / self.volume if self.volume else self.close
+
+
+@dataclass(slots=True)
+class BarReconciliation:
+    """Local bars of a server kline window compared with the server kline"""
+
+    symbol: str
+    start: int
+    end: int
+    local: Optional[Bar]  # the local bars of the window merged, None without trades
+    server: KlineTick
+    matches: bool
+
+
+def _to_ms(timestamp: int) -> int:
+    return timestamp * 1000 if timestamp < _SECONDS_LIMIT else timestamp
+
+
+_UNIT_MS = {"s": 1000, "m": 60_000, "min": 60_000, "h": 3_600_000, "d": 86_400_000}
+_UNIT_MS["w"] = 7 * _UNIT_MS["d"]
+
+
+def _interval_ms(interval: Union[Interval, str]) -> Optional[int]:
+    if isinstance(interval, Interval):
+        return INTERVAL_MS[interval]
+    match = re.fullmatch(r"(\d+)([a-z]+)", interval or "")
+    if match is None or match.group(2) not in _UNIT_MS:
+        return None
+    return int(match.group(1)) * _UNIT_MS[match.group(2)]
+
+
+def _merge_bars(symbol: str, start: int, end: int, bars: List[Bar]) -> Bar:
+    return Bar(
+        symbol=symbol,
+        start=start,
+        end=end,
+        open=bars[0].open,
+        high=max(bar.high for bar in bars),
+        low=min(bar.low for bar in bars),
+        close=bars[-1].close,
+        volume=sum(bar.volume for bar in bars),
+        notional=sum(bar.notional for bar in bars),
+        buyVolume=sum(bar.buyVolume for bar in bars),
+        trades=sum(bar.trades for bar in bars),
+    )
+
+
+class BarBuilder(ABC):
+    """
+    Incremental bar builder for one symbol. `add` takes one trade in O(1) and
+    returns the bar that trade completed, if any.
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.current: Optional[Bar] = None
+
+    @abstractmethod
+    def add(
+        self, price: float, quantity: float, timestamp: int, taker_side: TakerSide
+    ) -> Optional[Bar]:
+        pass
+
+    def flush(self, now_ms: int) -> Optional[Bar]:
+        """Complete the current bar if it is over by `now_ms`, without a new trade"""
+        return None
+
+    def _open(
+        self, start: int, end: int, price: float, quantity: float, buy: bool
+    ) -> Bar:
+        self.current = Bar(
+            self.symbol,
+            start,
+            end,
+            price,
+            price,
+            price,
+            price,
+            quantity,
+            price * quantity,
+            quantity if buy else 0.0,
+            1,
+        )
+        return self.current
+
+    @staticmethod
+    def _update(bar: Bar, price: float, quantity: float, buy: bool):
+        if price > bar.high:
+            bar.high = price
+        elif price < bar.low:
+            bar.low = price
+        bar.close = price
+        bar.volume += quantity
+        bar.notional += price * quantity
+        if buy:
+            bar.buyVolume += quantity
+        bar.trades += 1
+
+
+class TimeBarBuilder(BarBuilder):
+    """
+    Bars over fixed time windows of `interval_ms`, aligned to the epoch.
+    Windows without trades produce no bar.
+
+    Completed bars are kept to compare them with server klines of any interval
+    that is a multiple of `interval_ms`, see `reconcile`. Trades of a window
+    that was already completed are dropped and counted in `late_trades`.
+
+    Args:
+        symbol: The trading symbol
+        interval_ms: Length of a bar in milliseconds, e.g. 5000
+        history: Number of completed bars kept for reconciliation
+        tolerance: Relative tolerance of the reconciliation
+    """
+
+    def __init__(
+        self,
+        symbol: str,
+        interval_ms: int,
+        history: int = 1024,
+        tolerance: float = 1e-6,
+    ):
+        super().__init__(symbol)
+        self.interval_ms = interval_ms
+        self.tolerance = tolerance
+        self.completed: Deque[Bar] = deque(maxlen=history)
+        self.late_trades = 0
+        # bars starting before this are complete
+        self._closed_until = 0
+        self._pending: Dict[int, KlineTick] = {}
+
+    def add(
+        self, price: float, quantity: float, timestamp: int, taker_side: TakerSide
+    ) -> Optional[Bar]:
+        timestamp = _to_ms(timestamp)
+        bar = self.current
+        buy = taker_side is TakerSide.Buy
+        if timestamp < self._closed_until:
+            # its bar was already emitted, reopening it would emit it twice and
+            # counting it in the current bar would shift that bar's prices
+            self.late_trades += 1
+            return None
+        if bar is not None and timestamp < bar.end:
+            self._update(bar, price, quantity, buy)
+            return None
+
+        closed = self._close() if bar is not None else None
+        start = timestamp - timestamp % self.interval_ms
+        self._open(start, start + self.interval_ms, price, quantity, buy)
+        self._closed_until = max(self._closed_until, start)
+        return closed
+
+    def flush(self, now_ms: int) -> Optional[Bar]:
+        if self.current is None or now_ms < self.current.end:
+            return None
+        closed = self._close()
+        self._closed_until = max(self._closed_until, closed.end)
+        return closed
+
+    def _close(self) -> Bar:
+        bar = self.current
+        self.current = None
+        self.completed.append(bar)
+        return bar
+
+    def reconcile(self, kline: KlineTick) -> List[BarReconciliation]:
+        """
+        Compare a server kline with the local bars of its window once they are
+        complete. Updates of a window replace each other until then.
+        Returns the reconciliations that became possible.
+        """
+        window = _interval_ms(kline.interval)
+        if window is None or window % self.interval_ms:
+            return []
+        self._pending[_to_ms(kline.timestamp)] = kline
+        return self.ready()
+
+    def ready(self) -> List[BarReconciliation]:
+        """Reconciliations of pending server klines whose window is complete"""
+        results = []
+        for start, kline in list(self._pending.items()):
+            end = start + _interval_ms(kline.interval)
+            if end > self._closed_until:
+                continue
+            del self._pending[start]
+            results.append(self._compare(start, end, kline))
+        return results
+
+    def _compare(self, start: int, end: int, kline: KlineTick) -> BarReconciliation:
+        bars = [bar for bar in self.completed if start <= bar.start < end]
+        if not bars:
+            return BarReconciliation(
+                self.symbol, start, end, None, kline, kline.volumeNotional == 0
+            )
+        local = _merge_bars(self.symbol, start, end, bars)
+        rel_tol = self.tolerance
+        matches = (
+            math.isclose(local.open, kline.open, rel_tol=rel_tol)
+            and math.isclose(local.high, kline.high, rel_tol=rel_tol)
+            and math.isclose(local.low, kline.low, rel_tol=rel_tol)
+            and math.isclose(local.close, kline.close, rel_tol=rel_tol)
+            and math.isclose(local.notional, kline.volumeNotional, rel_tol=rel_tol)
+        )
+        return BarReconciliation(self.symbol, start, end, local, kline, matches)
+
+
+class ThresholdBarBuilder(BarBuilder):
+    """
+    Bars that complete once `measure` ("volume" or "notional") reaches
+    `threshold`. The trade crossing the threshold belongs to the completed bar.
+    """
+
+    measure = "volume"
+
+    def __init__(self, symbol: str, threshold: float):
+        super().__init__(symbol)
+        if threshold <= 0:
+            raise ValueError("threshold must be positive")
+        self.threshold = threshold
+
+    def add(
+        self, price: float, quantity: float, timestamp: int, taker_side: TakerSide
+    ) -> Optional[Bar]:
+        timestamp = _to_ms(timestamp)
+        bar = self.current
+        buy = taker_side is TakerSide.Buy
+        if bar is None:
+            bar = self._open(timestamp, timestamp, price, quantity, buy)
+        else:
+            self._update(bar, price, quantity, buy)
+            bar.end = timestamp
+        if getattr(bar, self.measure) < self.threshold:
+            return None
+        self.current = None
+        return bar
+
+
+class VolumeBarBuilder(ThresholdBarBuilder):
+    """Bars of `threshold` traded quantity"""
+
+    measure = "volume"
+
+
+class NotionalBarBuilder(ThresholdBarBuilder):
+    """Bars of `threshold` traded notional (dollar bars)"""
+
+    measure = "notional"
+
+
+class BarAggregator:
+    """
+    Builds bars from the trades topic of a market client and reconciles time
+    bars with the klines topic when it is subscribed too.
+
+    ```python
+    bars = BarAggregator(market_client)
+    bars.time_bars("BTC/USDT-P", 5_000)
+    bars.notional_bars("BTC/USDT-P", 1_000_000)
+    bars.on_bar(handle_bar)
+    bars.on_reconcile(handle_reconciliation)
+
+    await market_client.subscribe(
+        [
+            WebSocketSubscription("BTC/USDT-P", WebSocketSubscriptionTopic.TRADES),
+            WebSocketSubscription("BTC/USDT-P", WebSocketSubscriptionTopic.KLINES),
+        ]
+    )
+    ```
+
+    Time bars are completed by the next trade, or by a timer every
+    `flush_interval` seconds once the window ended `flush_grace` seconds ago.
+
+    Args:
+        market_client: A `HibachiWSMarketClient` or `ShardedMarketClient`
+        flush_interval: Seconds between checks for time bars to complete, None to disable
+        flush_grace: Seconds to wait for late trades after a window ended
+    """
+
+    def __init__(
+        self,
+        market_client: Any,
+        flush_interval: Optional[float] = 0.25,
+        flush_grace: float = 1.0,
+    ):
+        self.flush_interval = flush_interval
+        self.flush_grace = flush_grace
+        self._builders: Dict[str, List[BarBuilder]] = defaultdict(list)
+        self._bar_listeners: List[Tuple[Optional[BarBuilder], Callable[[Bar], Any]]] = (
+            []
+        )
+        self._reconcile_listeners: List[Callable[[BarReconciliation], Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        market_client.on("trades", self._handle_trades)
+        market_client.on("klines", self._handle_klines)
+
+    def add(self, builder: BarBuilder) -> BarBuilder:
+        self._builders[builder.symbol].append(builder)
+        return builder
+
+    def time_bars(
+        self, symbol: str, interval_ms: int, **options: Any
+    ) -> TimeBarBuilder:
+        return self.add(TimeBarBuilder(symbol, interval_ms, **options))
+
+    def volume_bars(self, symbol: str, quantity: float) -> VolumeBarBuilder:
+        return self.add(VolumeBarBuilder(symbol, quantity))
+
+    def notional_bars(self, symbol: str, notional: float) -> NotionalBarBuilder:
+        return self.add(NotionalBarBuilder(symbol, notional))
+
+    def builders(self, symbol: str) -> List[BarBuilder]:
+        return list(self._builders.get(symbol, []))
+
+    def on_bar(
+        self, handler: Callable[[Bar], Any], builder: Optional[BarBuilder] = None
+    ):
+        """Register an async callback invoked with the bars of `builder`, or of all builders"""
+        self._bar_listeners.append((builder, handler))
+
+    def on_reconcile(self, handler: Callable[[BarReconciliation], Any]):
+        """Register an async callback invoked with every reconciled server kline"""
+        self._reconcile_listeners.append(handler)
+
+    async def _handle_trades(self, event: Union[TradesEvent, dict]):
+        if isinstance(event, dict):
+            event = TradesEvent.from_message(event)
+        builders = self._builders.get(event.symbol)
+        if not builders:
+            return
+        if self.flush_interval is not None and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+        for trade in event.trades:
+            for builder in builders:
+                bar = builder.add(
+                    trade.price, trade.quantity, trade.timestamp, trade.takerSide
+                )
+                if bar is not None:
+                    await self._emit_bar(builder, bar)
+
+    async def _handle_klines(self, event: Union[KlinesEvent, dict]):
+        if isinstance(event, dict):
+            event = KlinesEvent.from_message(event)
+        for builder in self._builders.get(event.symbol, []):
+            if isinstance(builder, TimeBarBuilder):
+                for kline in event.klines:
+                    for result in builder.reconcile(kline):
+                        await self._emit_reconciliation(result)
+
+    async def flush(self, now_ms: Optional[int] = None):
+        """Complete the time bars whose window ended before `now_ms` minus the grace period"""
+        if now_ms is None:
+            now_ms = int((time.time() - self.flush_grace) * 1000)
+        for builders in self._builders.values():
+            for builder in builders:
+                bar = builder.flush(now_ms)
+                if bar is not None:
+                    await self._emit_bar(builder, bar)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"[BarAggregator] flush error: {e}")
+
+    async def _emit_bar(self, builder: BarBuilder, bar: Bar):
+        for target, handler in self._bar_listeners:
+            if target is None or target is builder:
+                await handler(bar)
+        if isinstance(builder, TimeBarBuilder):
+            for result in builder.ready():
+                await self._emit_reconciliation(result)
+
+    async def _emit_reconciliation(self, result: BarReconciliation):
+        for handler in self._reconcile_listeners:
+            await handler(result)
+
+    def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
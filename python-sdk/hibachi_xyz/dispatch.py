@@ -0,0 +1,100 @@
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any
+
+# returned by `BoundedQueue.get` once the queue is closed
+CLOSED = object()
+
+
+class OverflowPolicy(Enum):
+    """What a full `BoundedQueue` does with a new message"""
+
+    # discard the oldest queued message
+    DROP_OLDEST = "drop_oldest"
+    # keep only the latest message, for topics where each message carries the full state
+    CONFLATE = "conflate"
+    # wait for the consumer, which holds back the websocket reader
+    BLOCK = "block"
+
+
+@dataclass
+class QueueStats:
+    depth: int
+    maxDepth: int
+    delivered: int
+    dropped: int
+
+
+class BoundedQueue:
+    """
+    Bounded queue between a websocket reader and a consumer, applying an
+    `OverflowPolicy` when the consumer falls behind and counting what it drops.
+
+    A conflating queue holds at most one message regardless of `maxsize`.
+    After `close()` the consumer receives `CLOSED` once the queue is drained.
+    """
+
+    policy: OverflowPolicy
+    max_depth: int
+    delivered: int
+    dropped: int
+
+    def __init__(
+        self, maxsize: int = 1000, policy: OverflowPolicy = OverflowPolicy.BLOCK
+    ):
+        self.policy = policy
+        self.maxsize = 1 if policy is OverflowPolicy.CONFLATE else maxsize
+        self._items: deque = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self.max_depth = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.closed = False
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    async def put(self, item: Any):
+        items = self._items
+        while len(items) >= self.maxsize and not self.closed:
+            if self.policy is not OverflowPolicy.BLOCK:
+                items.popleft()
+                self.dropped += 1
+                break
+            self._not_full.clear()
+            await self._not_full.wait()
+        if self.closed:
+            return
+        items.append(item)
+        if len(items) > self.max_depth:
+            self.max_depth = len(items)
+        self._not_empty.set()
+
+    async def get(self) -> Any:
+        items = self._items
+        while not items:
+            if self.closed:
+                return CLOSED
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        item = items.popleft()
+        self._not_full.set()
+        self.delivered += 1
+        return item
+
+    def close(self):
+        """Stop accepting messages and release a blocked producer"""
+        self.closed = True
+        self._not_empty.set()
+        self._not_full.set()
+
+    def stats(self) -> QueueStats:
+        return QueueStats(
+            depth=len(self._items),
+            maxDepth=self.max_depth,
+            delivered=self.delivered,
+            dropped=self.dropped,
+        )
@@ -0,0 +1,87 @@
+import struct
+from decimal import Decimal
+from typing import Optional, TypeAlias, Union
+
+from hibachi_xyz.types import FutureContract, Side
+
+Number: TypeAlias = Union[float, int, Decimal]
+
+_TWO_POW_32 = pow(2, 32)
+_MAX_FEES_DECIMALS = 8
+
+# nonce, contract id, quantity, side, max fees
+_MARKET_ORDER_PAYLOAD = struct.Struct(">QIQIQ")
+# nonce, contract id, quantity, side, price, max fees
+_LIMIT_ORDER_PAYLOAD = struct.Struct(">QIQIQQ")
+
+
+class OrderPayloadEncoder:
+    """
+    Encodes the signed payload of create and update order requests for one contract.
+
+    The scale factors are computed once when the encoder is built, encoders are
+    cached per contract by `HibachiApiClient` whenever exchange info is loaded.
+
+    Floats are scaled exactly like the server expects them (the same float
+    arithmetic the SDK always used). `Decimal` and `int` values are scaled
+    exactly, without going through a float.
+
+    ```python
+    encoder = OrderPayloadEncoder(contract)
+    payload = encoder.encode(nonce, Decimal("0.001"), Side.BID, Decimal("0.0005"), Decimal("95000.5"))
+    ```
+    """
+
+    contract: FutureContract
+
+    def __init__(self, contract: FutureContract):
+        self.contract = contract
+        self._contract_id = contract.id
+        self._underlying_decimals = contract.underlyingDecimals
+        self._price_decimals = contract.settlementDecimals - contract.underlyingDecimals
+        self._quantity_scale = pow(10, contract.underlyingDecimals)
+        self._price_scale = pow(10, self._price_decimals)
+
+    def quantity_to_int(self, quantity: Number) -> int:
+        """Scale a quantity to the contract's underlying decimals"""
+        if isinstance(quantity, float):
+            return int(quantity * self._quantity_scale)
+        return int(Decimal(quantity).scaleb(self._underlying_decimals))
+
+    def price_to_int(self, price: Number) -> int:
+        """Scale a price to the 32.32 fixed point representation used in signatures"""
+        if isinstance(price, float):
+            return int(price * _TWO_POW_32 * self._price_scale)
+        return int((Decimal(price) * _TWO_POW_32).scaleb(self._price_decimals))
+
+    def max_fees_to_int(self, max_fees_percent: Number) -> int:
+        if isinstance(max_fees_percent, float):
+            return int(max_fees_percent * pow(10, _MAX_FEES_DECIMALS))
+        return int(Decimal(max_fees_percent).scaleb(_MAX_FEES_DECIMALS))
+
+    def encode(
+        self,
+        nonce: int,
+        quantity: Number,
+        side: Side,
+        max_fees_percent: Number,
+        price: Optional[Number] = None,
+    ) -> bytes:
+        """Return the 32 byte (market) or 40 byte (limit) order payload"""
+        side_code = 0 if side is Side.ASK else 1
+        if price is None:
+            return _MARKET_ORDER_PAYLOAD.pack(
+                nonce,
+                self._contract_id,
+                self.quantity_to_int(quantity),
+                side_code,
+                self.max_fees_to_int(max_fees_percent),
+            )
+        return _LIMIT_ORDER_PAYLOAD.pack(
+            nonce,
+            self._contract_id,
+            self.quantity_to_int(quantity),
+            side_code,
+            self.price_to_int(price),
+            self.max_fees_to_int(max_fees_percent),
+        )
@@ -0,0 +1,238 @@
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Type, Union
+
+from hibachi_xyz.types import (
+    AccountStreamStartResult,
+    TakerSide,
+    WebSocketSubscription,
+    WebSocketSubscriptionTopic,
+)
+
+PriceLevel = Tuple[float, float]
+
+
+def _data(message: Dict[str, Any]) -> Dict[str, Any]:
+    return message.get("data", message)
+
+
+def _optional_int(value: Any) -> Optional[int]:
+    return None if value is None else int(value)
+
+
+@dataclass(slots=True)
+class MarkPriceEvent:
+    symbol: str
+    markPrice: float
+
+    @classmethod
+    def from_message(cls, message: Dict[str, Any]) -> "MarkPriceEvent":
+        data = _data(message)
+        return cls(message.get("symbol"), float(data["markPrice"]))
+
+
+@dataclass(slots=True)
+class SpotPriceEvent:
+    symbol: str
+    spotPrice: float
+
+    @classmethod
+    def from_message(cls, message: Dict[str, Any]) -> "SpotPriceEvent":
+        data = _data(message)
+        return cls(message.get("symbol"), float(data["spotPrice"]))
+
+
+@dataclass(slots=True)
+class FundingRateEstimationEvent:
+    symbol: str
+    estimatedFundingRate: float
+    nextFundingTimestamp: int
+
+    @classmethod
+    def from_message(cls, message: Dict[str, Any]) -> "FundingRateEstimationEvent":
+        data = _data(message)
+        data = data.get("fundingRateEstimation", data)
+        return cls(
+            message.get("symbol"),
+            float(data["estimatedFundingRate"]),
+            int(data["nextFundingTimestamp"]),
+        )
+
+
+@dataclass(slots=True)
+class AskBidPriceEvent:
+    symbol: str
+    askPrice: float
+    bidPrice: float
+
+    @classmethod
+    def from_message(cls, message: Dict[str, Any]) -> "AskBidPriceEvent":
+        data = _data(message)
+        return cls(
+            message.get("symbol"), float(data["askPrice"]), float(data["bidPrice"])
+        )
+
+
+@dataclass(slots=True)
+class TradeTick:
+    price: float
+    quantity: float
+    takerSide: TakerSide
+    timestamp: int
+
+
+@dataclass(slots=True)
+class TradesEvent:
+    symbol: str
+    trades: List[TradeTick]
+
+    @classmethod
+    def from_message(cls, message: Dict[str, Any]) -> "TradesEvent":
+        data = _data(message)
+        trades = data.get("trades")
+        if trades is None:
+            trades = [data.get("trade", data)]
+        return cls(
+            message.get("symbol"),
+            [
+                TradeTick(
+                    float(trade["price"]),
+                    float(trade["quantity"]),
+                    TakerSide(trade["takerSide"]),
+                    int(trade["timestamp"]),
+                )
+                for trade in trades
+            ],
+        )
+
+
+@dataclass(slots=True)
+class KlineTick:
+    open: float
+    high: float
+    low: float
+    close: float
+    volumeNotional: float
+    interval: str
+    timestamp: int
+
+
+@dataclass(slots=True)
+class KlinesEvent:
+    symbol: str
+    klines: List[KlineTick]
+
+    @classmethod
+    def from_message(cls, message: Dict[str, Any]) -> "KlinesEvent":
+        data = _data(message)
+        klines = data.get("klines")
+        if klines is None:
+            klines = [data.get("kline", data)]
+        interval = data.get("interval")
+        return cls(
+            message.get("symbol"),
+            [
+                KlineTick(
+                    float(kline["open"]),
+                    float(kline["high"]),
+                    float(kline["low"]),
+                    float(kline["close"]),
+                    float(kline["volumeNotional"]),
+                    kline.get("interval", interval),
+                    int(kline["timestamp"]),
+                )
+                for kline in klines
+            ],
+        )
+
+
+def _parse_levels(side: Any) -> List[PriceLevel]:
+    if side is None:
+        return []
+    if isinstance(side, dict):
+        side = side.get("levels", [])
+    return [
+        (
+            (float(level["price"]), float(level["quantity"]))
+            if isinstance(level, dict)
+            else (float(level[0]), float(level[1]))
+        )
+        for level in side
+    ]
+
+
+@dataclass(slots=True)
+class OrderBookEvent:
+    """Snapshot or delta of the `orderbook` topic, levels are (price, quantity) tuples"""
+
+    symbol: str
+    isSnapshot: bool
+    bid: List[PriceLevel]
+    ask: List[PriceLevel]
+    sequence: Optional[int]
+
+    @classmethod
+    def from_message(cls, message: Dict[str, Any]) -> "OrderBookEvent":
+        data = _data(message)
+        message_type = message.get("messageType", data.get("messageType", "Snapshot"))
+        return cls(
+            message.get("symbol"),
+            str(message_type).lower() == "snapshot",
+            _parse_levels(data.get("bid")),
+            _parse_levels(data.get("ask")),
+            _optional_int(message.get("sequence", data.get("sequence"))),
+        )
+
+
+@dataclass(slots=True)
+class DisconnectedEvent:
+    """Emitted under the `disconnected` topic when the connection drops, market data is missing from here on"""
+
+    reason: str
+    timestamp: float
+
+
+@dataclass(slots=True)
+class ReconnectedEvent:
+    """Emitted under the `reconnected` topic once the connection is back and subscriptions are restored"""
+
+    disconnectedAt: float
+    reconnectedAt: float
+    subscriptions: List[WebSocketSubscription]
+
+
+@dataclass(slots=True)
+class AccountReconnectedEvent:
+    """Emitted by `HibachiWSAccountClient` under the `reconnected` topic once the account stream is restarted, `stream` carries a fresh snapshot"""
+
+    disconnectedAt: float
+    reconnectedAt: float
+    stream: AccountStreamStartResult
+
+
+MarketEvent = Union[
+    MarkPriceEvent,
+    SpotPriceEvent,
+    FundingRateEstimationEvent,
+    AskBidPriceEvent,
+    TradesEvent,
+    KlinesEvent,
+    OrderBookEvent,
+]
+
+market_event_types: Dict[str, Type[MarketEvent]] = {
+    WebSocketSubscriptionTopic.MARK_PRICE.value: MarkPriceEvent,
+    WebSocketSubscriptionTopic.SPOT_PRICE.value: SpotPriceEvent,
+    WebSocketSubscriptionTopic.FUNDING_RATE_ESTIMATION.value: FundingRateEstimationEvent,
+    WebSocketSubscriptionTopic.ASK_BID_PRICE.value: AskBidPriceEvent,
+    WebSocketSubscriptionTopic.TRADES.value: TradesEvent,
+    WebSocketSubscriptionTopic.KLINES.value: KlinesEvent,
+    WebSocketSubscriptionTopic.ORDERBOOK.value: OrderBookEvent,
+}
+
+
+def parse_market_event(message: Dict[str, Any]) -> Union[MarketEvent, Dict[str, Any]]:
+    """Build the typed event of a market websocket message, unknown topics are returned as is"""
+    event_type = market_event_types.get(message.get("topic"))
+    if event_type is None:
+        return message
+    return event_type.from_message(message)
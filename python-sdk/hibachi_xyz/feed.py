@@ -0,0 +1,431 @@
+import asyncio
+import math
+import struct
+import time
+from enum import IntEnum
+from multiprocessing import shared_memory
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple
+
+from hibachi_xyz.events import (
+    AskBidPriceEvent,
+    FundingRateEstimationEvent,
+    KlinesEvent,
+    MarkPriceEvent,
+    OrderBookEvent,
+    SpotPriceEvent,
+    TradesEvent,
+    parse_market_event,
+)
+from hibachi_xyz.types import TakerSide, WebSocketSubscriptionTopic
+
+
+class FeedTopic(IntEnum):
+    MARK_PRICE = 1
+    SPOT_PRICE = 2
+    FUNDING_RATE_ESTIMATION = 3
+    TRADES = 4
+    KLINES = 5
+    ORDERBOOK = 6
+    ASK_BID_PRICE = 7
+
+
+# flags of orderbook records
+FLAG_SNAPSHOT = 1  # the record belongs to a snapshot, otherwise to a delta
+FLAG_FIRST = 2  # first record of an orderbook message
+FLAG_LAST = 4  # last record of an orderbook message
+
+_MAGIC = 0x48494241  # "HIBA"
+_VERSION = 1
+
+# magic, version, capacity, record size, symbol capacity
+_HEADER = struct.Struct("<IIQII")
+_WRITE_SEQUENCE_OFFSET = 32
+_SYMBOL_COUNT_OFFSET = 40
+_HEADER_SIZE = 64
+_SYMBOL_SIZE = 32
+
+# sequence, receive time (ns), topic, symbol index, flags, six values
+_RECORD = struct.Struct("<QqHHI6d")
+_SEQUENCE = struct.Struct("<Q")
+_COUNT = struct.Struct("<I")
+
+
+class FeedRecord(NamedTuple):
+    """
+    One normalized market data record. The meaning of `values` depends on the topic:
+
+    | topic                   | values                                              |
+    |-------------------------|-----------------------------------------------------|
+    | mark_price              | markPrice                                           |
+    | spot_price              | spotPrice                                           |
+    | funding_rate_estimation | estimatedFundingRate, nextFundingTimestamp          |
+    | ask_bid_price           | askPrice, bidPrice                                  |
+    | trades                  | price, quantity, side (1 buy, -1 sell), timestamp   |
+    | klines                  | open, high, low, close, volumeNotional, timestamp   |
+    | orderbook               | price, quantity, side (1 bid, -1 ask), sequence     |
+
+    Orderbook messages are written as one record per level, marked with
+    `FLAG_FIRST` / `FLAG_LAST` and `FLAG_SNAPSHOT` for snapshots. Unused values
+    are NaN.
+    """
+
+    sequence: int
+    timestamp: int
+    topic: FeedTopic
+    symbol: str
+    flags: int
+    values: Tuple[float, float, float, float, float, float]
+
+
+_NAN = math.nan
+
+
+def _values(*values: float) -> Tuple[float, ...]:
+    return values + (_NAN,) * (6 - len(values))
+
+
+class SharedRingBuffer:
+    """
+    Fixed-size records in a `multiprocessing.shared_memory` block, written by a
+    single process and read by any number of others.
+
+    The writer never waits for readers. A reader that falls more than
+    `capacity` records behind loses the overwritten records and counts them
+    in `FeedReader.lost`. Symbols are stored once in a table in front of the
+    records and referenced by index.
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, owner: bool):
+        self.shm = shm
+        self.owner = owner
+        magic, version, capacity, record_size, symbol_capacity = _HEADER.unpack_from(
+            shm.buf, 0
+        )
+        if magic != _MAGIC or version != _VERSION or record_size != _RECORD.size:
+            raise ValueError(f"{shm.name} is not a market data feed buffer")
+        self.capacity = capacity
+        self.symbol_capacity = symbol_capacity
+        self._records_offset = _HEADER_SIZE + symbol_capacity * _SYMBOL_SIZE
+
+    @classmethod
+    def create(
+        cls,
+        name: Optional[str] = None,
+        capacity: int = 1 << 16,
+        symbol_capacity: int = 1024,
+    ) -> "SharedRingBuffer":
+        size = _HEADER_SIZE + symbol_capacity * _SYMBOL_SIZE + capacity * _RECORD.size
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        _HEADER.pack_into(
+            shm.buf, 0, _MAGIC, _VERSION, capacity, _RECORD.size, symbol_capacity
+        )
+        _SEQUENCE.pack_into(shm.buf, _WRITE_SEQUENCE_OFFSET, 0)
+        _COUNT.pack_into(shm.buf, _SYMBOL_COUNT_OFFSET, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "SharedRingBuffer":
+        # readers must not unlink the block when they exit
+        return cls(shared_memory.SharedMemory(name=name, track=False), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def write_sequence(self) -> int:
+        """Number of records written so far"""
+        return _SEQUENCE.unpack_from(self.shm.buf, _WRITE_SEQUENCE_OFFSET)[0]
+
+    @property
+    def symbol_count(self) -> int:
+        return _COUNT.unpack_from(self.shm.buf, _SYMBOL_COUNT_OFFSET)[0]
+
+    def add_symbol(self, symbol: str) -> int:
+        index = self.symbol_count
+        if index >= self.symbol_capacity:
+            raise ValueError(f"Feed symbol table is full ({self.symbol_capacity})")
+        encoded = symbol.encode()
+        if len(encoded) > _SYMBOL_SIZE:
+            raise ValueError(f"Symbol too long for the feed: {symbol}")
+        offset = _HEADER_SIZE + index * _SYMBOL_SIZE
+        self.shm.buf[offset : offset + _SYMBOL_SIZE] = encoded.ljust(
+            _SYMBOL_SIZE, b"\0"
+        )
+        # publish the entry after it is written
+        _COUNT.pack_into(self.shm.buf, _SYMBOL_COUNT_OFFSET, index + 1)
+        return index
+
+    def symbol(self, index: int) -> str:
+        offset = _HEADER_SIZE + index * _SYMBOL_SIZE
+        return (
+            bytes(self.shm.buf[offset : offset + _SYMBOL_SIZE]).rstrip(b"\0").decode()
+        )
+
+    def write(
+        self,
+        timestamp: int,
+        topic: int,
+        symbol_index: int,
+        flags: int,
+        values: Tuple[float, float, float, float, float, float],
+    ):
+        sequence = self.write_sequence
+        offset = self._records_offset + (sequence % self.capacity) * _RECORD.size
+        _RECORD.pack_into(
+            self.shm.buf,
+            offset,
+            sequence,
+            timestamp,
+            topic,
+            symbol_index,
+            flags,
+            *values,
+        )
+        # publish the record after it is written
+        _SEQUENCE.pack_into(self.shm.buf, _WRITE_SEQUENCE_OFFSET, sequence + 1)
+
+    def view(self, sequence: int, count: int) -> memoryview:
+        """Raw records from `sequence` on, never wrapping past the end of the buffer"""
+        slot = sequence % self.capacity
+        count = min(count, self.capacity - slot)
+        offset = self._records_offset + slot * _RECORD.size
+        return self.shm.buf[offset : offset + count * _RECORD.size]
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class FeedPublisher:
+    """
+    Feed handler that publishes the events of a market client into a
+    `SharedRingBuffer`, so other processes get decoded market data without
+    their own connections.
+
+    ```python
+    market = HibachiWSMarketClient()  # or a ShardedMarketClient
+    publisher = FeedPublisher(market, name="hibachi-feed", capacity=1 << 20)
+    await market.connect()
+    await market.subscribe(subscriptions)
+    ```
+
+    Args:
+        market_client: A `HibachiWSMarketClient` or `ShardedMarketClient`
+        name: Name of the shared memory block readers attach to
+        capacity: Number of records kept in the ring
+        symbol_capacity: Maximum number of distinct symbols
+    """
+
+    def __init__(
+        self,
+        market_client: Any,
+        name: Optional[str] = None,
+        capacity: int = 1 << 16,
+        symbol_capacity: int = 1024,
+    ):
+        self.ring = SharedRingBuffer.create(name, capacity, symbol_capacity)
+        self._symbols: Dict[str, int] = {}
+        for topic in WebSocketSubscriptionTopic:
+            market_client.on(topic.value, self.publish)
+
+    @property
+    def name(self) -> str:
+        return self.ring.name
+
+    def _symbol_index(self, symbol: str) -> int:
+        index = self._symbols.get(symbol)
+        if index is None:
+            index = self._symbols[symbol] = self.ring.add_symbol(symbol)
+        return index
+
+    async def publish(self, event: Any):
+        if isinstance(event, dict):
+            event = parse_market_event(event)
+        self.write(event)
+
+    def write(self, event: Any):
+        """Write the records of a market event"""
+        now = time.time_ns()
+        write = self.ring.write
+        symbol = self._symbol_index(event.symbol)
+
+        if isinstance(event, MarkPriceEvent):
+            write(now, FeedTopic.MARK_PRICE, symbol, 0, _values(event.markPrice))
+        elif isinstance(event, AskBidPriceEvent):
+            write(
+                now,
+                FeedTopic.ASK_BID_PRICE,
+                symbol,
+                0,
+                _values(event.askPrice, event.bidPrice),
+            )
+        elif isinstance(event, TradesEvent):
+            for trade in event.trades:
+                side = 1.0 if trade.takerSide is TakerSide.Buy else -1.0
+                write(
+                    now,
+                    FeedTopic.TRADES,
+                    symbol,
+                    0,
+                    _values(trade.price, trade.quantity, side, trade.timestamp),
+                )
+        elif isinstance(event, OrderBookEvent):
+            self._write_orderbook(now, symbol, event)
+        elif isinstance(event, SpotPriceEvent):
+            write(now, FeedTopic.SPOT_PRICE, symbol, 0, _values(event.spotPrice))
+        elif isinstance(event, FundingRateEstimationEvent):
+            write(
+                now,
+                FeedTopic.FUNDING_RATE_ESTIMATION,
+                symbol,
+                0,
+                _values(event.estimatedFundingRate, event.nextFundingTimestamp),
+            )
+        elif isinstance(event, KlinesEvent):
+            for kline in event.klines:
+                write(
+                    now,
+                    FeedTopic.KLINES,
+                    symbol,
+                    0,
+                    (
+                        kline.open,
+                        kline.high,
+                        kline.low,
+                        kline.close,
+                        kline.volumeNotional,
+                        kline.timestamp,
+                    ),
+                )
+
+    def _write_orderbook(self, now: int, symbol: int, event: OrderBookEvent):
+        sequence = _NAN if event.sequence is None else event.sequence
+        levels = [(price, quantity, 1.0) for price, quantity in event.bid]
+        levels += [(price, quantity, -1.0) for price, quantity in event.ask]
+        if not levels:
+            # an empty snapshot still clears the book of readers
+            levels = [(_NAN, _NAN, _NAN)]
+
+        flags = FLAG_SNAPSHOT if event.isSnapshot else 0
+        last = len(levels) - 1
+        for i, (price, quantity, side) in enumerate(levels):
+            level_flags = flags
+            if i == 0:
+                level_flags |= FLAG_FIRST
+            if i == last:
+                level_flags |= FLAG_LAST
+            self.ring.write(
+                now,
+                FeedTopic.ORDERBOOK,
+                symbol,
+                level_flags,
+                _values(price, quantity, side, sequence),
+            )
+
+    def close(self):
+        """Close and unlink the shared memory block"""
+        self.ring.close()
+
+
+class FeedReader:
+    """
+    Reads the records of a `FeedPublisher` from another process.
+
+    A new reader starts at the oldest record still in the ring, or at the
+    latest one with `from_latest=True`.
+
+    ```python
+    reader = FeedReader("hibachi-feed", from_latest=True)
+    async for record in reader.stream():
+        if record.topic == FeedTopic.MARK_PRICE:
+            print(record.symbol, record.values[0])
+    ```
+    """
+
+    def __init__(self, name: str, from_latest: bool = False):
+        self.ring = SharedRingBuffer.attach(name)
+        self.lost = 0
+        self._symbols: List[str] = []
+        written = self.ring.write_sequence
+        self.sequence = written if from_latest else self._oldest(written)
+
+    def _oldest(self, written: int) -> int:
+        # the slot of `written - capacity` may be being overwritten right now
+        return max(0, written - self.ring.capacity + 1)
+
+    def _symbol(self, index: int) -> str:
+        while index >= len(self._symbols):
+            self._symbols.append(self.ring.symbol(len(self._symbols)))
+        return self._symbols[index]
+
+    def read_view(self, max_records: int = 4096) -> Tuple[int, memoryview]:
+        """
+        Zero-copy access to the next contiguous records, returns their first
+        sequence number and a view over the packed records (see `RECORD_FORMAT`).
+
+        The view stays valid until the writer wraps around, check with
+        `is_valid(sequence)` after processing it.
+        """
+        written = self.ring.write_sequence
+        oldest = self._oldest(written)
+        if self.sequence < oldest:
+            self.lost += oldest - self.sequence
+            self.sequence = oldest
+        count = min(written - self.sequence, max_records)
+        sequence = self.sequence
+        if count <= 0:
+            return sequence, memoryview(b"")
+        view = self.ring.view(sequence, count)
+        self.sequence += len(view) // _RECORD.size
+        return sequence, view
+
+    def is_valid(self, sequence: int) -> bool:
+        """False if the record `sequence` may have been overwritten"""
+        return self.ring.write_sequence - sequence < self.ring.capacity
+
+    def read(self, max_records: int = 4096) -> List[FeedRecord]:
+        sequence, view = self.read_view(max_records)
+        if not view:
+            return []
+        raw = list(_RECORD.iter_unpack(view))
+        view.release()
+        if not self.is_valid(sequence):
+            # the writer lapped us while copying, drop what may be torn
+            valid_from = self._oldest(self.ring.write_sequence)
+            torn = min(valid_from - sequence, len(raw))
+            self.lost += torn
+            raw = raw[torn:]
+
+        symbol = self._symbol
+        return [
+            FeedRecord(
+                record[0],
+                record[1],
+                FeedTopic(record[2]),
+                symbol(record[3]),
+                record[4],
+                record[5:],
+            )
+            for record in raw
+        ]
+
+    async def stream(
+        self, poll_interval: float = 0.001, max_records: int = 4096
+    ) -> AsyncIterator[FeedRecord]:
+        """Yield records as they are published, polling the ring when it is empty"""
+        while True:
+            records = self.read(max_records)
+            if not records:
+                await asyncio.sleep(poll_interval)
+                continue
+            for record in records:
+                yield record
+
+    def close(self):
+        self.ring.close()
+
+
+RECORD_FORMAT = _RECORD.format
+RECORD_SIZE = _RECORD.size
@@ -1,4 +1,5 @@
 import asyncio
+import random
 from typing import Dict, List, Optional, TypeVar, Union, Any, Callable
 
 from websockets import ClientConnection, HeadersLike
@@ -25,9 +26,14 @@ def create_with(func: Callable[..., T], data: Dict[str, Any]) -> T:
 
 
 async def connect_with_retry(
-    web_url: str, headers: Optional[HeadersLike] = None
+    web_url: str, headers: Optional[HeadersLike] = None, jitter: float = 0.0
 ) -> ClientConnection:
-    """Establish WebSocket connection with retry logic"""
+    """
+    Establish WebSocket connection with retry logic
+
+    `jitter` randomizes each retry delay by up to that fraction, so clients
+    dropped at the same time do not reconnect in lockstep.
+    """
     max_retries = 10
     retry_count = 0
     retry_delay = 1
@@ -43,10 +49,13 @@ async def connect_with_retry(
                     f"Failed to connect after {max_retries} attempts: {str(e)}"
                 )
 
+            delay = retry_delay
+            if jitter:
+                delay = round(delay * random.uniform(1 - jitter, 1 + jitter), 2)
             print(
-                f"Connection attempt {retry_count} failed: {str(e)}. Retrying in {retry_delay} seconds..."
+                f"Connection attempt {retry_count} failed: {str(e)}. Retrying in {delay} seconds..."
             )
-            await asyncio.sleep(retry_delay)
+            await asyncio.sleep(delay)
             retry_delay *= 2  # Exponential backoff
 
     # This shouldn't be reached due to the exception in the loop
@@ -0,0 +1,263 @@
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional dependency
+    np = None
+
+from hibachi_xyz.api import HibachiApiClient
+from hibachi_xyz.types import Interval
+
+INTERVAL_MS: Dict[Interval, int] = {
+    Interval.ONE_MINUTE: 60_000,
+    Interval.FIVE_MINUTES: 5 * 60_000,
+    Interval.FIFTEEN_MINUTES: 15 * 60_000,
+    Interval.ONE_HOUR: 60 * 60_000,
+    Interval.FOUR_HOURS: 4 * 60 * 60_000,
+    Interval.ONE_DAY: 24 * 60 * 60_000,
+    Interval.ONE_WEEK: 7 * 24 * 60 * 60_000,
+}
+
+# timestamps below this are in seconds, above it in milliseconds
+_SECONDS_LIMIT = 10**11
+
+
+@dataclass
+class KlineHistory:
+    """Klines as columns, ordered by timestamp (milliseconds)"""
+
+    timestamp: "np.ndarray"  # int64
+    open: "np.ndarray"  # float64
+    high: "np.ndarray"
+    low: "np.ndarray"
+    close: "np.ndarray"
+    volume: "np.ndarray"  # volumeNotional
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+    @classmethod
+    def empty(cls) -> "KlineHistory":
+        return cls(
+            np.empty(0, dtype=np.int64),
+            *(np.empty(0, dtype=np.float64) for _ in range(5)),
+        )
+
+    @classmethod
+    def concat(cls, parts: List["KlineHistory"]) -> "KlineHistory":
+        if not parts:
+            return cls.empty()
+        return cls(
+            *(
+                np.concatenate([getattr(part, column) for part in parts])
+                for column in _KLINE_COLUMNS
+            )
+        )
+
+    def slice(self, start: int, stop: int) -> "KlineHistory":
+        return KlineHistory(
+            *(getattr(self, column)[start:stop] for column in _KLINE_COLUMNS)
+        )
+
+
+_KLINE_COLUMNS = ("timestamp", "open", "high", "low", "close", "volume")
+
+
+@dataclass
+class TradeHistory:
+    """Trades as columns, ordered by timestamp (milliseconds)"""
+
+    timestamp: "np.ndarray"  # int64
+    price: "np.ndarray"  # float64
+    quantity: "np.ndarray"  # float64
+    side: "np.ndarray"  # int8, 1 when the taker bought and -1 when it sold
+
+    def __len__(self) -> int:
+        return len(self.timestamp)
+
+
+def _to_ms(timestamps: "np.ndarray") -> "np.ndarray":
+    return np.where(timestamps < _SECONDS_LIMIT, timestamps * 1000, timestamps)
+
+
+def _parse_kline_columns(klines: List[Dict[str, Any]]) -> KlineHistory:
+    count = len(klines)
+    timestamp = _to_ms(
+        np.fromiter((k["timestamp"] for k in klines), dtype=np.int64, count=count)
+    )
+    # numpy parses the decimal strings of the API directly
+    values = np.array(
+        [
+            (k["open"], k["high"], k["low"], k["close"], k["volumeNotional"])
+            for k in klines
+        ],
+        dtype=np.float64,
+    ).reshape(count, 5)
+    return KlineHistory(timestamp, *values.T.copy())
+
+
+class HistoryLoader:
+    """
+    Loads kline history over any time range as NumPy columns.
+
+    The range is split into pages of `page_size` bars that are fetched
+    concurrently over the pooled session of the client. A page the API
+    returns incompletely is continued from its last bar.
+
+    ```python
+    loader = HistoryLoader(HibachiApiClient(), max_workers=8)
+    klines = loader.load_klines("BTC/USDT-P", Interval.ONE_MINUTE, start_ms, end_ms)
+    returns = np.diff(np.log(klines.close))
+
+    for chunk in loader.iter_klines(symbol, Interval.ONE_MINUTE, start_ms, end_ms, 50_000):
+        store(chunk)
+    ```
+
+    Args:
+        api_client: A `HibachiApiClient`, only its public market data endpoints are used
+        max_workers: Number of pages fetched at the same time
+        page_size: Number of bars requested per page
+    """
+
+    def __init__(
+        self,
+        api_client: Optional[HibachiApiClient] = None,
+        max_workers: int = 4,
+        page_size: int = 500,
+    ):
+        if np is None:
+            raise ImportError(
+                "HistoryLoader requires numpy, install it with `pip install hibachi_xyz[history]`"
+            )
+        self.api_client = api_client or HibachiApiClient()
+        self.max_workers = max_workers
+        self.page_size = page_size
+
+    def load_klines(
+        self, symbol: str, interval: Interval, start_ms: int, end_ms: int
+    ) -> KlineHistory:
+        """Klines with start_ms <= timestamp < end_ms"""
+        return KlineHistory.concat(
+            list(self._iter_pages(symbol, interval, start_ms, end_ms))
+        )
+
+    def iter_klines(
+        self,
+        symbol: str,
+        interval: Interval,
+        start_ms: int,
+        end_ms: int,
+        chunk_size: int = 10_000,
+    ) -> Iterator[KlineHistory]:
+        """
+        Same as `load_klines` in chunks of `chunk_size` bars (the last one may be
+        shorter), fetching ahead only as many pages as there are workers
+        """
+        pending: List[KlineHistory] = []
+        buffered = 0
+        for page in self._iter_pages(symbol, interval, start_ms, end_ms):
+            pending.append(page)
+            buffered += len(page)
+            if buffered < chunk_size:
+                continue
+            merged = KlineHistory.concat(pending)
+            full = len(merged) - len(merged) % chunk_size
+            for offset in range(0, full, chunk_size):
+                yield merged.slice(offset, offset + chunk_size)
+            rest = merged.slice(full, len(merged))
+            pending = [rest]
+            buffered = len(rest)
+        if buffered:
+            yield KlineHistory.concat(pending)
+
+    def load_trades(self, symbol: str) -> TradeHistory:
+        """
+        Recent trades as columns. The trades endpoint only serves the latest
+        trades, so there is no range to page through.
+        """
+        trades = self.api_client._get_trades_data(symbol)["trades"]
+        count = len(trades)
+        timestamp = _to_ms(
+            np.fromiter((t["timestamp"] for t in trades), dtype=np.int64, count=count)
+        )
+        values = np.array(
+            [(t["price"], t["quantity"]) for t in trades], dtype=np.float64
+        ).reshape(count, 2)
+        side = np.fromiter(
+            (1 if t["takerSide"] == "Buy" else -1 for t in trades),
+            dtype=np.int8,
+            count=count,
+        )
+        order = np.argsort(timestamp, kind="stable")
+        return TradeHistory(
+            timestamp[order], values[order, 0], values[order, 1], side[order]
+        )
+
+    def _iter_pages(
+        self, symbol: str, interval: Interval, start_ms: int, end_ms: int
+    ) -> Iterator[KlineHistory]:
+        """Pages in order, each already trimmed to its own window"""
+        windows = _page_windows(interval, start_ms, end_ms, self.page_size)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight: Deque[Future] = deque()
+            windows_left = iter(windows)
+            for window in windows_left:
+                in_flight.append(
+                    executor.submit(self._fetch_window, symbol, interval, *window)
+                )
+                if len(in_flight) >= self.max_workers:
+                    break
+            while in_flight:
+                page = in_flight.popleft().result()
+                window = next(windows_left, None)
+                if window is not None:
+                    in_flight.append(
+                        executor.submit(self._fetch_window, symbol, interval, *window)
+                    )
+                if len(page):
+                    yield page
+
+    def _fetch_window(
+        self, symbol: str, interval: Interval, start_ms: int, end_ms: int
+    ) -> KlineHistory:
+        step = INTERVAL_MS[interval]
+        parts: List[KlineHistory] = []
+        cursor = start_ms
+        while cursor < end_ms:
+            data = self.api_client._get_klines_data(symbol, interval, cursor, end_ms)
+            klines = data["klines"]
+            if not klines:
+                break
+            part = _parse_kline_columns(klines)
+            parts.append(part)
+            last = int(part.timestamp.max())
+            if last < cursor:
+                break
+            # the API may cap the page, continue after the last bar it returned
+            cursor = last + step
+
+        return _clean(KlineHistory.concat(parts), start_ms, end_ms)
+
+
+def _page_windows(
+    interval: Interval, start_ms: int, end_ms: int, page_size: int
+) -> List[Tuple[int, int]]:
+    step = INTERVAL_MS[interval]
+    # aligned to bar boundaries so pages never share a bar
+    first = start_ms - start_ms % step
+    span = step * page_size
+    return [
+        (max(start_ms, page_start), min(end_ms, page_start + span))
+        for page_start in range(first, end_ms, span)
+    ]
+
+
+def _clean(history: KlineHistory, start_ms: int, end_ms: int) -> KlineHistory:
+    """Sort by time, drop duplicate bars and bars outside [start_ms, end_ms)"""
+    timestamp, index = np.unique(history.timestamp, return_index=True)
+    keep = (timestamp >= start_ms) & (timestamp < end_ms)
+    index = index[keep]
+    return KlineHistory(*(getattr(history, column)[index] for column in _KLINE_COLUMNS))
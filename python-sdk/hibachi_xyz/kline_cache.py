@@ -0,0 +1,268 @@
+import os
+import shutil
+import time
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional dependency
+    np = None
+
+from hibachi_xyz.api import HibachiApiClient
+from hibachi_xyz.codec import json_dumps_bytes, json_loads
+from hibachi_xyz.history import INTERVAL_MS, HistoryLoader, KlineHistory
+from hibachi_xyz.types import Interval
+
+# one file per column, the timestamp file is written last and defines the row count
+_COLUMNS = (
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+    ("timestamp", "<i8"),
+)
+_ROW_SIZE = 8
+
+
+class KlineCache:
+    """
+    On-disk kline cache keyed by (symbol, interval), filling only the ranges
+    that were never fetched.
+
+    Every series is a directory with one append-only file per column, read
+    back with `numpy.memmap`, so `get` returns views of the files without
+    loading them. Bars fetched before the stored ones are merged into a new
+    generation of the columns, which a single marker file switches to, so an
+    interrupted write never mixes generations. The ranges fetched so far are
+    kept next to the columns, which also remembers ranges without any bars.
+
+    The bar that is still in progress is never stored, it is fetched on
+    every `get` that reaches it.
+
+    ```python
+    cache = KlineCache("~/.hibachi/klines")
+    klines = cache.get("BTC/USDT-P", Interval.ONE_MINUTE, start_ms, end_ms)
+    ```
+
+    Only one process should write to a cache directory at a time.
+
+    Args:
+        directory: Root directory of the cache
+        loader: Loader used to fetch missing ranges, a new `HistoryLoader` by default
+        api_client: Client of the default loader
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        loader: Optional[HistoryLoader] = None,
+        api_client: Optional[HibachiApiClient] = None,
+    ):
+        self.directory = os.path.expanduser(directory)
+        self.loader = loader or HistoryLoader(api_client)
+        self._series: Dict[Tuple[str, Interval], _Series] = {}
+
+    def get(
+        self,
+        symbol: str,
+        interval: Interval,
+        start_ms: int,
+        end_ms: Optional[int] = None,
+    ) -> KlineHistory:
+        """Klines with start_ms <= timestamp < end_ms (now by default)"""
+        now = int(time.time() * 1000)
+        if end_ms is None:
+            end_ms = now
+        step = INTERVAL_MS[interval]
+        # bars opened before this are complete
+        closed_end = min(end_ms, now - now % step)
+
+        series = self._series_for(symbol, interval)
+        for gap_start, gap_end in series.missing(start_ms, closed_end):
+            series.store(
+                self.loader.load_klines(symbol, interval, gap_start, gap_end),
+                gap_start,
+                gap_end,
+            )
+
+        history = series.range(start_ms, closed_end)
+        if end_ms > closed_end:
+            live = self.loader.load_klines(
+                symbol, interval, max(start_ms, closed_end), end_ms
+            )
+            history = KlineHistory.concat([history, live])
+        return history
+
+    def cached_ranges(self, symbol: str, interval: Interval) -> List[Tuple[int, int]]:
+        """Ranges [start_ms, end_ms) that are served from disk"""
+        return list(self._series_for(symbol, interval).covered)
+
+    def clear(self, symbol: str, interval: Interval):
+        self._series_for(symbol, interval).clear()
+
+    def _series_for(self, symbol: str, interval: Interval) -> "_Series":
+        key = (symbol, interval)
+        series = self._series.get(key)
+        if series is None:
+            path = os.path.join(
+                self.directory, symbol.replace("/", "_"), interval.value
+            )
+            series = self._series[key] = _Series(path)
+        return series
+
+
+class _Series:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._ranges_path = os.path.join(path, "ranges.json")
+        self.covered: List[Tuple[int, int]] = []
+        if os.path.exists(self._ranges_path):
+            with open(self._ranges_path, "rb") as f:
+                self.covered = [tuple(r) for r in json_loads(f.read())]
+        # the columns in use are in the directory of this generation
+        self._generation_path = os.path.join(path, "generation")
+        self.generation = 0
+        if os.path.exists(self._generation_path):
+            with open(self._generation_path, "rb") as f:
+                self.generation = int(f.read())
+        self._history: Optional[KlineHistory] = None
+        self._remove_stale_generations()
+        self._repair()
+
+    def _columns_dir(self, generation: Optional[int] = None) -> str:
+        if generation is None:
+            generation = self.generation
+        return os.path.join(self.path, f"columns-{generation}")
+
+    def _column_path(self, column: str, generation: Optional[int] = None) -> str:
+        return os.path.join(self._columns_dir(generation), f"{column}.bin")
+
+    def _remove_stale_generations(self):
+        # left behind by a rewrite that was interrupted before or after the switch
+        current = os.path.basename(self._columns_dir())
+        for name in os.listdir(self.path):
+            if name.startswith("columns-") and name != current:
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def _rows(self) -> int:
+        return min(
+            os.path.getsize(path) // _ROW_SIZE if os.path.exists(path) else 0
+            for path in map(self._column_path, (name for name, _ in _COLUMNS))
+        )
+
+    def _repair(self):
+        # drop the tail of an append that was interrupted
+        rows = self._rows()
+        for column, _ in _COLUMNS:
+            path = self._column_path(column)
+            if os.path.exists(path) and os.path.getsize(path) > rows * _ROW_SIZE:
+                os.truncate(path, rows * _ROW_SIZE)
+
+    def history(self) -> KlineHistory:
+        if self._history is None:
+            rows = self._rows()
+            if rows == 0:
+                self._history = KlineHistory.empty()
+            else:
+                self._history = KlineHistory(
+                    **{
+                        column: np.memmap(
+                            self._column_path(column),
+                            dtype=dtype,
+                            mode="r",
+                            shape=(rows,),
+                        )
+                        for column, dtype in _COLUMNS
+                    }
+                )
+        return self._history
+
+    def range(self, start_ms: int, end_ms: int) -> KlineHistory:
+        history = self.history()
+        start = int(np.searchsorted(history.timestamp, start_ms, side="left"))
+        stop = int(np.searchsorted(history.timestamp, end_ms, side="left"))
+        return history.slice(start, max(start, stop))
+
+    def missing(self, start_ms: int, end_ms: int) -> List[Tuple[int, int]]:
+        gaps = []
+        cursor = start_ms
+        for covered_start, covered_end in self.covered:
+            if covered_end <= cursor:
+                continue
+            if covered_start >= end_ms:
+                break
+            if covered_start > cursor:
+                gaps.append((cursor, covered_start))
+            cursor = max(cursor, covered_end)
+        if cursor < end_ms:
+            gaps.append((cursor, end_ms))
+        return gaps
+
+    def store(self, fetched: KlineHistory, start_ms: int, end_ms: int):
+        if len(fetched):
+            current = self.history()
+            if len(current) == 0 or fetched.timestamp[0] > current.timestamp[-1]:
+                self._append(fetched)
+            else:
+                self._rewrite(_merge(current, fetched))
+            self._history = None
+
+        self.covered = _add_range(self.covered, start_ms, end_ms)
+        _replace_file(self._ranges_path, json_dumps_bytes(self.covered))
+
+    def _append(self, fetched: KlineHistory):
+        os.makedirs(self._columns_dir(), exist_ok=True)
+        for column, dtype in _COLUMNS:
+            with open(self._column_path(column), "ab") as f:
+                f.write(np.ascontiguousarray(getattr(fetched, column), dtype=dtype))
+
+    def _rewrite(self, merged: KlineHistory):
+        # bars inside the stored range, written as the next generation of the columns
+        generation = self.generation + 1
+        os.makedirs(self._columns_dir(generation), exist_ok=True)
+        for column, dtype in _COLUMNS:
+            with open(self._column_path(column, generation), "wb") as f:
+                f.write(np.ascontiguousarray(getattr(merged, column), dtype=dtype))
+        _replace_file(self._generation_path, str(generation).encode())
+        previous = self._columns_dir()
+        self.generation = generation
+        shutil.rmtree(previous, ignore_errors=True)
+
+    def clear(self):
+        shutil.rmtree(self._columns_dir(), ignore_errors=True)
+        for path in (self._generation_path, self._ranges_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.generation = 0
+        self.covered = []
+        self._history = None
+
+
+def _replace_file(path: str, data: bytes):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _merge(current: KlineHistory, fetched: KlineHistory) -> KlineHistory:
+    """Union of both by timestamp, fetched bars win"""
+    both = KlineHistory.concat([fetched, current])
+    _, index = np.unique(both.timestamp, return_index=True)
+    return KlineHistory(
+        **{column: getattr(both, column)[index] for column, _ in _COLUMNS}
+    )
+
+
+def _add_range(
+    ranges: List[Tuple[int, int]], start_ms: int, end_ms: int
+) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for range_start, range_end in sorted(ranges + [(start_ms, end_ms)]):
+        if merged and range_start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], range_end))
+        else:
+            merged.append((range_start, range_end))
+    return merged
@@ -0,0 +1,122 @@
+import os
+import time
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+from hibachi_xyz.codec import json_dumps_bytes, json_loads
+from hibachi_xyz.helpers import create_with
+from hibachi_xyz.types import FutureContract
+
+
+class ContractMetadata:
+    """
+    Cache of the future contracts of the exchange, indexed by symbol, by contract
+    id and by settlement symbol.
+
+    `HibachiApiClient` refreshes the cache whenever exchange info or inventory
+    is loaded, and before using it once it is older than `ttl` seconds (never
+    when `ttl` is None). Contracts that did not change keep their identity
+    across refreshes, so the order payload encoders built for them stay valid.
+
+    With a `snapshot_path` every refresh is also written to disk, and a new
+    client can `load()` it instead of fetching exchange info on a cold start.
+    Snapshots older than `snapshot_max_age` seconds are not loaded, also when
+    `ttl` is None.
+
+    Args:
+        ttl: Seconds after which the cache is refreshed from the API
+        snapshot_path: JSON file the cache is saved to and loaded from
+        snapshot_max_age: Seconds after which a snapshot is too old to be loaded
+    """
+
+    ttl: Optional[float]
+    snapshot_path: Optional[str]
+    snapshot_max_age: float
+    updated_at: Optional[float]
+
+    def __init__(
+        self,
+        ttl: Optional[float] = None,
+        snapshot_path: Optional[str] = None,
+        snapshot_max_age: float = 3600,
+    ):
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self.snapshot_max_age = snapshot_max_age
+        self.updated_at = None
+        self.by_symbol: Dict[str, FutureContract] = {}
+        self.by_id: Dict[int, FutureContract] = {}
+        self.by_settlement_symbol: Dict[str, FutureContract] = {}
+
+    @property
+    def contracts(self) -> List[FutureContract]:
+        return list(self.by_symbol.values())
+
+    def is_loaded(self) -> bool:
+        return self.updated_at is not None
+
+    def is_stale(self) -> bool:
+        """True when the cache was never loaded or is older than the TTL"""
+        if self.updated_at is None:
+            return True
+        return self.ttl is not None and time.time() - self.updated_at > self.ttl
+
+    def update(
+        self, contracts: List[FutureContract], updated_at: Optional[float] = None
+    ):
+        previous = self.by_symbol
+        by_symbol: Dict[str, FutureContract] = {}
+        for contract in contracts:
+            # keep unchanged contracts so everything derived from them stays cached
+            known = previous.get(contract.symbol)
+            by_symbol[contract.symbol] = contract if known != contract else known
+
+        by_settlement_symbol: Dict[str, FutureContract] = {}
+        for contract in by_symbol.values():
+            by_settlement_symbol.setdefault(contract.settlementSymbol, contract)
+
+        self.by_symbol = by_symbol
+        self.by_id = {contract.id: contract for contract in by_symbol.values()}
+        self.by_settlement_symbol = by_settlement_symbol
+        self.updated_at = time.time() if updated_at is None else updated_at
+
+    def save(self, path: Optional[str] = None):
+        """Write the cache to a JSON snapshot, atomically replacing the previous one"""
+        path = path or self.snapshot_path
+        if path is None:
+            raise ValueError("No snapshot path set")
+
+        snapshot = {
+            "updatedAt": self.updated_at,
+            "futureContracts": [asdict(contract) for contract in self.contracts],
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(json_dumps_bytes(snapshot))
+        os.replace(tmp_path, path)
+
+    def load(self, path: Optional[str] = None) -> bool:
+        """
+        Load a snapshot written by `save`, returns False if there is none, if
+        it cannot be read or if it is older than `snapshot_max_age`
+        """
+        path = path or self.snapshot_path
+        if path is None or not os.path.exists(path):
+            return False
+
+        try:
+            with open(path, "rb") as f:
+                snapshot = json_loads(f.read())
+            updated_at = snapshot["updatedAt"]
+            if time.time() - updated_at > self.snapshot_max_age:
+                return False
+            contracts = [
+                create_with(FutureContract, contract)
+                for contract in snapshot["futureContracts"]
+            ]
+        except (ValueError, KeyError, TypeError) as e:
+            # a corrupt snapshot is fetched again, like a missing one
+            print(f"[ContractMetadata] Ignoring the snapshot {path}: {e}")
+            return False
+        self.update(contracts, updated_at=updated_at)
+        return True
@@ -0,0 +1,92 @@
+from decimal import Decimal, InvalidOperation
+from typing import Any, Optional, Union
+
+from hibachi_xyz.codec import JsonData, json_loads
+from hibachi_xyz.encoding import Number
+
+# response fields holding decimal strings, parsed to `Decimal` in decimal mode.
+# Contract rules (tickSize, stepSize, ...) stay strings, they are parsed once
+# by `ContractRules` and `OrderPayloadEncoder` and saved in metadata snapshots.
+NUMERIC_FIELDS = frozenset(
+    {
+        # orders and trades
+        "price",
+        "quantity",
+        "availableQuantity",
+        "totalQuantity",
+        "triggerPrice",
+        "updatedPrice",
+        "updatedQuantity",
+        "fee",
+        "realizedPnl",
+        # account and positions
+        "balance",
+        "maximalWithdraw",
+        "entryNotional",
+        "markPrice",
+        "notionalValue",
+        "openPrice",
+        "unrealizedFundingPnl",
+        "unrealizedTradingPnl",
+        "totalOrderNotional",
+        "totalPositionNotional",
+        "totalUnrealizedFundingPnl",
+        "totalUnrealizedPnl",
+        "totalUnrealizedTradingPnl",
+        "tradeMakerFeeRate",
+        "tradeTakerFeeRate",
+        "settledAmount",
+        # market data
+        "askPrice",
+        "bidPrice",
+        "spotPrice",
+        "tradePrice",
+        "indexPrice",
+        "estimatedFundingRate",
+        "open",
+        "high",
+        "low",
+        "close",
+        "volumeNotional",
+    }
+)
+
+
+def parse_decimals(data: Any) -> Any:
+    """Replace the decimal strings of `NUMERIC_FIELDS` in decoded JSON with `Decimal`, in place"""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            if isinstance(value, str):
+                if key in NUMERIC_FIELDS:
+                    try:
+                        data[key] = Decimal(value)
+                    except InvalidOperation:
+                        pass
+            elif isinstance(value, (dict, list)):
+                parse_decimals(value)
+    elif isinstance(data, list):
+        for item in data:
+            if isinstance(item, (dict, list)):
+                parse_decimals(item)
+    return data
+
+
+def decimal_json_loads(data: JsonData) -> Any:
+    return parse_decimals(json_loads(data))
+
+
+def as_number(value: Union[str, Number, None]) -> Optional[Number]:
+    """
+    A response value as an order argument: `Decimal` values are kept so they
+    are encoded exactly, strings become floats as before
+    """
+    if value is None or isinstance(value, (Decimal, float, int)):
+        return value
+    return float(value)
+
+
+def format_number(value: Number) -> str:
+    """A number as sent in requests, `Decimal` values in plain notation (0.0000003, not 3E-7)"""
+    if isinstance(value, Decimal):
+        return format(value, "f")
+    return str(value)
@@ -0,0 +1,289 @@
+import asyncio
+from array import array
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from hibachi_xyz.api import HibachiApiClient
+from hibachi_xyz.api_ws_market import HibachiWSMarketClient
+from hibachi_xyz.events import DisconnectedEvent, OrderBookEvent, PriceLevel
+from hibachi_xyz.types import (
+    OrderBook,
+    WebSocketSubscription,
+    WebSocketSubscriptionTopic,
+)
+
+
+class BookSide:
+    """
+    One side of an order book, kept as two sorted arrays of prices and quantities.
+
+    Prices are stored as sort keys ordered so the best level is always the last
+    element: bids by price, asks by negated price. Reading the best level is O(1),
+    finding a level is O(log n) and updates close to the top of the book only
+    move a few elements.
+    """
+
+    __slots__ = ("is_bid", "_keys", "_quantities")
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self._keys = array("d")
+        self._quantities = array("d")
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _key(self, price: float) -> float:
+        return price if self.is_bid else -price
+
+    def clear(self):
+        self._keys = array("d")
+        self._quantities = array("d")
+
+    def set(self, price: float, quantity: float):
+        """Set the quantity of a price level, a zero quantity removes it"""
+        key = self._key(price)
+        keys = self._keys
+        index = bisect_left(keys, key)
+        found = index < len(keys) and keys[index] == key
+        if quantity > 0:
+            if found:
+                self._quantities[index] = quantity
+            else:
+                keys.insert(index, key)
+                self._quantities.insert(index, quantity)
+        elif found:
+            keys.pop(index)
+            self._quantities.pop(index)
+
+    def best(self) -> Optional[PriceLevel]:
+        if not self._keys:
+            return None
+        return (self._key(self._keys[-1]), self._quantities[-1])
+
+    def quantity_at(self, price: float) -> float:
+        """Quantity resting at a price, 0 if there is no such level"""
+        key = self._key(price)
+        index = bisect_left(self._keys, key)
+        if index < len(self._keys) and self._keys[index] == key:
+            return self._quantities[index]
+        return 0.0
+
+    def levels(self, depth: Optional[int] = None) -> List[PriceLevel]:
+        """Price levels from best to worst"""
+        count = len(self._keys) if depth is None else min(depth, len(self._keys))
+        return [
+            (self._key(self._keys[-1 - i]), self._quantities[-1 - i])
+            for i in range(count)
+        ]
+
+
+class LocalOrderBook:
+    """
+    In-memory L2 order book of a single symbol built from snapshots and deltas.
+
+    Deltas carry absolute level quantities, a zero quantity removes the level.
+    When messages carry a `sequence` number, any gap marks the book as out of
+    sync until the next snapshot.
+    """
+
+    symbol: str
+    sequence: Optional[int]
+    is_synced: bool
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.sequence = None
+        self.is_synced = False
+
+    def apply_snapshot(
+        self,
+        bids: Iterable[PriceLevel],
+        asks: Iterable[PriceLevel],
+        sequence: Optional[int] = None,
+    ):
+        self.bids.clear()
+        self.asks.clear()
+        for price, quantity in bids:
+            self.bids.set(price, quantity)
+        for price, quantity in asks:
+            self.asks.set(price, quantity)
+        self.sequence = sequence
+        self.is_synced = True
+
+    def apply_update(
+        self,
+        bids: Iterable[PriceLevel],
+        asks: Iterable[PriceLevel],
+        sequence: Optional[int] = None,
+    ) -> bool:
+        """Apply a delta, returns False and marks the book out of sync on a sequence gap"""
+        if (
+            sequence is not None
+            and self.sequence is not None
+            and sequence != self.sequence + 1
+        ):
+            if sequence <= self.sequence:
+                # already contained in the current state
+                return True
+            self.is_synced = False
+            return False
+
+        for price, quantity in bids:
+            self.bids.set(price, quantity)
+        for price, quantity in asks:
+            self.asks.set(price, quantity)
+        if sequence is not None:
+            self.sequence = sequence
+        return True
+
+    def best_bid(self) -> Optional[PriceLevel]:
+        return self.bids.best()
+
+    def best_ask(self) -> Optional[PriceLevel]:
+        return self.asks.best()
+
+    def mid_price(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
+
+    def spread(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+
+def _orderbook_levels(
+    orderbook: OrderBook,
+) -> Tuple[List[PriceLevel], List[PriceLevel]]:
+    return (
+        [(float(level.price), float(level.quantity)) for level in orderbook.bid],
+        [(float(level.price), float(level.quantity)) for level in orderbook.ask],
+    )
+
+
+class OrderBookEngine:
+    """
+    Maintains a `LocalOrderBook` per symbol from the `orderbook` topic of a
+    `HibachiWSMarketClient`.
+
+    When a book detects a sequence gap, or the market client lost its
+    connection, it is resynced from `get_orderbook` on the REST client. Deltas
+    received while the snapshot is in flight are replayed on top of it, which
+    is safe because deltas carry absolute quantities.
+
+    ```python
+    market = await HibachiWSMarketClient().connect()
+    engine = OrderBookEngine(market, HibachiApiClient(), depth=50, granularity=0.01)
+    await engine.track("BTC/USDT-P")
+
+    book = engine.book("BTC/USDT-P")
+    print(book.best_bid(), book.best_ask())
+    ```
+
+    Args:
+        market_client: A connected market websocket client
+        api_client: REST client used to fetch resync snapshots
+        depth: Depth of the resync snapshots
+        granularity: Granularity of the resync snapshots
+    """
+
+    def __init__(
+        self,
+        market_client: HibachiWSMarketClient,
+        api_client: HibachiApiClient,
+        depth: int = 100,
+        granularity: float = 0.01,
+    ):
+        self.market_client = market_client
+        self.api_client = api_client
+        self.depth = depth
+        self.granularity = granularity
+        self._books: Dict[str, LocalOrderBook] = {}
+        self._resyncing: Dict[str, List[OrderBookEvent]] = {}
+        self._listeners: List[Callable[[LocalOrderBook], None]] = []
+        self.market_client.on(WebSocketSubscriptionTopic.ORDERBOOK.value, self.handle)
+        self.market_client.on("disconnected", self._handle_disconnected)
+
+    def on_update(self, handler: Callable[[LocalOrderBook], None]):
+        """Register an async callback invoked with the book after every applied message"""
+        self._listeners.append(handler)
+
+    def book(self, symbol: str) -> Optional[LocalOrderBook]:
+        return self._books.get(symbol)
+
+    async def track(self, symbol: str):
+        """Subscribe to the orderbook topic of a symbol and maintain its book"""
+        self._books.setdefault(symbol, LocalOrderBook(symbol))
+        await self.market_client.subscribe(
+            [WebSocketSubscription(symbol, WebSocketSubscriptionTopic.ORDERBOOK)]
+        )
+
+    async def untrack(self, symbol: str):
+        await self.market_client.unsubscribe(
+            [WebSocketSubscription(symbol, WebSocketSubscriptionTopic.ORDERBOOK)]
+        )
+        self._books.pop(symbol, None)
+        self._resyncing.pop(symbol, None)
+
+    async def handle(self, message: Union[OrderBookEvent, Dict[str, Any]]):
+        # market clients in raw mode hand over the decoded dicts
+        event = (
+            OrderBookEvent.from_message(message)
+            if isinstance(message, dict)
+            else message
+        )
+        symbol = event.symbol
+        book = self._books.get(symbol)
+        if book is None:
+            return
+
+        pending = self._resyncing.get(symbol)
+        if pending is not None:
+            pending.append(event)
+            return
+
+        if not self._apply(book, event):
+            try:
+                await self.resync(symbol)
+            except Exception as e:
+                # the book stays out of sync, the next delta retries
+                print(f"[OrderBookEngine] Resync of {symbol} failed: {e}")
+            return
+
+        for listener in self._listeners:
+            await listener(book)
+
+    async def _handle_disconnected(self, event: DisconnectedEvent):
+        # deltas are lost while disconnected, books resync once updates resume
+        for book in self._books.values():
+            book.is_synced = False
+
+    async def resync(self, symbol: str):
+        """Rebuild a book from a REST snapshot"""
+        book = self._books[symbol]
+        self._resyncing[symbol] = []
+        try:
+            orderbook = await asyncio.to_thread(
+                self.api_client.get_orderbook, symbol, self.depth, self.granularity
+            )
+            bids, asks = _orderbook_levels(orderbook)
+            book.apply_snapshot(bids, asks)
+        finally:
+            pending = self._resyncing.pop(symbol, [])
+
+        for event in pending:
+            self._apply(book, event)
+
+    def _apply(self, book: LocalOrderBook, event: OrderBookEvent) -> bool:
+        if event.isSnapshot:
+            book.apply_snapshot(event.bid, event.ask, event.sequence)
+            return True
+        if not book.is_synced:
+            return False
+        return book.apply_update(event.bid, event.ask, event.sequence)
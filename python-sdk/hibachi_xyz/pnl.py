@@ -0,0 +1,217 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Mapping, Optional, Union
+
+try:
+    import numpy as np
+except ImportError:  # numpy is an optional dependency
+    np = None
+
+from hibachi_xyz.events import MarkPriceEvent
+from hibachi_xyz.metadata import ContractMetadata
+from hibachi_xyz.types import FutureContract, Position
+
+_COLUMNS = (
+    "quantity",  # signed, negative for short positions
+    "open_price",
+    "mark_price",
+    "pnl",
+    "notional",
+    "initial_margin",
+    "maintenance_margin",
+    "risk_factor",
+    "maintenance_factor",
+)
+# rows of the columns summed into the totals
+_TOTALS = slice(_COLUMNS.index("pnl"), _COLUMNS.index("maintenance_margin") + 1)
+
+
+@dataclass(slots=True)
+class RiskSnapshot:
+    """Totals of the positions, margins use the position factors of the contracts"""
+
+    unrealizedPnl: float
+    notional: float
+    initialMargin: float
+    maintenanceMargin: float
+
+
+class PnlEngine:
+    """
+    Unrealized PnL, notional and margin of the positions of an account,
+    updated on every mark price tick instead of reading `get_account_info`.
+
+    Positions are rows of NumPy columns. A tick of a symbol recomputes its
+    row only and adjusts the running totals by the difference, so reads
+    never sum over the positions. `recompute` rebuilds everything at once.
+
+    Margins are the notional times `riskFactorForPositions` (initial) and
+    `maintenanceFactorForPositions` (maintenance) of the contract. The factors
+    are read again by `set_positions` and `recompute`, so symbols seen before
+    their contract was loaded get their margins then. Funding PnL is not
+    included.
+
+    ```python
+    engine = PnlEngine(client.metadata)
+    engine.set_positions(client.get_account_info().positions)
+    engine.attach(market_client)
+    await market_client.subscribe([WebSocketSubscription("BTC/USDT-P", WebSocketSubscriptionTopic.MARK_PRICE)])
+
+    engine.unrealized_pnl("BTC/USDT-P"), engine.totals()
+    ```
+
+    Args:
+        contracts: The `ContractMetadata` of a client, or contracts by symbol
+    """
+
+    def __init__(
+        self,
+        contracts: Optional[
+            Union[ContractMetadata, Mapping[str, FutureContract]]
+        ] = None,
+    ):
+        if np is None:
+            raise ImportError(
+                "PnlEngine requires numpy, install it with `pip install hibachi_xyz[history]`"
+            )
+        self.contracts = contracts if contracts is not None else {}
+        self.rows: Dict[str, int] = {}
+        self._columns = np.zeros((len(_COLUMNS), 8), dtype=np.float64)
+        self._totals = np.zeros(_TOTALS.stop - _TOTALS.start, dtype=np.float64)
+        self._bind()
+
+    def _bind(self):
+        (
+            self.quantity,
+            self.open_price,
+            self.mark_price,
+            self.pnl,
+            self.notional,
+            self.initial_margin,
+            self.maintenance_margin,
+            self.risk_factor,
+            self.maintenance_factor,
+        ) = self._columns
+
+    def _row(self, symbol: str) -> int:
+        row = self.rows.get(symbol)
+        if row is not None:
+            return row
+        row = len(self.rows)
+        if row == self._columns.shape[1]:
+            self._columns = np.concatenate(
+                [self._columns, np.zeros_like(self._columns)], axis=1
+            )
+            self._bind()
+        if not self._load_factors(symbol, row):
+            print(f"[PnlEngine] No contract for {symbol} yet, its margins are 0")
+        self.rows[symbol] = row
+        return row
+
+    def _load_factors(self, symbol: str, row: int) -> bool:
+        contracts = (
+            self.contracts.by_symbol
+            if isinstance(self.contracts, ContractMetadata)
+            else self.contracts
+        )
+        contract = contracts.get(symbol)
+        if contract is None:
+            return False
+        self.risk_factor[row] = float(contract.riskFactorForPositions)
+        self.maintenance_factor[row] = float(contract.maintenanceFactorForPositions)
+        return True
+
+    """ Positions """
+
+    def set_positions(self, positions: Iterable[Position]):
+        """Replace all positions, e.g. with those of `get_account_info` or `AccountReplica`"""
+        self.quantity[:] = 0
+        for position in positions:
+            quantity = float(position.quantity)
+            if position.direction == "Short":
+                quantity = -quantity
+            row = self._row(position.symbol)
+            self.quantity[row] = quantity
+            self.open_price[row] = float(position.openPrice)
+            if self.mark_price[row] == 0:
+                self.mark_price[row] = float(position.markPrice)
+        self.recompute()
+
+    def update_position(self, symbol: str, quantity: float, open_price: float):
+        """Set one position, `quantity` is negative for a short position"""
+        row = self._row(symbol)
+        self.quantity[row] = quantity
+        self.open_price[row] = open_price
+        self._update_row(row, self.mark_price[row])
+
+    def on_mark_price(self, symbol: str, mark_price: float):
+        row = self.rows.get(symbol)
+        if row is None:
+            # not a position, its price is only kept until it becomes one
+            row = self._row(symbol)
+        self._update_row(row, mark_price)
+
+    def _update_row(self, row: int, mark_price: float):
+        before = self._columns[_TOTALS, row].copy()
+        quantity = self.quantity[row]
+        notional = abs(quantity) * mark_price
+        self.mark_price[row] = mark_price
+        self.pnl[row] = quantity * (mark_price - self.open_price[row])
+        self.notional[row] = notional
+        self.initial_margin[row] = notional * self.risk_factor[row]
+        self.maintenance_margin[row] = notional * self.maintenance_factor[row]
+        self._totals += self._columns[_TOTALS, row] - before
+
+    def recompute(self):
+        """
+        Recompute all rows and totals with the current factors of the
+        contracts, also clears rounding drift of the running totals
+        """
+        for symbol, row in self.rows.items():
+            self._load_factors(symbol, row)
+        n = len(self.rows)
+        notional = np.abs(self.quantity[:n]) * self.mark_price[:n]
+        self.pnl[:n] = self.quantity[:n] * (self.mark_price[:n] - self.open_price[:n])
+        self.notional[:n] = notional
+        self.initial_margin[:n] = notional * self.risk_factor[:n]
+        self.maintenance_margin[:n] = notional * self.maintenance_factor[:n]
+        self._totals = self._columns[_TOTALS, :n].sum(axis=1)
+
+    """ Reads """
+
+    def unrealized_pnl(self, symbol: str) -> float:
+        row = self.rows.get(symbol)
+        return 0.0 if row is None else float(self.pnl[row])
+
+    def position_notional(self, symbol: str) -> float:
+        row = self.rows.get(symbol)
+        return 0.0 if row is None else float(self.notional[row])
+
+    @property
+    def total_unrealized_pnl(self) -> float:
+        return float(self._totals[0])
+
+    @property
+    def total_notional(self) -> float:
+        return float(self._totals[1])
+
+    def totals(self) -> RiskSnapshot:
+        return RiskSnapshot(*map(float, self._totals))
+
+    def margin_usage(self, balance: float) -> float:
+        """Maintenance margin over equity (balance plus unrealized PnL), inf without equity"""
+        equity = float(balance) + self.total_unrealized_pnl
+        if equity <= 0:
+            return float("inf")
+        return float(self._totals[3]) / equity
+
+    """ Market stream """
+
+    def attach(self, market_client: Any):
+        """Follow the `mark_price` updates of a `HibachiWSMarketClient`, typed or raw"""
+
+        async def handle(event: Any):
+            if not isinstance(event, MarkPriceEvent):
+                event = MarkPriceEvent.from_message(event)
+            self.on_mark_price(event.symbol, event.markPrice)
+
+        market_client.on("mark_price", handle)
@@ -0,0 +1,272 @@
+import asyncio
+import bisect
+import itertools
+import threading
+import time
+from enum import Enum
+from typing import Dict, List, Mapping, Optional, Tuple
+
+
+class EndpointClass(Enum):
+    """Groups of REST endpoints sharing a rate limit"""
+
+    CANCEL = "cancel"
+    ORDER = "order"
+    ACCOUNT = "account"
+    MARKET_DATA = "market_data"
+
+
+def classify_endpoint(method: str, path: str) -> EndpointClass:
+    """Endpoint class of a request to the trading API"""
+    if path.startswith("/trade/order"):
+        if method == "DELETE":
+            return EndpointClass.CANCEL
+        if method in ("POST", "PUT"):
+            return EndpointClass.ORDER
+    return EndpointClass.ACCOUNT
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at `rate` tokens per second up to `capacity`.
+    Not thread safe on its own, `RateLimiter` serializes access.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.paused_until = 0.0
+        self._updated_at = time.monotonic()
+
+    def refill(self, now: float):
+        elapsed = now - max(self._updated_at, self.paused_until)
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self._updated_at = max(now, self._updated_at)
+
+    def available(self, cost: float, now: float) -> bool:
+        return now >= self.paused_until and self.tokens >= cost
+
+    def wait_time(self, cost: float, now: float) -> float:
+        """Seconds until `cost` tokens are available"""
+        wait = max(0.0, self.paused_until - now)
+        missing = cost - self.tokens
+        if missing > 0:
+            wait = max(wait, missing / self.rate)
+        return wait
+
+    def pause(self, until: float):
+        """Hand out nothing before `until` and restart empty"""
+        self.tokens = 0.0
+        self.paused_until = max(self.paused_until, until)
+
+
+class _Waiter:
+    __slots__ = ("priority", "sequence", "endpoint_class", "cost", "granted")
+
+    def __init__(
+        self, priority: int, sequence: int, endpoint_class: EndpointClass, cost: float
+    ):
+        self.priority = priority
+        self.sequence = sequence
+        self.endpoint_class = endpoint_class
+        self.cost = cost
+        self.granted = False
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+DEFAULT_LIMITS: Dict[EndpointClass, Tuple[float, float]] = {
+    EndpointClass.CANCEL: (20.0, 40.0),
+    EndpointClass.ORDER: (20.0, 40.0),
+    EndpointClass.ACCOUNT: (10.0, 20.0),
+    EndpointClass.MARKET_DATA: (20.0, 40.0),
+}
+
+# lower goes first
+DEFAULT_PRIORITIES: Dict[EndpointClass, int] = {
+    EndpointClass.CANCEL: 0,
+    EndpointClass.ORDER: 1,
+    EndpointClass.ACCOUNT: 2,
+    EndpointClass.MARKET_DATA: 3,
+}
+
+_REMAINING_HEADERS = ("X-RateLimit-Remaining", "RateLimit-Remaining")
+_RESET_HEADERS = ("X-RateLimit-Reset", "RateLimit-Reset")
+
+
+class RateLimiter:
+    """
+    Client-side rate limiting for `HibachiApiClient` and `AsyncHibachiApiClient`.
+
+    Every endpoint class has its own token bucket, and all requests can also
+    share a global bucket. Requests waiting for tokens are served by priority,
+    so cancels and orders go ahead of account and market data requests. A
+    waiting request only holds back lower priority ones when it waits for
+    the global bucket, not for its own.
+
+    Rate limit headers of the responses and `429` responses feed back into
+    the buckets, and rate limited requests are retried up to `max_retries`
+    times.
+
+    ```python
+    limiter = RateLimiter(
+        limits={EndpointClass.MARKET_DATA: (5, 10)},
+        global_limit=(40, 80),
+    )
+    client = HibachiApiClient(..., rate_limiter=limiter)
+    ```
+
+    A limiter can be shared by several clients, also between threads.
+
+    Args:
+        limits: (tokens per second, burst) by endpoint class, merged into `DEFAULT_LIMITS`
+        global_limit: (tokens per second, burst) shared by all requests
+        weights: Tokens used by one request of an endpoint class, 1 by default
+        priorities: Priority by endpoint class, lower goes first
+        max_retries: Times a request answered with 429 is retried
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Mapping[EndpointClass, Tuple[float, float]]] = None,
+        global_limit: Optional[Tuple[float, float]] = None,
+        weights: Optional[Mapping[EndpointClass, float]] = None,
+        priorities: Optional[Mapping[EndpointClass, int]] = None,
+        max_retries: int = 2,
+    ):
+        limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.buckets: Dict[EndpointClass, TokenBucket] = {
+            endpoint_class: TokenBucket(rate, capacity)
+            for endpoint_class, (rate, capacity) in limits.items()
+        }
+        self.global_bucket = (
+            TokenBucket(*global_limit) if global_limit is not None else None
+        )
+        self.weights = dict(weights or {})
+        self.priorities = {**DEFAULT_PRIORITIES, **(priorities or {})}
+        self.max_retries = max_retries
+        self._waiters: List[_Waiter] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._granted = threading.Condition(self._lock)
+
+    def acquire(self, endpoint_class: EndpointClass, cost: Optional[float] = None):
+        """Block the calling thread until the request may be sent"""
+        waiter = self._enqueue(endpoint_class, cost)
+        with self._lock:
+            while True:
+                wait = self._poll(waiter)
+                if wait == 0:
+                    return
+                self._granted.wait(wait)
+
+    async def acquire_async(
+        self, endpoint_class: EndpointClass, cost: Optional[float] = None
+    ):
+        """Wait until the request may be sent without blocking the event loop"""
+        waiter = self._enqueue(endpoint_class, cost)
+        try:
+            while True:
+                with self._lock:
+                    wait = self._poll(waiter)
+                if wait == 0:
+                    return
+                await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            with self._lock:
+                if not waiter.granted:
+                    self._waiters.remove(waiter)
+            raise
+
+    def _enqueue(self, endpoint_class: EndpointClass, cost: Optional[float]) -> _Waiter:
+        waiter = _Waiter(
+            self.priorities.get(endpoint_class, len(self.priorities)),
+            next(self._sequence),
+            endpoint_class,
+            self.weights.get(endpoint_class, 1.0) if cost is None else cost,
+        )
+        with self._lock:
+            bisect.insort(self._waiters, waiter)
+        return waiter
+
+    def _poll(self, waiter: _Waiter) -> float:
+        """Grant what can be granted, returns how long `waiter` should still wait"""
+        now = time.monotonic()
+        if self._grant(now):
+            self._granted.notify_all()
+        if waiter.granted:
+            return 0
+        wait = self.buckets[waiter.endpoint_class].wait_time(waiter.cost, now)
+        if self.global_bucket is not None:
+            wait = max(wait, self.global_bucket.wait_time(waiter.cost, now))
+        return max(wait, 0.001)
+
+    def _grant(self, now: float) -> bool:
+        global_bucket = self.global_bucket
+        for bucket in self.buckets.values():
+            bucket.refill(now)
+        if global_bucket is not None:
+            global_bucket.refill(now)
+
+        granted = []
+        for waiter in self._waiters:
+            bucket = self.buckets[waiter.endpoint_class]
+            if not bucket.available(waiter.cost, now):
+                continue
+            if global_bucket is not None:
+                if not global_bucket.available(waiter.cost, now):
+                    # lower priorities must not take the global tokens it waits for
+                    break
+                global_bucket.tokens -= waiter.cost
+            bucket.tokens -= waiter.cost
+            waiter.granted = True
+            granted.append(waiter)
+
+        for waiter in granted:
+            self._waiters.remove(waiter)
+        return bool(granted)
+
+    def feedback(
+        self, endpoint_class: EndpointClass, status: int, headers: Mapping[str, str]
+    ):
+        """Adjust the buckets to the rate limit state reported by the server"""
+        now = time.monotonic()
+        buckets = [self.buckets[endpoint_class]]
+        if self.global_bucket is not None:
+            buckets.append(self.global_bucket)
+
+        retry_after = _header_float(headers, ("Retry-After",))
+        remaining = _header_float(headers, _REMAINING_HEADERS)
+        reset = _header_float(headers, _RESET_HEADERS)
+        if reset is not None and reset > 1e9:
+            # an epoch timestamp rather than a delay
+            reset = max(0.0, reset - time.time())
+
+        with self._lock:
+            for bucket in buckets:
+                bucket.refill(now)
+                if status == 429:
+                    delay = retry_after if retry_after is not None else reset
+                    bucket.pause(now + (delay if delay is not None else 1.0))
+                elif remaining is not None:
+                    if remaining <= 0 and reset is not None:
+                        bucket.pause(now + reset)
+                    else:
+                        bucket.tokens = min(bucket.tokens, remaining)
+            self._granted.notify_all()
+
+
+def _header_float(
+    headers: Mapping[str, str], names: Tuple[str, ...]
+) -> Optional[float]:
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return float(value)
+            except ValueError:
+                return None
+    return None
@@ -0,0 +1,293 @@
+import asyncio
+import inspect
+import time
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Sequence
+
+from hibachi_xyz.events import AccountReconnectedEvent
+from hibachi_xyz.helpers import create_with
+from hibachi_xyz.tracker import DEFAULT_ACCOUNT_TOPICS, OrderTracker
+from hibachi_xyz.types import AccountInfo, AccountSnapshot, Order, Position
+
+# account stream topics carrying balance and position updates
+DEFAULT_BALANCE_TOPICS = ("balance_update",)
+DEFAULT_POSITION_TOPICS = ("position_update",)
+
+# compared with the REST state when reconciling
+_POSITION_FIELDS = ("direction", "quantity", "openPrice")
+
+
+def _data(message: Dict[str, Any]) -> Dict[str, Any]:
+    data = message.get("data", message)
+    return data if isinstance(data, dict) else {}
+
+
+def _sequence(message: Dict[str, Any]) -> Optional[int]:
+    sequence = message.get("sequence", _data(message).get("sequence"))
+    return None if sequence is None else int(sequence)
+
+
+def _is_flat(quantity: Optional[str]) -> bool:
+    try:
+        return float(quantity) == 0
+    except (TypeError, ValueError):
+        return False
+
+
+def _same(local: Optional[str], remote: Optional[str]) -> bool:
+    """Equal values, "1.50" and "1.5" are the same"""
+    if local == remote:
+        return True
+    try:
+        return float(local) == float(remote)
+    except (TypeError, ValueError):
+        return False
+
+
+class AccountReplica:
+    """
+    Local copy of balance, positions and open orders of an account, kept
+    current by the account stream instead of polling `get_account_info`.
+
+    It starts from the snapshot of `stream_start` and applies the balance,
+    position and order updates of the stream. Reads are plain attribute and
+    dict lookups.
+
+    The replica is marked `stale` when the connection drops or when a
+    sequence number of the stream is skipped. A reconnect of the account
+    client brings a new snapshot; with an `api_client` a gap is resynced over
+    REST right away, and every `reconcile_interval` seconds the replica is
+    compared with one `get_account_info` and one `get_pending_orders`
+    request. Differences are corrected and counted in
+    `mismatches`.
+
+    ```python
+    replica = AccountReplica(api_client=client)
+    replica.attach(account_client)
+    await account_client.connect()
+    replica.apply_snapshot((await account_client.stream_start()).accountSnapshot)
+    await replica.start()
+
+    position = replica.position("BTC/USDT-P")
+    ```
+
+    Args:
+        api_client: `HibachiApiClient` or `AsyncHibachiApiClient` used to reconcile, None only follows the stream
+        order_tracker: Open orders of the account, the one of `api_client` by default
+        reconcile_interval: Seconds between two reconciliations, None only reconciles after gaps
+    """
+
+    def __init__(
+        self,
+        api_client: Optional[Any] = None,
+        order_tracker: Optional[OrderTracker] = None,
+        reconcile_interval: Optional[float] = 60,
+    ):
+        self.api_client = api_client
+        if order_tracker is None and api_client is not None:
+            order_tracker = api_client.order_tracker
+        self.order_tracker = order_tracker or OrderTracker()
+        self.reconcile_interval = reconcile_interval
+        self.balance: Optional[str] = None
+        self.positions: Dict[str, Position] = {}
+        self.stale = True
+        self.updated_at: Optional[float] = None
+        self.mismatches = 0
+        self._sequence: Optional[int] = None
+        # incremented by every update, a reconciliation that raced with one is not applied
+        self._version = 0
+        self._resync = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._position_topics = set(DEFAULT_POSITION_TOPICS)
+        self._order_topics = set(DEFAULT_ACCOUNT_TOPICS)
+
+    def position(self, symbol: str) -> Optional[Position]:
+        return self.positions.get(symbol)
+
+    def orders(self, symbol: Optional[str] = None) -> List[Order]:
+        return self.order_tracker.orders(symbol)
+
+    """ Updates """
+
+    def apply_snapshot(self, snapshot: AccountSnapshot):
+        """Replace balance and positions with the snapshot of `stream_start`"""
+        self.balance = snapshot.balance
+        self.positions = {
+            position.symbol: position
+            for position in snapshot.positions
+            if not _is_flat(position.quantity)
+        }
+        self._sequence = None
+        self._updated()
+        self.stale = False
+
+    def apply_message(self, message: Dict[str, Any]):
+        """Apply a balance, position or order update of the account stream"""
+        self._check_sequence(message)
+        topic = message.get("topic")
+        data = _data(message)
+        if topic in self._order_topics:
+            self.order_tracker.apply_account_message(message)
+        else:
+            if data.get("balance") is not None:
+                self.balance = str(data["balance"])
+            positions = data.get("positions")
+            if positions is None and topic in self._position_topics:
+                position = data.get("position", data)
+                positions = [position] if isinstance(position, dict) else []
+            for position in positions or []:
+                self._apply_position(position)
+        self._updated()
+
+    def _apply_position(self, update: Dict[str, Any]):
+        symbol = update.get("symbol")
+        if symbol is None:
+            return
+        if _is_flat(update.get("quantity")):
+            self.positions.pop(symbol, None)
+            return
+        current = self.positions.get(symbol)
+        fields = asdict(current) if current is not None else {}
+        fields.update({k: str(v) for k, v in update.items() if v is not None})
+        try:
+            self.positions[symbol] = create_with(Position, fields)
+        except TypeError:
+            # a first update without all details, the next reconciliation fills it in
+            self._mark_gap()
+
+    def _check_sequence(self, message: Dict[str, Any]):
+        sequence = _sequence(message)
+        if sequence is None:
+            return
+        if self._sequence is not None and sequence != self._sequence + 1:
+            print(f"[AccountReplica] Gap in the account stream after {self._sequence}")
+            self._mark_gap()
+        self._sequence = sequence
+
+    def _mark_gap(self):
+        self.stale = True
+        self._resync.set()
+
+    def _updated(self):
+        self._version += 1
+        self.updated_at = time.time()
+
+    """ Reconciliation """
+
+    async def reconcile(self) -> bool:
+        """
+        Compare with the REST state and correct the differences, returns False
+        when updates arrived in the meantime and the REST state was discarded
+        """
+        if self.api_client is None:
+            return False
+        version = self._version
+        info: AccountInfo = await self._call(self.api_client.get_account_info)
+        # a client with this tracker loads it itself
+        pending = await self._call(self.api_client.get_pending_orders)
+
+        if self._version != version:
+            # the stream moved on while the requests were in flight, the REST
+            # state may be older than the updates applied since
+            if self.stale:
+                self._resync.set()
+            return False
+        self._correct(info)
+        if self.order_tracker is not self.api_client.order_tracker:
+            self.order_tracker.load(pending.orders)
+        # the next update starts a new sequence
+        self._sequence = None
+        self._updated()
+        self.stale = False
+        return True
+
+    def _correct(self, info: AccountInfo):
+        positions = {
+            position.symbol: position
+            for position in info.positions
+            if not _is_flat(position.quantity)
+        }
+        mismatched = self.balance is not None and not _same(self.balance, info.balance)
+        if positions.keys() != self.positions.keys():
+            mismatched = True
+        else:
+            for symbol, position in positions.items():
+                local = self.positions[symbol]
+                if any(
+                    not _same(getattr(local, field), getattr(position, field))
+                    for field in _POSITION_FIELDS
+                ):
+                    mismatched = True
+        if mismatched and not self.stale:
+            self.mismatches += 1
+            print("[AccountReplica] Corrected a difference to the REST state")
+        self.balance = info.balance
+        self.positions = positions
+
+    async def _call(self, method, *args):
+        if inspect.iscoroutinefunction(method):
+            return await method(*args)
+        return await asyncio.to_thread(method, *args)
+
+    async def _reconcile_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._resync.wait(), timeout=self.reconcile_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._resync.clear()
+            try:
+                if not await self.reconcile():
+                    # do not retry a discarded resync right away
+                    await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[AccountReplica] Reconciliation failed: {e}")
+                self._mark_gap()
+                await asyncio.sleep(1)
+
+    async def start(self):
+        """Start the periodic reconciliation, a no-op without `api_client`"""
+        if self.api_client is not None and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._reconcile_loop())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    """ Account stream """
+
+    def attach(
+        self,
+        account_client: Any,
+        balance_topics: Sequence[str] = DEFAULT_BALANCE_TOPICS,
+        position_topics: Sequence[str] = DEFAULT_POSITION_TOPICS,
+        order_topics: Sequence[str] = DEFAULT_ACCOUNT_TOPICS,
+    ):
+        """Follow the updates and reconnects of a `HibachiWSAccountClient`"""
+
+        async def handle(message: Dict[str, Any]):
+            self.apply_message(message)
+
+        async def handle_disconnected(event: Any):
+            self.stale = True
+
+        async def handle_reconnected(event: AccountReconnectedEvent):
+            self.apply_snapshot(event.stream.accountSnapshot)
+            # the snapshot carries no orders
+            self._resync.set()
+
+        self._position_topics = set(position_topics)
+        self._order_topics = set(order_topics)
+        for topic in (*balance_topics, *position_topics, *order_topics):
+            account_client.on(topic, handle)
+        account_client.on("disconnected", handle_disconnected)
+        account_client.on("reconnected", handle_reconnected)
@@ -0,0 +1,343 @@
+import asyncio
+import contextlib
+import zlib
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import websockets
+
+from hibachi_xyz.api_ws_market import HibachiWSMarketClient, MarketStream
+from hibachi_xyz.dispatch import BoundedQueue, OverflowPolicy, QueueStats
+from hibachi_xyz.events import DisconnectedEvent, ReconnectedEvent
+from hibachi_xyz.helpers import default_data_api_url
+from hibachi_xyz.types import WebSocketSubscription, WebSocketSubscriptionTopic
+
+
+class ShardingPolicy(ABC):
+    """
+    Decides which connection of a `ShardedMarketClient` carries a subscription.
+
+    `assign` is called for one subscription at a time with the indexes of the
+    connections that are currently up and the number of subscriptions each of
+    them carries so far.
+    """
+
+    @abstractmethod
+    def assign(
+        self,
+        subscription: WebSocketSubscription,
+        shards: List[int],
+        load: Dict[int, int],
+    ) -> int:
+        pass
+
+
+class SymbolHashSharding(ShardingPolicy):
+    """
+    Keeps all topics of a symbol on the same connection, chosen by a stable hash
+    of the symbol, so the events of a symbol stay in order across topics
+    """
+
+    def assign(
+        self,
+        subscription: WebSocketSubscription,
+        shards: List[int],
+        load: Dict[int, int],
+    ) -> int:
+        return shards[zlib.crc32(subscription.symbol.encode()) % len(shards)]
+
+
+class LeastLoadedSharding(ShardingPolicy):
+    """Puts each subscription on the connection carrying the fewest subscriptions"""
+
+    def assign(
+        self,
+        subscription: WebSocketSubscription,
+        shards: List[int],
+        load: Dict[int, int],
+    ) -> int:
+        return min(shards, key=lambda shard: load[shard])
+
+
+SubscriptionKey = Tuple[str, str]
+
+
+def _key(subscription: WebSocketSubscription) -> SubscriptionKey:
+    return (subscription.symbol, subscription.topic.value)
+
+
+class ShardedMarketClient:
+    """
+    Spreads market subscriptions over several `HibachiWSMarketClient`
+    connections, so decoding and dispatch are not limited by a single socket.
+
+    Handlers registered with `on` and streams from `stream` / `merged_stream`
+    receive the events of all connections, like a single client would.
+
+    When a connection drops, its subscriptions are moved to the connections
+    that are still up. Once it is back, all subscriptions are rebalanced over
+    every connection according to the sharding policy.
+
+    ```python
+    client = ShardedMarketClient(num_shards=4, sharding_policy=LeastLoadedSharding())
+    await client.connect()
+    await client.subscribe(
+        [
+            WebSocketSubscription(symbol, topic)
+            for symbol in symbols
+            for topic in WebSocketSubscriptionTopic
+        ]
+    )
+
+    async for event in client.merged_stream(client.subscriptions):
+        ...
+    ```
+
+    Args:
+        api_endpoint: The base URL of the data API
+        num_shards: Number of websocket connections
+        sharding_policy: Assigns subscriptions to connections, `SymbolHashSharding` by default
+        **client_options: Options of every `HibachiWSMarketClient`, e.g. `raw` or `overflow_policies`
+    """
+
+    def __init__(
+        self,
+        api_endpoint: str = default_data_api_url,
+        num_shards: int = 4,
+        sharding_policy: Optional[ShardingPolicy] = None,
+        **client_options: Any,
+    ):
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+
+        self.sharding_policy = sharding_policy or SymbolHashSharding()
+        self.shards = [
+            HibachiWSMarketClient(api_endpoint, **client_options)
+            for _ in range(num_shards)
+        ]
+        self.raw = self.shards[0].raw
+        self.queue_size = self.shards[0].queue_size
+        self.overflow_policy = self.shards[0].overflow_policy
+        self.overflow_policies = self.shards[0].overflow_policies
+
+        self._subscriptions: Dict[SubscriptionKey, WebSocketSubscription] = {}
+        self._assignments: Dict[SubscriptionKey, int] = {}
+        self._stream_subscriptions: Set[SubscriptionKey] = set()
+        self._down: Set[int] = set()
+        self._lock = asyncio.Lock()
+
+        for index, shard in enumerate(self.shards):
+            shard.on("disconnected", self._disconnected_handler(index))
+            shard.on("reconnected", self._reconnected_handler(index))
+
+    @property
+    def subscriptions(self) -> List[WebSocketSubscription]:
+        return list(self._subscriptions.values())
+
+    def assignments(self) -> Dict[int, List[WebSocketSubscription]]:
+        """Subscriptions carried by each connection"""
+        shards: Dict[int, List[WebSocketSubscription]] = {
+            index: [] for index in range(len(self.shards))
+        }
+        for key, index in self._assignments.items():
+            shards[index].append(self._subscriptions[key])
+        return shards
+
+    async def connect(self):
+        await asyncio.gather(*(shard.connect() for shard in self.shards))
+        return self
+
+    async def disconnect(self):
+        await asyncio.gather(*(shard.disconnect() for shard in self.shards))
+
+    def on(self, topic: str, handler: Callable[[Any], None]):
+        """Register a callback on every connection"""
+        for shard in self.shards:
+            shard.on(topic, handler)
+
+    async def subscribe(self, subscriptions: List[WebSocketSubscription]):
+        async with self._lock:
+            healthy = self._healthy_shards()
+            load = self._load(healthy)
+            by_shard: Dict[int, List[WebSocketSubscription]] = defaultdict(list)
+            for sub in subscriptions:
+                key = _key(sub)
+                if key in self._subscriptions:
+                    continue
+                index = self.sharding_policy.assign(sub, healthy, load)
+                load[index] += 1
+                self._subscriptions[key] = sub
+                self._assignments[key] = index
+                by_shard[index].append(sub)
+
+            await asyncio.gather(
+                *(
+                    self._subscribe_shard(index, subs)
+                    for index, subs in by_shard.items()
+                )
+            )
+
+    async def unsubscribe(self, subscriptions: List[WebSocketSubscription]):
+        async with self._lock:
+            by_shard: Dict[int, List[WebSocketSubscription]] = defaultdict(list)
+            for sub in subscriptions:
+                key = _key(sub)
+                if self._subscriptions.pop(key, None) is None:
+                    continue
+                by_shard[self._assignments.pop(key)].append(sub)
+
+            await asyncio.gather(
+                *(
+                    self._unsubscribe_shard(index, subs)
+                    for index, subs in by_shard.items()
+                )
+            )
+
+    async def rebalance(self):
+        """Reassign every subscription over the connections that are up"""
+        async with self._lock:
+            healthy = self._healthy_shards()
+            load = {index: 0 for index in healthy}
+            await self._reassign(list(self._subscriptions), healthy, load)
+
+    async def _failover(self, down: int):
+        """Move the subscriptions of a connection that dropped to the others"""
+        async with self._lock:
+            healthy = self._healthy_shards()
+            if down in healthy:
+                return
+            keys = [key for key, index in self._assignments.items() if index == down]
+            await self._reassign(keys, healthy, self._load(healthy))
+
+    async def _reassign(
+        self, keys: List[SubscriptionKey], healthy: List[int], load: Dict[int, int]
+    ):
+        moves: Dict[Tuple[int, int], List[WebSocketSubscription]] = defaultdict(list)
+        for key in keys:
+            sub = self._subscriptions[key]
+            index = self.sharding_policy.assign(sub, healthy, load)
+            load[index] += 1
+            previous = self._assignments[key]
+            if previous != index:
+                moves[(previous, index)].append(sub)
+                self._assignments[key] = index
+
+        for (previous, index), subs in moves.items():
+            # subscribe first, a short overlap is better than a gap
+            await self._subscribe_shard(index, subs)
+            await self._unsubscribe_shard(previous, subs)
+
+    async def _subscribe_shard(
+        self, index: int, subscriptions: List[WebSocketSubscription]
+    ):
+        # a connection that is down subscribes once it is back
+        with contextlib.suppress(websockets.ConnectionClosed):
+            await self.shards[index].subscribe(subscriptions)
+
+    async def _unsubscribe_shard(
+        self, index: int, subscriptions: List[WebSocketSubscription]
+    ):
+        shard = self.shards[index]
+        if index in self._down:
+            # only make sure the connection does not resubscribe once it is back
+            shard.drop_subscriptions(subscriptions)
+            return
+        with contextlib.suppress(websockets.ConnectionClosed):
+            await shard.unsubscribe(subscriptions)
+
+    def _healthy_shards(self) -> List[int]:
+        healthy = [i for i in range(len(self.shards)) if i not in self._down]
+        # with every connection down, subscriptions wait on their own connection
+        return healthy or list(range(len(self.shards)))
+
+    def _load(self, shards: List[int]) -> Dict[int, int]:
+        load = {index: 0 for index in shards}
+        for index in self._assignments.values():
+            if index in load:
+                load[index] += 1
+        return load
+
+    def _disconnected_handler(self, index: int):
+        async def handle(event: DisconnectedEvent):
+            self._down.add(index)
+            await self._failover(index)
+
+        return handle
+
+    def _reconnected_handler(self, index: int):
+        async def handle(event: ReconnectedEvent):
+            self._down.discard(index)
+            await self.rebalance()
+
+        return handle
+
+    def stream(
+        self,
+        symbol: str,
+        topic: WebSocketSubscriptionTopic,
+        maxsize: Optional[int] = None,
+        policy: Optional[OverflowPolicy] = None,
+    ) -> MarketStream:
+        """Same as `HibachiWSMarketClient.stream`, over all connections"""
+        return self.merged_stream(
+            [WebSocketSubscription(symbol, topic)], maxsize=maxsize, policy=policy
+        )
+
+    def merged_stream(
+        self,
+        subscriptions: List[WebSocketSubscription],
+        maxsize: Optional[int] = None,
+        policy: Optional[OverflowPolicy] = None,
+    ) -> MarketStream:
+        """Same as `HibachiWSMarketClient.merged_stream`, over all connections"""
+        if policy is None:
+            policies = {
+                self.overflow_policies.get(sub.topic.value, self.overflow_policy)
+                for sub in subscriptions
+            }
+            policy = policies.pop() if len(policies) == 1 else self.overflow_policy
+        queue = BoundedQueue(maxsize or self.queue_size, policy)
+        return MarketStream(self, list(subscriptions), queue)
+
+    def _parse_event(self, msg: dict) -> Any:
+        return self.shards[0]._parse_event(msg)
+
+    async def _attach_stream(self, stream: MarketStream):
+        # every connection feeds the stream, so it follows subscriptions that move
+        for shard in self.shards:
+            shard.add_stream(stream)
+        missing = [
+            sub for sub in stream.subscriptions if _key(sub) not in self._subscriptions
+        ]
+        if missing:
+            self._stream_subscriptions.update(_key(sub) for sub in missing)
+            await self.subscribe(missing)
+
+    async def _detach_stream(self, stream: MarketStream):
+        for shard in self.shards:
+            shard.remove_stream(stream)
+        still_streamed = {
+            _key(sub)
+            for sub in stream.subscriptions
+            if any(shard.has_stream(sub) for shard in self.shards)
+        }
+
+        unused = [
+            sub
+            for sub in stream.subscriptions
+            if _key(sub) in self._stream_subscriptions
+            and _key(sub) not in still_streamed
+        ]
+        for sub in unused:
+            self._stream_subscriptions.discard(_key(sub))
+        if unused:
+            await self.unsubscribe(unused)
+
+    def queue_stats(self) -> Dict[Tuple[int, str, Optional[str]], QueueStats]:
+        """Queue stats of all connections by (shard, topic, symbol)"""
+        return {
+            (index, topic, symbol): stats
+            for index, shard in enumerate(self.shards)
+            for (topic, symbol), stats in shard.queue_stats().items()
+        }
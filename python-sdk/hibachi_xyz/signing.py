@@ -0,0 +1,149 @@
+import hmac
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from hashlib import sha256
+from typing import List, Optional, Sequence, Union
+
+from eth_keys import keys
+
+
+class Signer(ABC):
+    """
+    Signs request payloads for `HibachiApiClient`.
+
+    Subclasses implement `sign`, and can override `sign_many` when a batch of
+    payloads can be signed faster than one at a time.
+    """
+
+    @abstractmethod
+    def sign(self, payload: bytes) -> str:
+        pass
+
+    def sign_many(self, payloads: Sequence[bytes]) -> List[str]:
+        return [self.sign(payload) for payload in payloads]
+
+    def close(self):
+        pass
+
+
+class EcdsaSigner(Signer):
+    """
+    Signs with the ECDSA private key of a wallet account.
+
+    eth_keys uses the native `coincurve` backend when it is installed
+    (`pip install hibachi_xyz[fast]`) which is much faster than its pure
+    Python fallback.
+    """
+
+    def __init__(self, private_key: Union[keys.PrivateKey, bytes]):
+        if isinstance(private_key, bytes):
+            private_key = keys.PrivateKey(private_key)
+        self._private_key = private_key
+
+    def sign(self, payload: bytes) -> str:
+        # Hash the payload
+        message_hash = sha256(payload).digest()
+
+        # Sign the hash
+        signed_message = self._private_key.sign_msg_hash(message_hash)
+
+        # Extract signature components
+        r = signed_message.r.to_bytes(32, "big")
+        s = signed_message.s.to_bytes(32, "big")
+        v = signed_message.v.to_bytes(1, "big")
+
+        # Combine to form the signature
+        return r.hex() + s.hex() + v.hex()
+
+
+class HmacSigner(Signer):
+    """Signs with the HMAC secret of a web account"""
+
+    def __init__(self, secret: str):
+        self._secret = secret.encode()
+
+    def sign(self, payload: bytes) -> str:
+        if not self._secret:
+            raise RuntimeError("Private key is not set")
+        return hmac.new(self._secret, payload, sha256).hexdigest()
+
+
+# ECDSA signer of the current pool worker, set by _init_worker
+_worker_signer: Optional[EcdsaSigner] = None
+
+
+def _init_worker(private_key: bytes):
+    global _worker_signer
+    _worker_signer = EcdsaSigner(private_key)
+
+
+def _sign_chunk(payloads: List[bytes]) -> List[str]:
+    return _worker_signer.sign_many(payloads)
+
+
+class ProcessPoolSigner(Signer):
+    """
+    ECDSA signer that spreads `sign_many` over a pool of worker processes.
+
+    Single signatures and batches smaller than `min_batch_size` are signed in
+    the calling process, and so is everything if the pool breaks.
+
+    ```python
+    signer = ProcessPoolSigner(private_key_bytes, max_workers=4)
+    client = HibachiApiClient(api_key=api_key, account_id=account_id, signer=signer)
+    client.batch_orders(orders)  # orders are signed in parallel
+    signer.close()
+    ```
+
+    Args:
+        private_key: The 32 byte ECDSA private key of the account
+        max_workers: Number of worker processes, defaults to the CPU count
+        min_batch_size: Smallest batch worth sending to the pool
+    """
+
+    def __init__(
+        self,
+        private_key: bytes,
+        max_workers: Optional[int] = None,
+        min_batch_size: int = 8,
+    ):
+        self._private_key = private_key
+        self._fallback = EcdsaSigner(private_key)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_batch_size = min_batch_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def sign(self, payload: bytes) -> str:
+        return self._fallback.sign(payload)
+
+    def sign_many(self, payloads: Sequence[bytes]) -> List[str]:
+        if len(payloads) < self.min_batch_size or self.max_workers < 2:
+            return self._fallback.sign_many(payloads)
+
+        chunk_size = -(-len(payloads) // self.max_workers)
+        chunks = [
+            list(payloads[i : i + chunk_size])
+            for i in range(0, len(payloads), chunk_size)
+        ]
+        try:
+            signed_chunks = list(self._get_executor().map(_sign_chunk, chunks))
+        except BrokenProcessPool:
+            self.close()
+            return self._fallback.sign_many(payloads)
+        return [signature for chunk in signed_chunks for signature in chunk]
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_worker,
+                initargs=(self._private_key,),
+            )
+        return self._executor
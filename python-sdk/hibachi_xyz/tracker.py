@@ -0,0 +1,311 @@
+import threading
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Union
+
+from hibachi_xyz.encoding import Number
+from hibachi_xyz.helpers import create_with
+from hibachi_xyz.numeric import as_number
+from hibachi_xyz.types import (
+    BatchResponse,
+    CancelOrder,
+    CreateOrder,
+    FutureContract,
+    Nonce,
+    Order,
+    OrderFlags,
+    OrderId,
+    OrderStatus,
+    Side,
+    UpdateOrder,
+)
+
+_FINAL_STATUSES = {OrderStatus.FILLED, OrderStatus.CANCELLED, OrderStatus.REJECTED}
+_FINAL_STATUS_VALUES = {status.value for status in _FINAL_STATUSES}
+_STATUS_VALUES = {status.value for status in OrderStatus}
+_UPDATED_FIELDS = ("availableQuantity", "totalQuantity", "price", "triggerPrice")
+
+# account stream topics carrying order updates
+DEFAULT_ACCOUNT_TOPICS = ("order_update", "orders")
+
+
+def _contract_id(contracts: Mapping[str, FutureContract], symbol: str) -> Optional[int]:
+    contract = contracts.get(symbol)
+    return None if contract is None else contract.id
+
+
+def _field(value: Optional[Number]) -> Optional[Union[str, Decimal]]:
+    """An order value as `Order` holds it, `Decimal` values are kept exact"""
+    if value is None or isinstance(value, Decimal):
+        return value
+    return str(value)
+
+
+class OrderTracker:
+    """
+    In-memory copy of the open orders of the account, by order id and nonce.
+
+    A client created with an `order_tracker` records what it places, modifies
+    and cancels, so `update_order` can sign against the tracked order instead
+    of reading it back with `get_order_details` first. Orders it does not
+    know are still read over REST. `get_pending_orders` resynchronizes it
+    with the exchange, and `attach` keeps it current with the updates of the
+    account stream, e.g. fills and cancels from other sessions.
+
+    ```python
+    tracker = OrderTracker()
+    client = HibachiApiClient(..., order_tracker=tracker)
+    client.get_pending_orders()
+
+    (nonce, order_id) = client.place_limit_order("BTC/USDT-P", 0.001, 90_000, Side.BID, max_fees_percent)
+    client.update_order(order_id, max_fees_percent, price=90_010)  # a single request
+
+    client.batch_orders([tracker.update_order(order_id, max_fees_percent, price=90_020)])
+    ```
+
+    The tracker is shared by the clients it is passed to and is thread safe.
+    """
+
+    def __init__(self):
+        self._orders: Dict[OrderId, Order] = {}
+        self._order_ids: Dict[Nonce, OrderId] = {}
+        self._nonces: Dict[OrderId, Nonce] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __contains__(self, order_id: OrderId) -> bool:
+        return int(order_id) in self._orders
+
+    def get(self, order_id: OrderId) -> Optional[Order]:
+        return self._orders.get(int(order_id))
+
+    def get_by_nonce(self, nonce: Nonce) -> Optional[Order]:
+        order_id = self._order_ids.get(int(nonce))
+        return None if order_id is None else self._orders.get(order_id)
+
+    def orders(self, symbol: Optional[str] = None) -> List[Order]:
+        return [
+            order
+            for order in list(self._orders.values())
+            if symbol is None or order.symbol == symbol
+        ]
+
+    def update_order(
+        self,
+        order_id: OrderId,
+        max_fees_percent: float,
+        quantity: Optional[float] = None,
+        price: Optional[float] = None,
+        trigger_price: Optional[float] = None,
+    ) -> UpdateOrder:
+        """`UpdateOrder` for `batch_orders` with the unchanged details taken from the tracked order"""
+        with self._lock:
+            order = self.get(order_id)
+            if order is None:
+                raise KeyError(f"Order {order_id} is not tracked")
+            if price is None:
+                price = as_number(order.price)
+            if trigger_price is None:
+                trigger_price = as_number(order.triggerPrice)
+            if quantity is None:
+                quantity = as_number(order.totalQuantity)
+        return UpdateOrder(
+            int(order_id),
+            order.symbol,
+            order.side,
+            quantity,
+            max_fees_percent,
+            price=price,
+            trigger_price=trigger_price,
+            order_flags=order.orderFlags,
+        )
+
+    """ Updates """
+
+    def load(self, orders: Iterable[Order]):
+        """Replace the tracked orders with the pending orders of the exchange"""
+        open_orders = {
+            int(order.orderId): order
+            for order in orders
+            if order.status not in _FINAL_STATUSES
+        }
+        with self._lock:
+            self._orders = open_orders
+            self._nonces = {
+                order_id: nonce
+                for order_id, nonce in self._nonces.items()
+                if order_id in open_orders
+            }
+            self._order_ids = {
+                nonce: order_id for order_id, nonce in self._nonces.items()
+            }
+
+    def upsert(self, order: Order, nonce: Optional[Nonce] = None):
+        order_id = int(order.orderId)
+        with self._lock:
+            if order.status in _FINAL_STATUSES:
+                self._remove(order_id)
+                return
+            self._orders[order_id] = order
+            if nonce is not None:
+                self._order_ids[int(nonce)] = order_id
+                self._nonces[order_id] = int(nonce)
+
+    def placed(
+        self,
+        nonce: Nonce,
+        order_id: OrderId,
+        symbol: str,
+        side: Side,
+        quantity: float,
+        price: Optional[float],
+        trigger_price: Optional[float] = None,
+        order_flags: Optional[OrderFlags] = None,
+        account_id: Optional[int] = None,
+        contract_id: Optional[int] = None,
+    ):
+        """Record an order the client placed"""
+        if price is None and trigger_price is None:
+            # market orders do not rest on the book
+            return
+        if side == Side.BUY:
+            side = Side.BID
+        elif side == Side.SELL:
+            side = Side.ASK
+        order = Order(
+            accountId=account_id,
+            availableQuantity=_field(quantity),
+            orderId=str(order_id),
+            orderType="MARKET" if price is None else "LIMIT",
+            side=side.value,
+            status="PLACED",
+            symbol=symbol,
+            price=_field(price),
+            totalQuantity=_field(quantity),
+            triggerPrice=_field(trigger_price),
+            orderFlags=None if order_flags is None else order_flags.value,
+            contractId=contract_id,
+        )
+        self.upsert(order, nonce)
+
+    def modified(
+        self,
+        order_id: OrderId,
+        quantity: Optional[float] = None,
+        price: Optional[float] = None,
+        trigger_price: Optional[float] = None,
+    ):
+        """Record a modification the exchange accepted"""
+        with self._lock:
+            order = self.get(order_id)
+            if order is None:
+                return
+            if quantity is not None:
+                order.totalQuantity = _field(quantity)
+                order.availableQuantity = _field(quantity)
+            if price is not None:
+                order.price = _field(price)
+            if trigger_price is not None:
+                order.triggerPrice = _field(trigger_price)
+
+    def removed(
+        self, order_id: Optional[OrderId] = None, nonce: Optional[Nonce] = None
+    ):
+        """Forget a cancelled or filled order"""
+        with self._lock:
+            if order_id is None and nonce is not None:
+                order_id = self._order_ids.get(int(nonce))
+            if order_id is not None:
+                self._remove(int(order_id))
+
+    def clear(self, contract_id: Optional[int] = None):
+        """Forget all orders, or those of a contract"""
+        with self._lock:
+            for order_id, order in list(self._orders.items()):
+                if contract_id is None or order.contractId == contract_id:
+                    self._remove(order_id)
+
+    def _remove(self, order_id: OrderId):
+        self._orders.pop(order_id, None)
+        nonce = self._nonces.pop(order_id, None)
+        if nonce is not None:
+            self._order_ids.pop(nonce, None)
+
+    def apply_batch(
+        self,
+        orders: Sequence[CreateOrder | UpdateOrder | CancelOrder],
+        response: BatchResponse,
+        account_id: Optional[int] = None,
+        contracts: Optional[Mapping[str, FutureContract]] = None,
+    ):
+        """Record the result of `batch_orders`, the response lists the orders in request order"""
+        contracts = contracts or {}
+        results = response.orders
+        for i, order in enumerate(orders):
+            result = results[i] if i < len(results) else None
+            if type(order) is CreateOrder:
+                if result is not None and result.orderId is not None:
+                    self.placed(
+                        result.nonce,
+                        result.orderId,
+                        order.symbol,
+                        order.side,
+                        order.quantity,
+                        order.price,
+                        order.trigger_price,
+                        order.order_flags,
+                        account_id,
+                        _contract_id(contracts, order.symbol),
+                    )
+            elif type(order) is UpdateOrder:
+                self.modified(
+                    order.order_id, order.quantity, order.price, order.trigger_price
+                )
+            else:
+                self.removed(order.order_id, order.nonce)
+
+    def apply_account_message(self, message: Dict[str, Any]):
+        """Apply the order updates of an account stream message"""
+        data = message.get("data", message)
+        if not isinstance(data, dict):
+            return
+        entries = data.get("orders")
+        if entries is None:
+            entry = data.get("order", data)
+            entries = [entry] if isinstance(entry, dict) else []
+
+        for entry in entries:
+            if not isinstance(entry, dict) or "orderId" not in entry:
+                continue
+            order_id = int(entry["orderId"])
+            status = entry.get("status")
+            if status in _FINAL_STATUS_VALUES:
+                self.removed(order_id)
+                continue
+
+            with self._lock:
+                order = self.get(order_id)
+                if order is not None:
+                    for field in _UPDATED_FIELDS:
+                        if entry.get(field) is not None:
+                            setattr(order, field, str(entry[field]))
+                    if status in _STATUS_VALUES:
+                        order.status = OrderStatus(status)
+                    continue
+            try:
+                self.upsert(create_with(Order, entry), entry.get("nonce"))
+            except (TypeError, ValueError, KeyError):
+                # not enough details to sign against, it is read over REST when needed
+                pass
+
+    def attach(
+        self, account_client: Any, topics: Sequence[str] = DEFAULT_ACCOUNT_TOPICS
+    ):
+        """Follow the order updates of a `HibachiWSAccountClient`"""
+
+        async def handle(message: Dict[str, Any]):
+            self.apply_account_message(message)
+
+        for topic in topics:
+            account_client.on(topic, handle)
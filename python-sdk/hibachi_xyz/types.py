@@ -325,6 +325,23 @@ class BatchResponse:
     orders: List[BatchResponseOrder]
 
 
+@dataclass
+class CancelResult:
+    orderId: OrderId
+    cancelled: bool
+    error: Optional[str] = None
+
+
+@dataclass
+class CancelAllResponse:
+    # empty when the native cancel all endpoint was used, it does not report orders
+    results: List[CancelResult]
+
+    @property
+    def failed(self) -> List[CancelResult]:
+        return [result for result in self.results if not result.cancelled]
+
+
 @dataclass
 class StatsResponse:
     high24h: str
@@ -0,0 +1,257 @@
+import copy
+from dataclasses import dataclass
+from decimal import ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_EVEN, Decimal
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from hibachi_xyz.encoding import Number
+from hibachi_xyz.metadata import ContractMetadata
+from hibachi_xyz.types import (
+    CancelOrder,
+    CreateOrder,
+    FutureContract,
+    Side,
+    UpdateOrder,
+)
+
+
+def _decimal(value: Number) -> Decimal:
+    if isinstance(value, float):
+        # the shortest repr, 0.1 is Decimal("0.1") and not the binary expansion
+        return Decimal(repr(value))
+    return Decimal(value)
+
+
+def _like(value: Decimal, original: Number) -> Number:
+    """`value` in the type of `original`"""
+    return float(value) if isinstance(original, float) else value
+
+
+@dataclass(slots=True)
+class OrderViolation:
+    """A rule of the contract an order leg breaks, `index` is its position in the batch"""
+
+    index: int
+    symbol: str
+    field: str
+    message: str
+
+
+class OrderValidationError(ValueError):
+    """Raised before signing when orders break the rules of their contract"""
+
+    violations: List[OrderViolation]
+
+    def __init__(self, violations: List[OrderViolation]):
+        self.violations = violations
+        super().__init__(
+            "; ".join(
+                f"order {v.index} ({v.symbol}) {v.field}: {v.message}"
+                for v in violations
+            )
+        )
+
+
+class ContractRules:
+    """
+    Tick size, step size, minimum size and minimum notional of one contract,
+    parsed once.
+
+    Values are compared as decimals, so a float is on the grid when its
+    shortest representation is, e.g. 0.3 but not 0.1 + 0.2.
+    """
+
+    contract: FutureContract
+
+    def __init__(self, contract: FutureContract):
+        self.contract = contract
+        self.tick_size = Decimal(contract.tickSize)
+        self.step_size = Decimal(contract.stepSize)
+        self.min_order_size = Decimal(contract.minOrderSize)
+        self.min_notional = Decimal(contract.minNotional)
+
+    def violations(
+        self,
+        quantity: Number,
+        price: Optional[Number] = None,
+        trigger_price: Optional[Number] = None,
+    ) -> List[Tuple[str, str]]:
+        """(field, message) of every rule the order breaks"""
+        violations = []
+        size = _decimal(quantity)
+        if size <= 0:
+            violations.append(("quantity", "must be positive"))
+        elif size % self.step_size:
+            violations.append(
+                (
+                    "quantity",
+                    f"{quantity} is not a multiple of the step size {self.step_size:f}",
+                )
+            )
+        elif size < self.min_order_size:
+            violations.append(
+                (
+                    "quantity",
+                    f"{quantity} is below the minimum size {self.min_order_size:f}",
+                )
+            )
+
+        reference = None
+        for field, value in (("price", price), ("trigger_price", trigger_price)):
+            if value is None:
+                continue
+            value = _decimal(value)
+            if value <= 0:
+                violations.append((field, "must be positive"))
+                continue
+            if value % self.tick_size:
+                violations.append(
+                    (
+                        field,
+                        f"{value} is not a multiple of the tick size {self.tick_size:f}",
+                    )
+                )
+            if reference is None:
+                reference = value
+
+        # market orders without a trigger have no price to check the notional with
+        if reference is not None and size > 0:
+            notional = size * reference
+            if notional < self.min_notional:
+                violations.append(
+                    (
+                        "quantity",
+                        f"notional {notional} is below the minimum {self.min_notional:f}",
+                    )
+                )
+        return violations
+
+    def snap_price(self, price: Number, side: Optional[Side] = None) -> Number:
+        """
+        Price on the tick grid, rounded down for bids and up for asks so it is
+        never more aggressive, to the nearest tick without a side
+        """
+        if side in (Side.BID, Side.BUY):
+            rounding = ROUND_FLOOR
+        elif side in (Side.ASK, Side.SELL):
+            rounding = ROUND_CEILING
+        else:
+            rounding = ROUND_HALF_EVEN
+        ticks = (_decimal(price) / self.tick_size).to_integral_value(rounding)
+        return _like(ticks * self.tick_size, price)
+
+    def snap_quantity(self, quantity: Number) -> Number:
+        """Quantity rounded down to the step grid, it never grows"""
+        steps = (_decimal(quantity) / self.step_size).to_integral_value(ROUND_FLOOR)
+        return _like(steps * self.step_size, quantity)
+
+
+class OrderValidator:
+    """
+    Checks orders against the tick size, step size, minimum size and minimum
+    notional of their contract before they are signed, so they are not sent
+    only to be rejected. A batch is checked as a whole and every broken rule
+    of every leg is reported in one `OrderValidationError`.
+
+    A client created with `validate_orders=True` checks every order it
+    signs. `snap` moves prices and quantities onto the grid of the contract.
+
+    ```python
+    validator = OrderValidator(client.metadata)
+    orders = validator.snap([CreateOrder("BTC/USDT-P", Side.BID, 0.0012345, max_fees_percent, price=90_000.123)])
+    for violation in validator.validate(orders):
+        print(violation.index, violation.field, violation.message)
+    ```
+
+    Args:
+        contracts: The `ContractMetadata` of a client, or contracts by symbol
+    """
+
+    def __init__(
+        self, contracts: Union[ContractMetadata, Mapping[str, FutureContract]]
+    ):
+        self.contracts = contracts
+        self._rules: Dict[str, ContractRules] = {}
+
+    def rules(self, symbol: str) -> Optional[ContractRules]:
+        contracts = (
+            self.contracts.by_symbol
+            if isinstance(self.contracts, ContractMetadata)
+            else self.contracts
+        )
+        contract = contracts.get(symbol)
+        if contract is None:
+            return None
+        rules = self._rules.get(symbol)
+        if rules is None or rules.contract is not contract:
+            rules = self._rules[symbol] = ContractRules(contract)
+        return rules
+
+    def validate(
+        self, orders: Sequence[CreateOrder | UpdateOrder | CancelOrder]
+    ) -> List[OrderViolation]:
+        """Every rule the orders break, cancels are not checked"""
+        violations = []
+        for index, order in enumerate(orders):
+            if type(order) is CancelOrder:
+                continue
+            violations.extend(
+                self._leg_violations(
+                    index,
+                    order.symbol,
+                    order.quantity,
+                    order.price,
+                    order.trigger_price,
+                )
+            )
+        return violations
+
+    def check(self, orders: Sequence[CreateOrder | UpdateOrder | CancelOrder]):
+        violations = self.validate(orders)
+        if violations:
+            raise OrderValidationError(violations)
+
+    def check_order(
+        self,
+        symbol: str,
+        quantity: Number,
+        price: Optional[Number] = None,
+        trigger_price: Optional[Number] = None,
+    ):
+        violations = self._leg_violations(0, symbol, quantity, price, trigger_price)
+        if violations:
+            raise OrderValidationError(violations)
+
+    def _leg_violations(
+        self,
+        index: int,
+        symbol: str,
+        quantity: Number,
+        price: Optional[Number],
+        trigger_price: Optional[Number],
+    ) -> List[OrderViolation]:
+        rules = self.rules(symbol)
+        if rules is None:
+            return [OrderViolation(index, symbol, "symbol", "unknown symbol")]
+        return [
+            OrderViolation(index, symbol, field, message)
+            for field, message in rules.violations(quantity, price, trigger_price)
+        ]
+
+    def snap(
+        self, orders: Sequence[CreateOrder | UpdateOrder | CancelOrder]
+    ) -> List[CreateOrder | UpdateOrder | CancelOrder]:
+        """Copies of the orders with prices and quantities on the grid, see `ContractRules`"""
+        snapped = []
+        for order in orders:
+            rules = None if type(order) is CancelOrder else self.rules(order.symbol)
+            if rules is None:
+                snapped.append(order)
+                continue
+            order = copy.copy(order)
+            order.quantity = rules.snap_quantity(order.quantity)
+            if order.price is not None:
+                order.price = rules.snap_price(order.price, order.side)
+            if order.trigger_price is not None:
+                order.trigger_price = rules.snap_price(order.trigger_price)
+            snapped.append(order)
+        return snapped
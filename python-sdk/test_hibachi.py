@@ -3,20 +3,39 @@ import json
 import os
 import time
 from dataclasses import asdict, dataclass
+from decimal import Decimal
+from types import SimpleNamespace
 from typing import List, Union
 
+import pytest
 import websockets
 from eth_keys import keys
 from hibachi_xyz import (
+    AsyncHibachiApiClient,
     CancelOrder,
+    ContractMetadata,
     CreateOrder,
+    EcdsaSigner,
+    EndpointClass,
     HibachiApiClient,
     HibachiApiError,
+    HistoryLoader,
     Interval,
+    JsonCodec,
+    KlineCache,
+    KlineHistory,
+    OrderPayloadEncoder,
+    OrderTracker,
+    OrderValidationError,
+    OrderValidator,
+    OrjsonCodec,
+    ProcessPoolSigner,
+    RateLimiter,
     TWAPConfig,
     TWAPQuantityMode,
     UpdateOrder,
     get_version,
+    parse_decimals,
 )
 from hibachi_xyz.env_setup import setup_environment
 from hibachi_xyz.helpers import (
@@ -30,6 +49,8 @@ from hibachi_xyz.types import (
     AccountTrade,
     AccountTradesResponse,
     Asset,
+    BatchResponse,
+    BatchResponseOrder,
     CapitalBalance,
     CapitalHistory,
     CrossChainAsset,
@@ -124,6 +145,295 @@ def test_exchange_info():
         assert isinstance(next_maintainance_window, MaintenanceWindow)
 
 
+def test_contract_metadata(tmp_path):
+    snapshot = str(tmp_path / "metadata.json")
+    client = HibachiApiClient(
+        api_endpoint, data_api_endpoint, metadata_snapshot=snapshot, warm_up=True
+    )
+    metadata = client.metadata
+    assert not metadata.is_stale()
+
+    contract = metadata.contracts[0]
+    assert metadata.by_symbol[contract.symbol] is contract
+    assert metadata.by_id[contract.id] is contract
+    assert contract.settlementSymbol in metadata.by_settlement_symbol
+
+    # unchanged contracts keep their identity across refreshes
+    client.get_exchange_info()
+    assert metadata.by_symbol[contract.symbol] is contract
+
+    # a second client starts from the snapshot
+    cached = HibachiApiClient(
+        api_endpoint, data_api_endpoint, metadata_snapshot=snapshot
+    )
+    assert cached.metadata.load()
+    assert cached.metadata.by_symbol[contract.symbol] == contract
+
+    # snapshots older than the max age are fetched again
+    expired = HibachiApiClient(
+        api_endpoint,
+        data_api_endpoint,
+        metadata_snapshot=snapshot,
+        metadata_snapshot_max_age=0,
+    )
+    assert not expired.metadata.load()
+
+
+def test_contract_metadata_corrupt_snapshot(tmp_path):
+    snapshot = tmp_path / "metadata.json"
+    metadata = ContractMetadata(snapshot_path=str(snapshot))
+    # unreadable snapshots are reported as missing, so they are fetched again
+    for content in (
+        b'{"updatedAt": 17',
+        b"[]",
+        b'{"futureContracts": []}',
+        b'{"updatedAt": 1e12, "futureContracts": [{"symbol": "BTC/USDT-P"}]}',
+    ):
+        snapshot.write_bytes(content)
+        assert not metadata.load()
+    assert metadata.is_stale() and metadata.by_symbol == {}
+
+
+def test_order_payload_encoder():
+    client = HibachiApiClient(api_endpoint, data_api_endpoint)
+    contract = client.get_exchange_info().futureContracts[0]
+    encoder = OrderPayloadEncoder(contract)
+
+    market_payload = encoder.encode(1, Decimal("0.001"), Side.BID, Decimal("0.0005"))
+    limit_payload = encoder.encode(
+        1, Decimal("0.001"), Side.ASK, Decimal("0.0005"), Decimal("1000")
+    )
+    assert len(market_payload) == 32
+    assert len(limit_payload) == 40
+
+    # float and exact inputs agree whenever the float is exactly representable
+    assert encoder.encode(1, 0.5, Side.BID, 0.5, 1000.0) == encoder.encode(
+        1, Decimal("0.5"), Side.BID, Decimal("0.5"), 1000
+    )
+    assert encoder.quantity_to_int(Decimal("0.0003")) == 3 * pow(
+        10, contract.underlyingDecimals - 4
+    )
+
+
+def test_process_pool_signer():
+    key = bytes.fromhex("11" * 32)
+    payloads = [i.to_bytes(8, "big") * 5 for i in range(20)]
+
+    signer = ProcessPoolSigner(key, max_workers=2, min_batch_size=4)
+    try:
+        assert signer.sign_many(payloads) == EcdsaSigner(key).sign_many(payloads)
+    finally:
+        signer.close()
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter():
+    limiter = RateLimiter(global_limit=(20, 1))
+    await limiter.acquire_async(EndpointClass.MARKET_DATA)
+
+    served = []
+
+    async def request(endpoint_class, name):
+        await limiter.acquire_async(endpoint_class)
+        served.append(name)
+
+    polls = [
+        asyncio.create_task(request(EndpointClass.MARKET_DATA, f"poll{i}"))
+        for i in range(2)
+    ]
+    await asyncio.sleep(0.01)
+    cancel = asyncio.create_task(request(EndpointClass.CANCEL, "cancel"))
+    await asyncio.gather(*polls, cancel)
+    # the cancel was queued last but is served first
+    assert served == ["cancel", "poll0", "poll1"]
+
+    # a 429 pauses the buckets for the Retry-After delay
+    limiter.feedback(EndpointClass.CANCEL, 429, {"Retry-After": "0.2"})
+    start = time.monotonic()
+    await limiter.acquire_async(EndpointClass.CANCEL)
+    assert time.monotonic() - start >= 0.15
+
+
+def test_order_tracker():
+    tracker = OrderTracker()
+    tracker.placed(1000, 11, "BTC/USDT-P", Side.BUY, 0.001, 90_000)
+    tracker.placed(1001, 12, "BTC/USDT-P", Side.SELL, 0.001, None)
+    # market orders do not rest on the book
+    assert 12 not in tracker
+    assert tracker.get_by_nonce(1000).side == Side.BID
+
+    update = tracker.update_order(11, 0.0005, price=90_010)
+    assert update.symbol == "BTC/USDT-P" and update.side == Side.BID
+    assert update.quantity == 0.001
+    assert update.price == 90_010
+
+    tracker.apply_batch(
+        [
+            CreateOrder("ETH/USDT-P", Side.SELL, 0.01, 0.0005, price=3_000),
+            update,
+        ],
+        BatchResponse(orders=[BatchResponseOrder(1002, 13), BatchResponseOrder()]),
+    )
+    assert tracker.get(13).symbol == "ETH/USDT-P"
+    assert tracker.get(11).price == "90010"
+
+    tracker.apply_account_message(
+        {"topic": "order_update", "data": {"orderId": "13", "status": "FILLED"}}
+    )
+    assert 13 not in tracker
+    assert [int(order.orderId) for order in tracker.orders()] == [11]
+
+
+def test_cancel_orders():
+    # a stubbed session that fails the batch holding order 5 and omits order 7
+    class Session:
+        def __init__(self):
+            self.batches = []
+
+        def request(self, method, url, **kwargs):
+            orders = json.loads(kwargs["data"])["orders"]
+            order_ids = [int(order["orderId"]) for order in orders]
+            self.batches.append(order_ids)
+            if 5 in order_ids:
+                return SimpleNamespace(status_code=500, text="internal error")
+            entries = [{"orderId": str(i)} for i in order_ids if i != 7]
+            return SimpleNamespace(
+                status_code=200, content=json.dumps({"orders": entries})
+            )
+
+    tracker = OrderTracker()
+    for order_id in range(1, 8):
+        tracker.placed(order_id, order_id, "BTC/USDT-P", Side.BID, 0.001, 90_000)
+    client = HibachiApiClient(
+        account_id=1,
+        api_key="api-key",
+        signer=EcdsaSigner(bytes.fromhex("11" * 32)),
+        order_tracker=tracker,
+        connection_pools=False,
+    )
+    client._api_session = session = Session()
+    nonces = {}
+    cancel_chunk = client._cancel_chunk
+
+    def record_chunk(order_ids, nonce):
+        nonces[order_ids[0]] = nonce
+        return cancel_chunk(order_ids, nonce)
+
+    client._cancel_chunk = record_chunk
+    client.get_pending_orders = lambda: PendingOrdersResponse(
+        orders=[SimpleNamespace(orderId=str(i), contractId=2) for i in range(1, 8)]
+    )
+
+    response = client.cancel_all_orders(contractId=2, batch_size=3)
+    assert sorted(session.batches) == [[1, 2, 3], [4, 5, 6], [7]]
+    # the chunks are signed with distinct nonces
+    assert nonces[4] - nonces[1] == 3 and nonces[7] - nonces[1] == 6
+    assert [r.orderId for r in response.results] == [1, 2, 3, 4, 5, 6, 7]
+    assert [(r.orderId, r.error) for r in response.failed] == [
+        (4, "500: internal error"),
+        (5, "500: internal error"),
+        (6, "500: internal error"),
+        (7, "no result in response"),
+    ]
+    # only the cancelled orders are forgotten
+    assert sorted(int(order.orderId) for order in tracker.orders()) == [4, 5, 6, 7]
+
+
+def test_order_validator():
+    contract = FutureContract(
+        displayName="BTC/USDT Perps",
+        id=2,
+        maintenanceFactorForPositions="0.03",
+        minNotional="1",
+        minOrderSize="0.0001",
+        orderbookGranularities=["0.1"],
+        riskFactorForOrders="0.1",
+        riskFactorForPositions="0.05",
+        settlementDecimals=6,
+        settlementSymbol="USDT",
+        status="LIVE",
+        stepSize="0.0000000001",
+        symbol="BTC/USDT-P",
+        tickSize="0.1",
+        underlyingDecimals=10,
+        underlyingSymbol="BTC",
+    )
+    validator = OrderValidator({"BTC/USDT-P": contract})
+    orders = [
+        CreateOrder("BTC/USDT-P", Side.BID, 0.1 + 0.2, 0.0005, price=90_000.15),
+        CreateOrder("BTC/USDT-P", Side.ASK, 0.00001, 0.0005, price=90_000),
+        CancelOrder(order_id=1),
+        UpdateOrder(5, "BTC/USDT-P", Side.ASK, 0.001, 0.0005, price=90_000.1),
+    ]
+    violations = validator.validate(orders)
+    assert [(v.index, v.field) for v in violations] == [
+        (0, "quantity"),
+        (0, "price"),
+        (1, "quantity"),
+        (1, "quantity"),
+    ]
+    with pytest.raises(OrderValidationError):
+        validator.check(orders)
+
+    snapped = validator.snap(orders[:1])
+    # bids are never snapped to a higher price
+    assert (snapped[0].quantity, snapped[0].price) == (0.3, 90_000.1)
+    assert validator.validate(snapped) == []
+    assert orders[0].price == 90_000.15
+
+
+def test_decimal_numbers():
+    body = {
+        "orders": [
+            {"orderId": "77", "price": "95123.7", "totalQuantity": "0.0000003"},
+        ],
+        "bid": {"levels": [{"price": "1.5", "quantity": "2"}]},
+    }
+    parse_decimals(body)
+    order = body["orders"][0]
+    assert order["orderId"] == "77"
+    assert order["price"] == Decimal("95123.7")
+    assert body["bid"]["levels"][0]["quantity"] == Decimal("2")
+
+    # parsed values are encoded exactly, without a float round trip
+    contract = FutureContract(
+        displayName="BTC/USDT Perps",
+        id=2,
+        maintenanceFactorForPositions="0.03",
+        minNotional="1",
+        minOrderSize="0.0001",
+        orderbookGranularities=["0.1"],
+        riskFactorForOrders="0.1",
+        riskFactorForPositions="0.05",
+        settlementDecimals=6,
+        settlementSymbol="USDT",
+        status="LIVE",
+        stepSize="0.0000000001",
+        symbol="BTC/USDT-P",
+        tickSize="0.1",
+        underlyingDecimals=10,
+        underlyingSymbol="BTC",
+    )
+    encoder = OrderPayloadEncoder(contract)
+    assert encoder.price_to_int(order["price"]) == encoder.price_to_int("95123.7")
+    assert encoder.quantity_to_int(order["totalQuantity"]) == 3000
+
+
+def test_json_codec():
+    message = {"id": 1, "topic": "mark_price", "data": {"markPrice": "95000.5"}}
+
+    codecs = [JsonCodec()]
+    try:
+        codecs.append(OrjsonCodec())
+    except ImportError:
+        pass
+
+    for codec in codecs:
+        assert codec.loads(codec.dumps(message)) == message
+        assert codec.loads(codec.dumps_bytes(message)) == message
+        assert json.loads(codec.dumps(message)) == message
+
+
 def test_get_prices():
     client = HibachiApiClient(api_endpoint, data_api_endpoint)
     assert client != None
@@ -138,6 +448,35 @@ def test_get_prices():
     assert isinstance(prices.tradePrice, str)
 
 
+def test_pooled_client():
+    with HibachiApiClient(
+        api_endpoint, data_api_endpoint, pool_size=2, timeout=10
+    ) as client:
+        first = client.get_prices("BTC/USDT-P")
+        second = client.get_prices("BTC/USDT-P")
+
+    assert isinstance(first, PriceResponse)
+    assert first.symbol == second.symbol
+
+
+@pytest.mark.asyncio
+async def test_async_client():
+    symbols = ["BTC/USDT-P", "ETH/USDT-P", "SOL/USDT-P"]
+    async with AsyncHibachiApiClient(
+        api_endpoint,
+        data_api_endpoint,
+        account_id=account_id,
+        api_key=api_key,
+        private_key=private_key,
+    ) as client:
+        prices = await asyncio.gather(*(client.get_prices(s) for s in symbols))
+        account_info = await client.get_account_info()
+
+    assert [p.symbol for p in prices] == symbols
+    assert all(isinstance(p, PriceResponse) for p in prices)
+    assert isinstance(account_info, AccountInfo)
+
+
 def test_get_stats():
     client = HibachiApiClient(api_endpoint, data_api_endpoint)
     assert client != None
@@ -216,6 +555,92 @@ def test_get_klines():
         assert float(kline.low) <= float(kline.close)
 
 
+def test_history_loader():
+    client = HibachiApiClient(api_endpoint, data_api_endpoint)
+    loader = HistoryLoader(client, max_workers=4, page_size=60)
+
+    end_ms = int(time.time() * 1000)
+    start_ms = end_ms - 6 * 60 * 60 * 1000
+    klines = loader.load_klines("BTC/USDT-P", Interval.FIVE_MINUTES, start_ms, end_ms)
+
+    assert len(klines) > 0
+    assert klines.timestamp.dtype.name == "int64"
+    assert klines.close.dtype.name == "float64"
+    assert (klines.timestamp >= start_ms).all() and (klines.timestamp < end_ms).all()
+    # pages are merged in order without duplicate bars
+    assert (klines.timestamp[1:] > klines.timestamp[:-1]).all()
+    assert (klines.high >= klines.low).all()
+
+    chunks = list(
+        loader.iter_klines(
+            "BTC/USDT-P", Interval.FIVE_MINUTES, start_ms, end_ms, chunk_size=16
+        )
+    )
+    assert all(len(chunk) == 16 for chunk in chunks[:-1])
+    assert sum(len(chunk) for chunk in chunks) == len(klines)
+
+
+def test_kline_cache(tmp_path):
+    client = HibachiApiClient(api_endpoint, data_api_endpoint)
+    cache = KlineCache(str(tmp_path), api_client=client)
+
+    end_ms = int(time.time() * 1000)
+    start_ms = end_ms - 2 * 60 * 60 * 1000
+    klines = cache.get("BTC/USDT-P", Interval.FIVE_MINUTES, start_ms, end_ms)
+    assert len(klines) > 0
+    assert cache.cached_ranges("BTC/USDT-P", Interval.FIVE_MINUTES)
+
+    # a new cache over the same directory serves the closed bars from disk
+    reopened = KlineCache(str(tmp_path), loader=cache.loader)
+    closed_end = int(klines.timestamp[-1])
+    cached = reopened.get("BTC/USDT-P", Interval.FIVE_MINUTES, start_ms, closed_end)
+    assert (cached.timestamp == klines.timestamp[:-1]).all()
+    assert (cached.close == klines.close[:-1]).all()
+
+
+def test_kline_cache_gaps(tmp_path):
+    np = pytest.importorskip("numpy")
+
+    # a loader with a bar every minute whose close is its minute
+    class Loader:
+        def __init__(self):
+            self.calls = []
+
+        def load_klines(self, symbol, interval, start_ms, end_ms):
+            self.calls.append((start_ms, end_ms))
+            timestamp = np.arange(start_ms, end_ms, 60_000, dtype=np.int64)
+            close = (timestamp // 60_000).astype(np.float64)
+            return KlineHistory(timestamp, close, close, close, close, close)
+
+    minute = 60_000
+    now = int(time.time() * 1000)
+    start = now - now % minute - 60 * minute
+    loader = Loader()
+    cache = KlineCache(str(tmp_path), loader=loader)
+    symbol, interval = "BTC/USDT-P", Interval.ONE_MINUTE
+
+    cache.get(symbol, interval, start, start + 10 * minute)
+    cache.get(symbol, interval, start + 20 * minute, start + 30 * minute)
+    # only the gap between the stored ranges is fetched, and merged in between
+    klines = cache.get(symbol, interval, start + 5 * minute, start + 25 * minute)
+    assert loader.calls[2] == (start + 10 * minute, start + 20 * minute)
+    assert len(klines) == 20
+    assert cache.cached_ranges(symbol, interval) == [(start, start + 30 * minute)]
+
+    # a rewrite interrupted before the switch leaves a generation that is never read
+    series = os.path.join(str(tmp_path), "BTC_USDT-P", interval.value)
+    os.makedirs(os.path.join(series, "columns-2"))
+
+    # a new cache over the same directory serves the bars from disk
+    reopened = KlineCache(str(tmp_path), loader=loader)
+    klines = reopened.get(symbol, interval, start, start + 30 * minute)
+    assert len(loader.calls) == 3
+    assert (klines.timestamp == np.arange(start, start + 30 * minute, minute)).all()
+    assert (klines.close == klines.timestamp // minute).all()
+    generations = [name for name in os.listdir(series) if name.startswith("columns-")]
+    assert generations == ["columns-1"]
+
+
 def test_get_open_interest():
     client = HibachiApiClient(api_endpoint, data_api_endpoint)
     assert client != None
@@ -874,6 +1299,7 @@ def test_cancel_all_orders():
     assert after_adding_order_count == start_order_count + 1
 
     cancel_result = client.cancel_all_orders()
+    assert cancel_result.failed == []
 
     order_count_after_cancel_all = len(client.get_pending_orders().orders)
 
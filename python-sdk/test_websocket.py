@@ -2,16 +2,39 @@ import asyncio
 import json
 import os
 import time
+from types import SimpleNamespace
 
 import pytest
+import websockets
 from dotenv import load_dotenv
+from hibachi_xyz.api import HibachiApiClient
 from hibachi_xyz.api_ws_account import HibachiWSAccountClient
+from hibachi_xyz.replica import AccountReplica
 from hibachi_xyz.api_ws_market import HibachiWSMarketClient
 from hibachi_xyz.api_ws_trade import HibachiWSTradeClient
+from hibachi_xyz.bars import BarAggregator, TimeBarBuilder
+from hibachi_xyz.events import (
+    DisconnectedEvent,
+    KlineTick,
+    MarkPriceEvent,
+    OrderBookEvent,
+    ReconnectedEvent,
+    parse_market_event,
+)
+from hibachi_xyz.feed import FLAG_FIRST, FLAG_LAST, FeedPublisher, FeedReader, FeedTopic
+from hibachi_xyz.orderbook import LocalOrderBook, OrderBookEngine
+from hibachi_xyz.pnl import PnlEngine
+from hibachi_xyz.sharding import (
+    LeastLoadedSharding,
+    ShardedMarketClient,
+    SymbolHashSharding,
+)
+from hibachi_xyz.dispatch import CLOSED, BoundedQueue, OverflowPolicy
 from hibachi_xyz.env_setup import setup_environment
 from hibachi_xyz.helpers import print_data
 from hibachi_xyz.types import (
     AccountSnapshot,
+    FutureContract,
     Nonce,
     OrderModifyParams,
     OrderPlaceParams,
@@ -20,6 +43,7 @@ from hibachi_xyz.types import (
     OrderType,
     Position,
     Side,
+    TakerSide,
     WebSocketBatchOrder,
     WebSocketOrderCancelParams,
     WebSocketOrderModifyParams,
@@ -71,6 +95,316 @@ async def test_market_websocket():
         await client.disconnect()
 
 
+@pytest.mark.asyncio
+@pytest.mark.timeout(15)
+async def test_market_stream():
+    _, data_api_endpoint, *_ = setup_environment()
+
+    client = HibachiWSMarketClient(api_endpoint=data_api_endpoint)
+
+    try:
+        await client.connect()
+
+        count = 0
+        async with client.stream(
+            "BTC/USDT-P", WebSocketSubscriptionTopic.MARK_PRICE
+        ) as stream:
+            async for event in stream:
+                assert isinstance(event, MarkPriceEvent)
+                assert event.symbol == "BTC/USDT-P"
+                count += 1
+                if count == 3:
+                    break
+
+        assert stream.stats().delivered == 3
+
+    finally:
+        await client.disconnect()
+
+
+def test_parse_market_event():
+    event = parse_market_event(
+        {
+            "symbol": "BTC/USDT-P",
+            "topic": "mark_price",
+            "data": {"markPrice": "95000.5"},
+        }
+    )
+    assert event == MarkPriceEvent("BTC/USDT-P", 95000.5)
+
+    event = parse_market_event(
+        {
+            "symbol": "BTC/USDT-P",
+            "topic": "orderbook",
+            "messageType": "Update",
+            "data": {"bid": {"levels": [{"price": "95000", "quantity": "0.5"}]}},
+        }
+    )
+    assert isinstance(event, OrderBookEvent)
+    assert not event.isSnapshot
+    assert event.bid == [(95000.0, 0.5)]
+    assert event.ask == []
+
+    unknown = {"topic": "unknown"}
+    assert parse_market_event(unknown) is unknown
+
+
+@pytest.mark.asyncio
+async def test_bounded_queue():
+    queue = BoundedQueue(maxsize=2, policy=OverflowPolicy.DROP_OLDEST)
+    for i in range(5):
+        await queue.put(i)
+    assert [await queue.get(), await queue.get()] == [3, 4]
+    assert queue.stats().dropped == 3
+
+    queue = BoundedQueue(maxsize=100, policy=OverflowPolicy.CONFLATE)
+    for i in range(5):
+        await queue.put(i)
+    assert len(queue) == 1
+    assert await queue.get() == 4
+
+    queue.close()
+    assert await queue.get() is CLOSED
+
+
+def test_sharding_policies():
+    subscriptions = [
+        WebSocketSubscription(symbol, topic)
+        for symbol in ["BTC/USDT-P", "ETH/USDT-P", "SOL/USDT-P"]
+        for topic in WebSocketSubscriptionTopic
+    ]
+
+    # every topic of a symbol shares its connection
+    hashing = SymbolHashSharding()
+    shards = {}
+    for sub in subscriptions:
+        shard = hashing.assign(sub, [0, 1, 2], {})
+        assert shards.setdefault(sub.symbol, shard) == shard
+
+    least_loaded = LeastLoadedSharding()
+    load = {0: 0, 1: 0, 2: 0}
+    for sub in subscriptions:
+        load[least_loaded.assign(sub, [0, 1, 2], load)] += 1
+    assert max(load.values()) - min(load.values()) <= 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.timeout(15)
+async def test_sharded_market_client():
+    _, data_api_endpoint, *_ = setup_environment()
+
+    client = ShardedMarketClient(api_endpoint=data_api_endpoint, num_shards=2)
+
+    try:
+        await client.connect()
+
+        subscriptions = [
+            WebSocketSubscription(symbol, WebSocketSubscriptionTopic.MARK_PRICE)
+            for symbol in ["BTC/USDT-P", "ETH/USDT-P", "SOL/USDT-P"]
+        ]
+        symbols = set()
+        async with client.merged_stream(subscriptions) as stream:
+            async for event in stream:
+                symbols.add(event.symbol)
+                if len(symbols) == len(subscriptions):
+                    break
+
+        assert sum(len(subs) for subs in client.assignments().values()) == 0
+
+    finally:
+        await client.disconnect()
+
+
+def test_local_orderbook():
+    book = LocalOrderBook("BTC/USDT-P")
+    book.apply_snapshot([(100, 1), (99, 2)], [(101, 1), (102, 3)], sequence=1)
+    assert book.best_bid() == (100, 1)
+    assert book.best_ask() == (101, 1)
+
+    assert book.apply_update([(100, 0), (99.5, 4)], [(100.5, 2)], sequence=2)
+    assert book.best_bid() == (99.5, 4)
+    assert book.best_ask() == (100.5, 2)
+    assert book.bids.quantity_at(100) == 0
+    assert book.asks.levels() == [(100.5, 2), (101, 1), (102, 3)]
+
+    # a sequence gap marks the book out of sync
+    assert not book.apply_update([(98, 1)], [], sequence=4)
+    assert not book.is_synced
+    assert book.bids.quantity_at(98) == 0
+
+
+def test_time_bar_builder():
+    builder = TimeBarBuilder("BTC/USDT-P", 5_000)
+    start = 1_700_000_000_000
+    assert builder.add(100.0, 1.0, start + 1_000, TakerSide.Buy) is None
+    assert builder.add(102.0, 2.0, start + 3_000, TakerSide.Sell) is None
+    assert builder.add(99.0, 1.0, start + 4_000, TakerSide.Sell) is None
+
+    bar = builder.add(101.0, 1.0, start + 6_000, TakerSide.Buy)
+    assert (bar.start, bar.end) == (start, start + 5_000)
+    assert (bar.open, bar.high, bar.low, bar.close) == (100.0, 102.0, 99.0, 99.0)
+    assert bar.volume == 4.0 and bar.buyVolume == 1.0 and bar.trades == 3
+
+    # a trade of the completed window does not change the open one
+    assert builder.add(50.0, 1.0, start + 4_500, TakerSide.Sell) is None
+    assert builder.late_trades == 1
+    current = builder.current
+    assert (current.low, current.close, current.trades) == (101.0, 101.0, 1)
+
+    # a 10s server kline is compared once both of its 5s bars are complete
+    kline = KlineTick(100.0, 102.0, 99.0, 101.0, 504.0, "10s", start // 1000)
+    assert builder.reconcile(kline) == []
+    assert builder.flush(start + 10_000) is not None
+    (result,) = builder.ready()
+    assert result.matches and result.local.trades == 4
+
+    # a trade of a window that was flushed already is not emitted again
+    assert builder.add(100.0, 1.0, start + 9_000, TakerSide.Buy) is None
+    assert builder.current is None and builder.late_trades == 2
+    assert len(builder.completed) == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.timeout(60)
+async def test_bar_aggregator():
+    _, data_api_endpoint, *_ = setup_environment()
+    ws_endpoint = data_api_endpoint.replace("https://", "wss://")
+
+    client = HibachiWSMarketClient(api_endpoint=ws_endpoint)
+    bars = BarAggregator(client)
+    bars.time_bars("BTC/USDT-P", 5_000)
+    received = []
+
+    async def handle_bar(bar):
+        received.append(bar)
+
+    bars.on_bar(handle_bar)
+    try:
+        await client.connect()
+        await client.subscribe(
+            [WebSocketSubscription("BTC/USDT-P", WebSocketSubscriptionTopic.TRADES)]
+        )
+        while not received:
+            await asyncio.sleep(0.5)
+        bar = received[0]
+        assert bar.end - bar.start == 5_000
+        assert bar.low <= bar.open <= bar.high and bar.low <= bar.close <= bar.high
+    finally:
+        bars.close()
+        await client.disconnect()
+
+
+def test_pnl_engine():
+    def contract(contract_id, symbol):
+        return FutureContract(
+            displayName=symbol,
+            id=contract_id,
+            maintenanceFactorForPositions="0.03",
+            minNotional="1",
+            minOrderSize="0.0001",
+            orderbookGranularities=["0.1"],
+            riskFactorForOrders="0.1",
+            riskFactorForPositions="0.05",
+            settlementDecimals=6,
+            settlementSymbol="USDT",
+            status="LIVE",
+            stepSize="0.0000000001",
+            symbol=symbol,
+            tickSize="0.1",
+            underlyingDecimals=10,
+            underlyingSymbol=symbol[:3],
+        )
+
+    contracts = {"BTC/USDT-P": contract(2, "BTC/USDT-P")}
+    engine = PnlEngine(contracts)
+    # seen before its contract is loaded
+    engine.on_mark_price("ETH/USDT-P", 4_000)
+    engine.set_positions(
+        [
+            Position(
+                "Long", "0", "100000", "0", "100000", "0.5", "BTC/USDT-P", "0", "0"
+            ),
+            Position("Short", "0", "4000", "0", "4000", "2", "ETH/USDT-P", "0", "0"),
+        ]
+    )
+    assert engine.initial_margin[engine.rows["ETH/USDT-P"]] == 0
+
+    contracts["ETH/USDT-P"] = contract(3, "ETH/USDT-P")
+    engine.recompute()
+    engine.on_mark_price("BTC/USDT-P", 101_000)
+    engine.on_mark_price("ETH/USDT-P", 3_900)
+
+    assert engine.unrealized_pnl("BTC/USDT-P") == pytest.approx(500)
+    assert engine.unrealized_pnl("ETH/USDT-P") == pytest.approx(200)
+    totals = engine.totals()
+    assert totals.unrealizedPnl == pytest.approx(700)
+    assert totals.notional == pytest.approx(0.5 * 101_000 + 2 * 3_900)
+    assert totals.initialMargin == pytest.approx((0.5 * 101_000 + 2 * 3_900) * 0.05)
+
+    # running totals match a full recomputation
+    engine.recompute()
+    assert engine.totals().maintenanceMargin == pytest.approx(totals.maintenanceMargin)
+
+
+def test_feed_ring_buffer():
+    publisher = FeedPublisher(HibachiWSMarketClient(), capacity=8)
+    reader = FeedReader(publisher.name)
+    try:
+        publisher.write(MarkPriceEvent("BTC/USDT-P", 95000.5))
+        publisher.write(
+            OrderBookEvent("ETH/USDT-P", True, [(2500.0, 1.0)], [(2501.0, 2.0)], 7)
+        )
+        mark, bid, ask = reader.read()
+        assert mark.topic == FeedTopic.MARK_PRICE
+        assert (mark.symbol, mark.values[0]) == ("BTC/USDT-P", 95000.5)
+        assert bid.symbol == "ETH/USDT-P" and bid.flags & FLAG_FIRST
+        assert ask.values[:3] == (2501.0, 2.0, -1.0) and ask.flags & FLAG_LAST
+
+        # a reader lapped by the writer skips ahead and counts what it lost
+        for i in range(20):
+            publisher.write(MarkPriceEvent("BTC/USDT-P", float(i)))
+        records = reader.read() + reader.read()
+        assert reader.lost == 13
+        assert [record.values[0] for record in records] == list(range(13, 20))
+    finally:
+        reader.close()
+        publisher.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.timeout(15)
+async def test_orderbook_engine():
+    _, data_api_endpoint, *_ = setup_environment()
+    ws_endpoint = data_api_endpoint.replace("https://", "wss://")
+
+    client = HibachiWSMarketClient(api_endpoint=ws_endpoint)
+    api = HibachiApiClient(data_api_url=data_api_endpoint)
+
+    try:
+        await client.connect()
+        engine = OrderBookEngine(client, api, depth=5, granularity=0.01)
+
+        updated = asyncio.Event()
+
+        async def on_update(book):
+            updated.set()
+
+        engine.on_update(on_update)
+        await engine.track("BTC/USDT-P")
+        await updated.wait()
+
+        book = engine.book("BTC/USDT-P")
+        assert book.is_synced
+        if book.best_bid() and book.best_ask():
+            assert book.best_bid()[0] < book.best_ask()[0]
+
+        await engine.untrack("BTC/USDT-P")
+
+    finally:
+        await client.disconnect()
+        api.close()
+
+
 @pytest.mark.asyncio
 async def test_trade_websocket():
     client = HibachiWSTradeClient(
@@ -215,6 +549,275 @@ async def test_trade_websocket():
                 print(f"Task {task} was cancelled as expected.")
 
 
+def test_account_replica():
+    def position(symbol, quantity):
+        return Position("Long", "100", "100", "100", "100", quantity, symbol, "0", "0")
+
+    replica = AccountReplica()
+    replica.apply_snapshot(
+        AccountSnapshot(1, "1000", [position("BTC/USDT-P", "0.001")])
+    )
+    assert not replica.stale
+
+    replica.apply_message(
+        {"topic": "balance_update", "sequence": 1, "data": {"balance": "990"}}
+    )
+    replica.apply_message(
+        {
+            "topic": "position_update",
+            "sequence": 2,
+            "data": {"symbol": "BTC/USDT-P", "quantity": "0.002"},
+        }
+    )
+    assert replica.balance == "990"
+    assert replica.position("BTC/USDT-P").quantity == "0.002"
+    assert replica.position("BTC/USDT-P").openPrice == "100"
+
+    # a skipped sequence number marks the replica for a resync
+    replica.apply_message(
+        {
+            "topic": "position_update",
+            "sequence": 4,
+            "data": {"symbol": "BTC/USDT-P", "quantity": "0"},
+        }
+    )
+    assert replica.position("BTC/USDT-P") is None
+    assert replica.stale
+
+
+@pytest.mark.asyncio
+async def test_account_replica_reconcile():
+    class Client:
+        order_tracker = None
+        # the stream delivers an update while the REST request is in flight
+        update = {"topic": "balance_update", "sequence": 4, "data": {"balance": "980"}}
+
+        async def get_account_info(self):
+            if self.update is not None:
+                replica.apply_message(self.update)
+                self.update = None
+            return SimpleNamespace(balance="990", positions=[])
+
+        async def get_pending_orders(self):
+            return SimpleNamespace(orders=[])
+
+    replica = AccountReplica(api_client=Client())
+    replica.apply_snapshot(AccountSnapshot(1, "1000", []))
+    for sequence in (1, 3):
+        replica.apply_message(
+            {"topic": "balance_update", "sequence": sequence, "data": {}}
+        )
+    assert replica.stale
+
+    # the older REST state is discarded and the resync is retried
+    assert not await replica.reconcile()
+    assert replica.balance == "980" and replica.stale
+    assert replica._resync.is_set()
+
+    assert await replica.reconcile()
+    assert replica.balance == "990" and not replica.stale
+    # the sequence of the stream starts over after a resync
+    replica.apply_message({"topic": "balance_update", "sequence": 9, "data": {}})
+    assert not replica.stale
+
+
+@pytest.mark.asyncio
+@pytest.mark.timeout(15)
+async def test_account_client_routing():
+    # a local server that sends a bad frame and an update before the first ping reply
+    async def serve(websocket):
+        ping_requests = 0
+        async for raw in websocket:
+            request = json.loads(raw)
+            if request["method"] == "stream.start":
+                result = {
+                    "accountSnapshot": {
+                        "account_id": 1,
+                        "balance": "1000",
+                        "positions": [],
+                    },
+                    "listenKey": "key",
+                }
+                await websocket.send(
+                    json.dumps({"id": request["id"], "result": result})
+                )
+            else:
+                ping_requests += 1
+                if ping_requests == 1:
+                    update = {"topic": "balance_update", "data": {"balance": "990"}}
+                    await websocket.send("not json")
+                    await websocket.send(json.dumps(update))
+                await websocket.send(json.dumps({"id": request["id"], "status": 200}))
+
+    async with websockets.serve(serve, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        client = HibachiWSAccountClient(
+            "api-key", 1, api_endpoint=f"ws://127.0.0.1:{port}", keepalive_interval=60
+        )
+        failing = []
+        pings = []
+
+        async def handle_failing(message):
+            failing.append(message)
+            raise RuntimeError("handler error")
+
+        async def handle_with_ping(message):
+            # handlers run off the receive loop, so they can await requests
+            pings.append(await client.ping())
+
+        client.on("balance_update", handle_failing)
+        client.on("balance_update", handle_with_ping)
+        try:
+            await client.connect()
+            await client.stream_start()
+            assert await client.ping()
+
+            # the update is neither consumed by the ping nor lost to the failing handler
+            update = await client.listen(timeout=1)
+            assert update["data"]["balance"] == "990"
+            while not pings:
+                await asyncio.sleep(0.01)
+            assert len(failing) == 1 and pings == [True]
+            assert await client.ping()
+            assert not client._receive_task.done()
+        finally:
+            await client.disconnect()
+
+
+@pytest.mark.asyncio
+@pytest.mark.timeout(10)
+async def test_market_client_reconnect():
+    # a local server that sends a bad frame and a price, then drops the first connection
+    subscribe_requests = []
+
+    async def serve(websocket):
+        subscribe_requests.append(json.loads(await websocket.recv()))
+        mark_price = {
+            "topic": "mark_price",
+            "symbol": "BTC/USDT-P",
+            "data": {"markPrice": str(len(subscribe_requests))},
+        }
+        await websocket.send("not json")
+        await websocket.send(json.dumps(mark_price))
+        if len(subscribe_requests) > 1:
+            await websocket.wait_closed()
+
+    async with websockets.serve(serve, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        client = HibachiWSMarketClient(reconnect_jitter=0)
+        client.api_endpoint = f"ws://127.0.0.1:{port}"
+        prices = []
+        events = []
+
+        async def handle_mark_price(event):
+            prices.append(event.markPrice)
+
+        async def handle_connection_event(event):
+            events.append(event)
+
+        client.on("mark_price", handle_mark_price)
+        client.on("disconnected", handle_connection_event)
+        client.on("reconnected", handle_connection_event)
+        subscription = WebSocketSubscription(
+            "BTC/USDT-P", WebSocketSubscriptionTopic.MARK_PRICE
+        )
+        try:
+            await client.connect()
+            await client.subscribe([subscription])
+            while len(prices) < 2:
+                await asyncio.sleep(0.01)
+        finally:
+            await client.disconnect()
+
+    # the bad frames were skipped without a reconnect of their own
+    assert prices == [1.0, 2.0]
+    assert [type(event) for event in events] == [DisconnectedEvent, ReconnectedEvent]
+    assert events[1].subscriptions == [subscription]
+    # the subscription was restored on the new connection
+    assert subscribe_requests[1] == subscribe_requests[0]
+
+
+@pytest.mark.asyncio
+@pytest.mark.timeout(10)
+async def test_market_stream_without_reconnect():
+    async def serve(websocket):
+        await websocket.recv()
+        mark_price = {
+            "topic": "mark_price",
+            "symbol": "BTC/USDT-P",
+            "data": {"markPrice": "1"},
+        }
+        await websocket.send(json.dumps(mark_price))
+
+    async with websockets.serve(serve, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        client = HibachiWSMarketClient(auto_reconnect=False)
+        client.api_endpoint = f"ws://127.0.0.1:{port}"
+        try:
+            await client.connect()
+            stream = client.stream("BTC/USDT-P", WebSocketSubscriptionTopic.MARK_PRICE)
+            # the stream ends once the connection is closed
+            events = [event async for event in stream]
+        finally:
+            await client.disconnect()
+
+    assert events == [MarkPriceEvent("BTC/USDT-P", 1.0)]
+
+
+@pytest.mark.asyncio
+@pytest.mark.timeout(10)
+async def test_trade_client_multiplexing():
+    # a local server answering two requests out of order, around a push and bad frames
+    async def serve(websocket):
+        first = json.loads(await websocket.recv())
+        second = json.loads(await websocket.recv())
+        await websocket.send("not json")
+        await websocket.send(json.dumps([1, 2]))
+        await websocket.send(json.dumps({"topic": "order_update", "orderId": 7}))
+        await websocket.send(json.dumps({"id": second["id"], "result": "second"}))
+        await websocket.send(json.dumps({"id": first["id"], "result": "first"}))
+        async for raw in websocket:
+            request = json.loads(raw)
+            await websocket.send(json.dumps({"id": request["id"], "result": "later"}))
+
+    async with websockets.serve(serve, "127.0.0.1", 0) as server:
+        port = server.sockets[0].getsockname()[1]
+        client = HibachiWSTradeClient("api-key", 1, "public-key", request_timeout=2)
+        client.api_endpoint = f"ws://127.0.0.1:{port}"
+        release = asyncio.Event()
+        handled = asyncio.Event()
+        updates = []
+
+        async def slow_handler(message):
+            await release.wait()
+            updates.append(message)
+            handled.set()
+
+        client.on("order_update", slow_handler)
+        try:
+            await client.connect()
+            first, second = await asyncio.gather(
+                client._send_request({"id": client._next_message_id(), "method": "a"}),
+                client._send_request({"id": client._next_message_id(), "method": "b"}),
+            )
+
+            # each request gets its own reply while the handler is still blocked
+            assert first["result"] == "first"
+            assert second["result"] == "second"
+            assert updates == []
+
+            release.set()
+            later = await client._send_request(
+                {"id": client._next_message_id(), "method": "c"}
+            )
+            assert later["result"] == "later"
+            await asyncio.wait_for(handled.wait(), timeout=1)
+            assert updates == [{"topic": "order_update", "orderId": 7}]
+            assert not client._receive_task.done()
+        finally:
+            await client.disconnect()
+
+
 @pytest.mark.asyncio
 @pytest.mark.timeout(15)
 async def test_account_websocket():
@@ -239,5 +842,8 @@ async def test_account_websocket():
         first_position = result.accountSnapshot.positions[0]
         assert isinstance(first_position, Position), "Invalid Position object"
 
+        # the reply is routed by id, updates are left for listen
+        assert await client.ping(), "listenKey renewal failed"
+
     finally:
         await client.disconnect()